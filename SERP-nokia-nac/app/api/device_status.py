@@ -6,7 +6,7 @@ from app.models.schemas import DeviceInfo, StatusSubscription
 from app.services import device
 from typing import Optional
 from ..models.device import DeviceStatus, DeviceBase
-from ..core.nokia_client import nokia_client
+from ..core.nokia_client import call_sdk, nokia_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,7 +17,7 @@ router = APIRouter(prefix="/device", tags=["Device Status"])
 async def get_device_status(device_id: str):
     """Get device status (online/offline)"""
     try:
-        device = nokia_client.get_device(phone_number=device_id)
+        device = await call_sdk("devices.get", nokia_client.get_device, phone_number=device_id)
         return DeviceStatus(
             phone_number=device_id,
             status="online",  # Assuming device is online if no error
@@ -32,7 +32,7 @@ async def get_device_status(device_id: str):
 async def get_device_info(device_id: str):
     """Get detailed device information"""
     try:
-        device = nokia_client.get_device(phone_number=device_id)
+        device = await call_sdk("devices.get", nokia_client.get_device, phone_number=device_id)
         return DeviceBase(
             phone_number=device_id,
             ipv4_address=getattr(device, "ipv4_address", {}).get("public_address")
@@ -4,7 +4,7 @@ API router for location operations.
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 from ..models.device import DeviceLocation
-from ..core.nokia_client import nokia_client
+from ..core.nokia_client import call_sdk, nokia_client
 from ..core.config import settings
 import logging
 
@@ -19,8 +19,8 @@ async def get_device_location(
 ):
     """Get device location"""
     try:
-        device = nokia_client.get_device(phone_number=device_id)
-        location = device.location(max_age=max_age)
+        device = await call_sdk("devices.get", nokia_client.get_device, phone_number=device_id)
+        location = await call_sdk("device.location", device.location, max_age=max_age)
         
         return DeviceLocation(
             latitude=location.latitude,
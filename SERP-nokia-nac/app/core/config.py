@@ -19,6 +19,12 @@ class Settings(BaseSettings):
     # Nokia NAC API key
     NOKIA_NAC_API_KEY: str = os.getenv("NOKIA_NAC_API_KEY", "")
 
+    # Base URL for direct HTTP requests (mock-nokia-api for local runs)
+    NOKIA_NAC_API_URL: str = os.getenv("NOKIA_NAC_API_URL", "http://mock-nokia-api:6000/api/v1")
+
+    # Threads for the blocking Nokia SDK calls (see nokia_client.call_sdk)
+    SDK_EXECUTOR_WORKERS: int = int(os.getenv("SDK_EXECUTOR_WORKERS", "8"))
+
     # Default device for testing
     DEFAULT_PHONE_NUMBER: str = "+34696453332"
     DEFAULT_IPV4: str = "0.0.0.0"
@@ -0,0 +1,195 @@
+"""
+Prometheus metrics shared by the backend and the NAC service.
+
+This file is kept identical in backend/src/services/metrics.py and
+SERP-nokia-nac/app/core/metrics.py (each service is its own Docker build
+context, so it cannot be imported across them). Service-specific gauges
+are registered from outside with `register_gauges`.
+
+Exposed at /metrics in the Prometheus text format:
+
+- http_request_duration_seconds{method, route, status}: histogram per route
+  template (not raw path, to keep label cardinality bounded)
+- http_requests_in_flight{method}
+- upstream_request_duration_seconds{upstream, operation, outcome} and
+  upstream_request_errors_total{upstream, operation, error}: calls to the
+  Nokia API, wrapped with `track_upstream`
+- cache_lookups_total{cache, result} and cache_hit_ratio{cache}, fed by
+  `record_cache`
+- whatever `register_gauges` adds (the backend's DB pool)
+- metrics_collector_errors_total{metric}: scrapes where one of those
+  gauges' callbacks raised (the gauge is then left out of that scrape)
+
+Gauges read from callbacks are only evaluated on scrape, so they cost
+nothing on the request path.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Sequence, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, disable_created_metrics, generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+# No *_created series: they double the output and nothing here reads them
+disable_created_metrics()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ["method"],
+)
+UPSTREAM_DURATION = Histogram(
+    "upstream_request_duration_seconds", "Latency of calls to upstream services",
+    ["upstream", "operation", "outcome"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_ERRORS = Counter(
+    "upstream_request_errors_total", "Failed calls to upstream services by exception type",
+    ["upstream", "operation", "error"],
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "Cache lookups by result (hit/miss)", ["cache", "result"],
+)
+COLLECTOR_ERRORS = Counter(
+    "metrics_collector_errors_total", "Scrapes where a gauge callback raised", ["metric"],
+)
+# A failing gauge is logged at most once per this many seconds
+COLLECTOR_ERROR_LOG_INTERVAL_S = 300.0
+
+# Paths not worth a histogram of their own
+EXCLUDED_PATHS = {"/metrics"}
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "unmatched")
+    # FastAPI versions that do not put the matched route in the scope
+    app = scope.get("app")
+    for candidate in getattr(app, "routes", ()):
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return getattr(candidate, "path", "unmatched")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXCLUDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            HTTP_REQUEST_DURATION.labels(method, _route_template(scope), str(status[0])).observe(
+                time.perf_counter() - started
+            )
+
+
+@contextmanager
+def track_upstream(upstream: str, operation: str):
+    """Time an upstream call; usable from sync and async code alike."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        UPSTREAM_DURATION.labels(upstream, operation, "error").observe(time.perf_counter() - started)
+        UPSTREAM_ERRORS.labels(upstream, operation, type(e).__name__).inc()
+        raise
+    UPSTREAM_DURATION.labels(upstream, operation, "ok").observe(time.perf_counter() - started)
+
+
+_cache_counts: Dict[str, list] = {}
+_cache_lock = threading.Lock()
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+    with _cache_lock:
+        counts = _cache_counts.setdefault(cache, [0, 0])
+        counts[0 if hit else 1] += 1
+
+
+class _CacheRatioCollector:
+    def collect(self):
+        family = GaugeMetricFamily("cache_hit_ratio", "Hits over lookups since start", labels=["cache"])
+        with _cache_lock:
+            counts = {cache: tuple(c) for cache, c in _cache_counts.items()}
+        for cache, (hits, misses) in counts.items():
+            if hits + misses:
+                family.add_metric([cache], hits / (hits + misses))
+        yield family
+
+
+class _CallbackGaugeCollector:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = list(labelnames)
+        self.callback = callback
+        self._logged_at = None
+
+    def collect(self):
+        family = GaugeMetricFamily(self.name, self.documentation, labels=self.labelnames)
+        try:
+            for labels, value in self.callback():
+                family.add_metric(list(labels), value)
+        except Exception as e:
+            # A failing callback must not break the whole scrape, but it must not go unnoticed either
+            COLLECTOR_ERRORS.labels(self.name).inc()
+            now = time.monotonic()
+            if self._logged_at is None or now - self._logged_at >= COLLECTOR_ERROR_LOG_INTERVAL_S:
+                self._logged_at = now
+                logger.warning(f"Metrics callback for {self.name} failed: {type(e).__name__}: {e}")
+            return
+        yield family
+
+
+def register_gauges(name: str, documentation: str, labelnames: Sequence[str],
+                    callback: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+    """Gauge whose samples come from `callback()` at scrape time, as (label values, value) pairs."""
+    REGISTRY.register(_CallbackGaugeCollector(name, documentation, labelnames, callback))
+
+
+REGISTRY.register(_CacheRatioCollector())
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+def setup_metrics(app):
+    """Add the timing middleware and the /metrics route to a FastAPI app."""
+    app.add_middleware(MetricsMiddleware)
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
@@ -1,9 +1,41 @@
 import network_as_code as nac
 from .config import settings
+from .metrics import track_upstream
+from . import tracing
+import asyncio
+import contextvars
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# The SDK is synchronous; its calls run here instead of blocking the event loop
+sdk_executor = ThreadPoolExecutor(max_workers=settings.SDK_EXECUTOR_WORKERS, thread_name_prefix="nokia-sdk")
+
+
+async def call_sdk(operation: str, fn, *args, **kwargs):
+    """
+    Run a blocking SDK call in the SDK thread pool.
+
+    Traced as a span for the call with a child span for the time spent
+    waiting for a free worker, so a saturated pool shows up in traces.
+    """
+    submitted = time.time()
+    with tracing.span(f"nokia_sdk {operation}", "client") as span:
+        context = contextvars.copy_context()
+
+        def run():
+            # None as well inside an unsampled trace
+            wait = tracing.start_span("sdk.executor.wait") if span is not None else None
+            if wait is not None:
+                wait.start = submitted
+                wait.finish()
+            with track_upstream("nokia_sdk", operation):
+                return fn(*args, **kwargs)
+
+        return await asyncio.get_running_loop().run_in_executor(sdk_executor, context.run, run)
+
 class NokiaNACClient:
     _instance = None
     _client = None
@@ -7,6 +7,7 @@ import httpx
 from network_as_code.models.device import DeviceIpv4Addr
 from app.core.client import nokia_nac_client
 from app.core.config import settings
+from app.core.nokia_client import call_sdk
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +28,9 @@ async def get_device(device_id: str) -> Any:
             device_id = "+" + device_id.strip()
 
         # Obtenemos el dispositivo usando el cliente Nokia NAC
-        device = nokia_nac_client.devices.get(
+        device = await call_sdk(
+            "devices.get",
+            nokia_nac_client.devices.get,
             phone_number=device_id,
             ipv4_address=DeviceIpv4Addr(
                 public_address=settings.DEFAULT_IPV4
@@ -11,6 +11,9 @@ from app.services.device import get_device
 from app.services.qod import create_qod_session
 from app.core.client import nokia_nac_client
 from app.core.config import settings
+from app.core.metrics import track_upstream
+from app.core.nokia_client import call_sdk
+from app.core import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -88,11 +91,13 @@ async def activate_qod_for_emergency(emergency_id: str, devices: List[str], prof
 
                         # Make the HTTP request
                         async with httpx.AsyncClient() as direct_client:
-                            response = await direct_client.post(
-                                api_url,
-                                json=payload,
-                                headers=headers
-                            )
+                            with tracing.span("nokia_http POST sessions", "client"), \
+                                    track_upstream("nokia_http", "POST sessions"):
+                                response = await direct_client.post(
+                                    api_url,
+                                    json=payload,
+                                    headers=tracing.inject(headers)
+                                )
 
                             if response.status_code in [200, 201, 202]:
                                 try:
@@ -188,7 +193,7 @@ async def get_qod_status_for_emergency(emergency_id: str, devices: List[str]) ->
             device = await get_device(phone_number)
 
             # Get all QoD sessions of the device
-            all_sessions = device.sessions()
+            all_sessions = await call_sdk("device.sessions", device.sessions)
 
             # Convert sessions to a serializable format
             sessions_list = []
@@ -5,6 +5,7 @@ import logging
 from typing import Dict, Any, Optional
 from app.services.device import get_device
 from app.core.config import settings
+from app.core.nokia_client import call_sdk
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +25,7 @@ async def get_device_location(device_id: str, max_age: Optional[int] = 3600) ->
         device = await get_device(device_id)
 
         # Get location information
-        location = device.location(max_age=max_age)
+        location = await call_sdk("device.location", device.location, max_age=max_age)
 
         # Convert to dictionary for API response
         location_dict = {
@@ -1,9 +1,11 @@
 from datetime import datetime, timedelta
 import logging
 from typing import List, Optional
-from ..core.nokia_client import nokia_client
+from ..core.nokia_client import call_sdk, nokia_client
 from ..models.qod import QoDSessionCreate, QoDSession
 from ..core.config import settings
+from ..core.metrics import record_cache, track_upstream
+from ..core import tracing
 import httpx
 
 logger = logging.getLogger(__name__)
@@ -19,10 +21,12 @@ class QoDService:
             phone_number = session_data.device_id if session_data.device_id.startswith("+") else f"+{session_data.device_id}"
             
             # Get device
-            device = nokia_client.get_device(phone_number=phone_number)
+            device = await call_sdk("devices.get", nokia_client.get_device, phone_number=phone_number)
             
             # Create QoD session
-            qod_session = device.create_qod_session(
+            qod_session = await call_sdk(
+                "device.create_qod_session",
+                device.create_qod_session,
                 service_ipv4=session_data.service_ipv4,
                 profile=session_data.profile,
                 duration=session_data.duration
@@ -72,11 +76,12 @@ class QoDService:
                 "duration": session_data.duration
             }
             
-            response = await client.post(
-                f"{settings.NOKIA_NAC_API_URL}/sessions",
-                json=payload,
-                headers=headers
-            )
+            with tracing.span("nokia_http POST sessions", "client"), track_upstream("nokia_http", "POST sessions"):
+                response = await client.post(
+                    f"{settings.NOKIA_NAC_API_URL}/sessions",
+                    json=payload,
+                    headers=tracing.inject(headers)
+                )
             
             if response.status_code in [200, 201, 202]:
                 response_data = response.json()
@@ -88,7 +93,9 @@ class QoDService:
                 raise Exception(f"HTTP {response.status_code}: {response.text}")
 
     async def get_session(self, session_id: str) -> Optional[QoDSession]:
-        return self._active_sessions.get(session_id)
+        session = self._active_sessions.get(session_id)
+        record_cache("qod_sessions", session is not None)
+        return session
 
     async def list_sessions(self, device_id: Optional[str] = None) -> List[QoDSession]:
         if device_id:
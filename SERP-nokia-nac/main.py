@@ -4,6 +4,8 @@ import uvicorn
 import logging
 from app.api import qod, device_status, location
 from app.core.config import settings
+from app.core.metrics import setup_metrics
+from app.core import tracing
 
 # Configure logging
 logging.basicConfig(
@@ -32,6 +34,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency histograms and /metrics
+setup_metrics(app)
+
+# Trace spans continue the caller's traceparent; added last so it wraps everything
+tracing.configure("nokia-nac")
+app.add_middleware(tracing.TracingMiddleware)
+
 # Include routers
 app.include_router(qod.router)
 app.include_router(device_status.router)
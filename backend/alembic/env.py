@@ -38,6 +38,22 @@ from alembic import context
 from src.models import *  # Import your SQLModel models here
 target_metadata = SQLModel.metadata
 
+from src.services.emergency_partitions import is_managed_table
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Emergency partitions and the archive are created by migrations and the
+    # archival job, not declared as models
+    if type_ == "table" and reflected and compare_to is None and is_managed_table(name):
+        return False
+    # A partitioned emergency cannot be referenced by id alone, so this
+    # foreign key exists in the models (for the relationship) but not in the
+    # database, where the link references emergency_id instead
+    if (type_ == "foreign_key_constraint" and object.table.name == "emergencyresourcelink"
+            and object.referred_table.name == "emergency"):
+        return False
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -60,6 +76,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -117,6 +134,7 @@ def do_run_migrations(connection):
         connection=connection,
         target_metadata=target_metadata,
         compare_type=True,
+        include_object=include_object,
     )
     with context.begin_transaction():
         context.run_migrations()
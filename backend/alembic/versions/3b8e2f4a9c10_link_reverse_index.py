@@ -0,0 +1,28 @@
+"""Reverse index on emergencyresourcelink (resource_id, emergency_id)
+
+Revision ID: 3b8e2f4a9c10
+Revises: c1617e32de9c
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e2f4a9c10'
+down_revision: Union[str, None] = 'c1617e32de9c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The primary key (emergency_id, resource_id) cannot serve lookups by resource
+    op.create_index('ix_emergencyresourcelink_resource_id_emergency_id', 'emergencyresourcelink',
+                    ['resource_id', 'emergency_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_emergencyresourcelink_resource_id_emergency_id', table_name='emergencyresourcelink')
@@ -0,0 +1,48 @@
+"""Foreign key indexes and partial indexes for active emergencies
+
+Revision ID: 7d41c0e5b2a3
+Revises: 3b8e2f4a9c10
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d41c0e5b2a3'
+down_revision: Union[str, None] = '3b8e2f4a9c10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# ON DELETE SET NULL on these columns scans the referencing table without an index
+FOREIGN_KEYS = {
+    'emergency': [
+        'location_emergency', 'address_emergency',
+        'resource_id', 'location_resource', 'address_resource',
+        'destination_id', 'location_destination', 'address_destination',
+    ],
+    'resource': ['actual_address', 'actual_location', 'normal_address', 'normal_location'],
+}
+
+
+def upgrade() -> None:
+    for table, columns in FOREIGN_KEYS.items():
+        for column in columns:
+            op.create_index(op.f(f'ix_{table}_{column}'), table, [column], unique=False)
+
+    op.create_index('ix_emergency_active_priority_time', 'emergency', ['priority', 'time_created'], unique=False,
+                    postgresql_where=sa.text("status = 'Active'"))
+    op.create_index('ix_emergency_active_time', 'emergency', ['time_created'], unique=False,
+                    postgresql_where=sa.text("status = 'Active'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_emergency_active_time', table_name='emergency', postgresql_where=sa.text("status = 'Active'"))
+    op.drop_index('ix_emergency_active_priority_time', table_name='emergency',
+                  postgresql_where=sa.text("status = 'Active'"))
+    for table, columns in FOREIGN_KEYS.items():
+        for column in columns:
+            op.drop_index(op.f(f'ix_{table}_{column}'), table_name=table)
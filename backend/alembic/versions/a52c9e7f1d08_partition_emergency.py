@@ -0,0 +1,114 @@
+"""Range-partition emergency by time_created and add emergency_archive
+
+Revision ID: a52c9e7f1d08
+Revises: 7d41c0e5b2a3
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a52c9e7f1d08'
+down_revision: Union[str, None] = '7d41c0e5b2a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Kept in sync with src/services/emergency_partitions.py; not imported so the
+# migration does not change when the service does
+PARTITIONS_AHEAD = 3
+
+FOREIGN_KEYS = {
+    'location_emergency': 'location', 'address_emergency': 'address',
+    'resource_id': 'resource', 'location_resource': 'location', 'address_resource': 'address',
+    'destination_id': 'resource', 'location_destination': 'location', 'address_destination': 'address',
+}
+ACTIVE = sa.text("status = 'Active'")
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value: datetime) -> datetime:
+    return value.replace(year=value.year + value.month // 12, month=value.month % 12 + 1)
+
+
+def create_indexes(table: str) -> None:
+    op.create_index('ix_emergency_id', table, ['id'], unique=False)
+    for column in FOREIGN_KEYS:
+        op.create_index(f'ix_emergency_{column}', table, [column], unique=False)
+    op.create_index('ix_emergency_active_priority_time', table, ['priority', 'time_created'], unique=False,
+                    postgresql_where=ACTIVE)
+    op.create_index('ix_emergency_active_time', table, ['time_created'], unique=False, postgresql_where=ACTIVE)
+
+
+def create_foreign_keys(table: str) -> None:
+    for column, referred in FOREIGN_KEYS.items():
+        op.create_foreign_key(f'emergency_{column}_fkey', table, referred, [column], ['id'], ondelete='SET NULL')
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # A unique constraint on a partitioned table must include the partition
+    # key, so emergency(id) alone can no longer be referenced. The ORM still
+    # deletes the links of a deleted emergency (secondary relationship).
+    op.drop_constraint('emergencyresourcelink_emergency_id_fkey', 'emergencyresourcelink', type_='foreignkey')
+
+    op.execute("UPDATE emergency SET time_created = now() WHERE time_created IS NULL")
+    op.execute("CREATE TABLE emergency_partitioned (LIKE emergency INCLUDING DEFAULTS) PARTITION BY RANGE (time_created)")
+    op.execute("ALTER TABLE emergency_partitioned ALTER COLUMN time_created SET NOT NULL")
+
+    # One partition per month from the oldest row to PARTITIONS_AHEAD months ahead
+    oldest = bind.execute(sa.text("SELECT min(time_created) FROM emergency")).scalar()
+    now = datetime.now(timezone.utc)
+    month = month_start(min(oldest, now) if oldest else now)
+    end = month_start(now)
+    for _ in range(PARTITIONS_AHEAD + 1):
+        end = next_month(end)
+    while month < end:
+        upper = next_month(month)
+        op.execute(
+            f"CREATE TABLE emergency_p{month:%Y%m} PARTITION OF emergency_partitioned "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        month = upper
+    op.execute("CREATE TABLE emergency_default PARTITION OF emergency_partitioned DEFAULT")
+
+    op.execute("INSERT INTO emergency_partitioned SELECT * FROM emergency")
+    op.drop_table('emergency')
+    op.rename_table('emergency_partitioned', 'emergency')
+
+    op.create_primary_key('emergency_pkey', 'emergency', ['id', 'time_created'])
+    create_foreign_keys('emergency')
+    create_indexes('emergency')
+
+    # Cold storage: same columns, partitioned the same way, no foreign keys.
+    # Partitions are created by the archival job as it needs them.
+    op.execute("CREATE TABLE emergency_archive (LIKE emergency INCLUDING DEFAULTS) PARTITION BY RANGE (time_created)")
+    op.create_primary_key('emergency_archive_pkey', 'emergency_archive', ['id', 'time_created'])
+    op.create_index('ix_emergency_archive_id', 'emergency_archive', ['id'], unique=False)
+    op.execute("CREATE TABLE emergency_archive_default PARTITION OF emergency_archive DEFAULT")
+
+
+def downgrade() -> None:
+    op.execute("CREATE TABLE emergency_plain (LIKE emergency INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO emergency_plain SELECT * FROM emergency")
+    op.execute("INSERT INTO emergency_plain SELECT * FROM emergency_archive")
+    op.execute("ALTER TABLE emergency_plain ALTER COLUMN time_created DROP NOT NULL")
+    # Dropping the parents drops their partitions too, including archived ones
+    # that were detached from emergency and attached to emergency_archive
+    op.drop_table('emergency_archive')
+    op.drop_table('emergency')
+    op.rename_table('emergency_plain', 'emergency')
+
+    op.create_primary_key('emergency_pkey', 'emergency', ['id'])
+    create_foreign_keys('emergency')
+    create_indexes('emergency')
+    op.create_foreign_key('emergencyresourcelink_emergency_id_fkey', 'emergencyresourcelink', 'emergency',
+                          ['emergency_id'], ['id'])
@@ -0,0 +1,42 @@
+"""Drop the hot-table foreign keys left on archived emergency partitions
+
+Revision ID: a9e4c7b25d16
+Revises: f3b9d0c2e817
+Create Date: 2026-10-22 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9e4c7b25d16'
+down_revision: Union[str, None] = 'f3b9d0c2e817'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A partition archived whole kept its foreign keys to location, address
+    # and resource, without the indexes behind them, so every delete there
+    # scanned it. emergency_archive declares none of them.
+    op.execute("""
+        DO $$
+        DECLARE fk record;
+        BEGIN
+            FOR fk IN
+                SELECT c.conrelid::regclass AS partition, c.conname
+                FROM pg_constraint c JOIN pg_inherits i ON i.inhrelid = c.conrelid
+                WHERE i.inhparent = 'emergency_archive'::regclass AND c.contype = 'f' AND c.conparentid = 0
+                  AND c.confrelid <> 'emergency_id'::regclass
+            LOOP
+                EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', fk.partition, fk.conname);
+            END LOOP;
+        END $$
+    """)
+
+
+def downgrade() -> None:
+    # Archived rows were never meant to have them; nothing to restore
+    pass
@@ -0,0 +1,29 @@
+"""Emergency duplicate_of for flagged duplicate reports
+
+Revision ID: b4d9e2a61c58
+Revises: f81b2d6e4a37
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d9e2a61c58'
+down_revision: Union[str, None] = 'f81b2d6e4a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The archive keeps the same columns as emergency, rows move between them
+    for table in ('emergency', 'emergency_archive'):
+        op.add_column(table, sa.Column('duplicate_of', sa.Uuid(), nullable=True))
+
+
+def downgrade() -> None:
+    for table in ('emergency', 'emergency_archive'):
+        op.drop_column(table, 'duplicate_of')
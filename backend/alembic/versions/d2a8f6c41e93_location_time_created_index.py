@@ -0,0 +1,26 @@
+"""Index on location time_created for time-range exports
+
+Revision ID: d2a8f6c41e93
+Revises: c7e1f5a93b20
+Create Date: 2026-10-20 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a8f6c41e93'
+down_revision: Union[str, None] = 'c7e1f5a93b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_location_time_created', 'location', ['time_created'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_location_time_created', table_name='location')
@@ -0,0 +1,55 @@
+"""Hourly emergency rollups for analytics
+
+Revision ID: e3a7c1b9d2f4
+Revises: a52c9e7f1d08
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7c1b9d2f4'
+down_revision: Union[str, None] = 'a52c9e7f1d08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Incremental refresh: rows created or updated since the watermark, and
+    # every row of the hours they fall in
+    op.create_index('ix_emergency_time_created', 'emergency', ['time_created'], unique=False)
+    op.create_index('ix_emergency_time_updated', 'emergency', ['time_updated'], unique=False)
+    op.create_index('ix_emergency_archive_time_created', 'emergency_archive', ['time_created'], unique=False)
+
+    # The enum types already exist (emergency)
+    emergency_type = postgresql.ENUM(name='emergencytype', create_type=False)
+    priority_type = postgresql.ENUM(name='prioritytype', create_type=False)
+    op.create_table('emergency_rollup_hourly',
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('emergency_type', emergency_type, nullable=False),
+    sa.Column('priority', priority_type, nullable=False),
+    sa.Column('incidents', sa.Integer(), nullable=False),
+    sa.Column('resolved', sa.Integer(), nullable=False),
+    sa.Column('resolve_seconds_sum', sa.Float(), nullable=False),
+    sa.Column('resolve_seconds_min', sa.Float(), nullable=True),
+    sa.Column('resolve_seconds_max', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('bucket', 'emergency_type', 'priority')
+    )
+    op.create_table('analytics_watermark',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_watermark')
+    op.drop_table('emergency_rollup_hourly')
+    op.drop_index('ix_emergency_archive_time_created', table_name='emergency_archive')
+    op.drop_index('ix_emergency_time_updated', table_name='emergency')
+    op.drop_index('ix_emergency_time_created', table_name='emergency')
@@ -0,0 +1,68 @@
+"""emergency_id registry: unique emergency ids and foreign keys to them
+
+Revision ID: e6c3b8d17a45
+Revises: d2a8f6c41e93
+Create Date: 2026-10-21 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6c3b8d17a45'
+down_revision: Union[str, None] = 'd2a8f6c41e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'emergency_id',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('time_created', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id', 'time_created', name='emergency_id_id_time_created_key'),
+    )
+    # Fails on an id used twice, which partitioning allowed: those have to be fixed by hand
+    op.execute("""
+        INSERT INTO emergency_id (id, time_created)
+        SELECT id, time_created FROM emergency
+        UNION ALL
+        SELECT id, time_created FROM emergency_archive
+    """)
+    for table in ('emergency', 'emergency_archive'):
+        # Deferred: the ORM flushes the two inserts in no particular order
+        op.create_foreign_key(f'{table}_id_time_created_fkey', table, 'emergency_id',
+                              ['id', 'time_created'], ['id', 'time_created'], ondelete='CASCADE',
+                              deferrable=True, initially='DEFERRED')
+
+    # Links of deleted or archived emergencies
+    op.execute("""
+        DELETE FROM emergencyresourcelink l
+        WHERE NOT EXISTS (SELECT 1 FROM emergency e WHERE e.id = l.emergency_id)
+    """)
+    op.create_foreign_key('emergencyresourcelink_emergency_id_fkey', 'emergencyresourcelink', 'emergency_id',
+                          ['emergency_id'], ['id'], ondelete='CASCADE', deferrable=True, initially='DEFERRED')
+
+    for table in ('emergency', 'emergency_archive'):
+        op.execute(f"""
+            UPDATE {table} SET duplicate_of = NULL
+            WHERE duplicate_of IS NOT NULL AND duplicate_of NOT IN (SELECT id FROM emergency_id)
+        """)
+        op.create_foreign_key(f'{table}_duplicate_of_fkey', table, 'emergency_id',
+                              ['duplicate_of'], ['id'], ondelete='SET NULL')
+    op.create_index('ix_emergency_duplicate_of', 'emergency', ['duplicate_of'], unique=False)
+    op.create_index('ix_emergency_archive_duplicate_of', 'emergency_archive', ['duplicate_of'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_emergency_archive_duplicate_of', table_name='emergency_archive')
+    op.drop_index('ix_emergency_duplicate_of', table_name='emergency')
+    for table in ('emergency', 'emergency_archive'):
+        op.drop_constraint(f'{table}_duplicate_of_fkey', table, type_='foreignkey')
+        op.drop_constraint(f'{table}_id_time_created_fkey', table, type_='foreignkey')
+    op.drop_constraint('emergencyresourcelink_emergency_id_fkey', 'emergencyresourcelink', type_='foreignkey')
+    op.drop_table('emergency_id')
@@ -0,0 +1,39 @@
+"""Store the response headers of idempotent requests
+
+Revision ID: f3b9d0c2e817
+Revises: e6c3b8d17a45
+Create Date: 2026-10-21 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9d0c2e817'
+down_revision: Union[str, None] = 'e6c3b8d17a45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('idempotency_key', sa.Column('headers', sa.JSON(), nullable=True))
+    op.execute("""
+        UPDATE idempotency_key SET headers = json_build_array(json_build_array('content-type', content_type))
+        WHERE content_type IS NOT NULL
+    """)
+    op.drop_column('idempotency_key', 'content_type')
+
+
+def downgrade() -> None:
+    op.add_column('idempotency_key', sa.Column('content_type', sa.String(length=128), nullable=True))
+    op.execute("""
+        UPDATE idempotency_key SET content_type = (
+            SELECT pair ->> 1 FROM json_array_elements(headers) AS pair
+            WHERE lower(pair ->> 0) = 'content-type' LIMIT 1
+        )
+        WHERE headers IS NOT NULL
+    """)
+    op.drop_column('idempotency_key', 'headers')
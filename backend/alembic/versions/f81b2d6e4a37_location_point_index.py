@@ -0,0 +1,27 @@
+"""GiST index on location coordinates for viewport queries
+
+Revision ID: f81b2d6e4a37
+Revises: e3a7c1b9d2f4
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f81b2d6e4a37'
+down_revision: Union[str, None] = 'e3a7c1b9d2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_location_point', 'location', [sa.text('point(longitude, latitude)')], unique=False,
+                    postgresql_using='gist')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_location_point', table_name='location', postgresql_using='gist')
@@ -0,0 +1,86 @@
+"""
+Microbenchmark: JSON vs MessagePack list responses, each with every compression
+src/services/compression.py can negotiate.
+
+Builds synthetic Emergency/Resource rows (no database needed), as
+benchmarks.serialization does. For each representation and encoding it reports:
+
+- server ms: encoding the rows plus compressing the body
+- bytes: what goes over the wire
+- client ms: decompressing plus decoding
+- total ms: server + transfer at --kbps + client, the latency a responder on a
+  congested cell would see for the body
+
+Usage (from ./backend):
+    python -m benchmarks.content_negotiation --rows 100,1000,10000 --kbps 1000
+"""
+import argparse
+import gzip
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import msgpack
+import orjson
+
+from benchmarks.serialization import make_emergency, make_resource, timeit
+from src.models.emergency import Emergency
+from src.models.resource import Resource
+from src.services import compression
+from src.services.serializer import serializer_for
+
+DECOMPRESS = {"identity": lambda body: body, "gzip": gzip.decompress}
+if compression.zstandard is not None:
+    DECOMPRESS["zstd"] = compression.zstandard.ZstdDecompressor().decompress
+if compression.brotli is not None:
+    DECOMPRESS["br"] = compression.brotli.decompress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Response representation and compression microbenchmark")
+    parser.add_argument("--rows", default="100,1000,10000")
+    parser.add_argument("--kbps", type=float, default=1000, help="Link speed used for the transfer time")
+    parser.add_argument("--seconds", type=float, default=0.5, help="Minimum time per measurement")
+    args = parser.parse_args(argv)
+    random.seed(1)
+    missing = [name for name in ("zstd", "br") if name not in DECOMPRESS]
+    if missing:
+        print(f"Not installed, skipped: {', '.join(missing)}")
+
+    print(f"{'model':<10}{'rows':>7}  {'format':<9}{'encoding':<10}{'bytes':>12}{'vs json':>9}"
+          f"{'server ms':>11}{'client ms':>11}{'total ms':>11}")
+    for model, factory in ((Emergency, make_emergency), (Resource, make_resource)):
+        serializer = serializer_for(model)
+        for n in [int(r) for r in args.rows.split(",")]:
+            rows = [factory() for _ in range(n)]
+            formats = {
+                "json": (lambda: serializer.dumps_list(rows), orjson.loads),
+                "msgpack": (lambda: serializer.dumps_list_msgpack(rows), lambda body: msgpack.unpackb(body, timestamp=3)),
+            }
+            json_bytes = None
+            for name, (encode, decode) in formats.items():
+                body = encode()
+                encode_s = timeit(encode, args.seconds)
+                decode_s = timeit(lambda: decode(body), args.seconds)
+                for encoding, decompress in DECOMPRESS.items():
+                    if encoding == "identity":
+                        wire, compress_s, decompress_s = body, 0.0, 0.0
+                    else:
+                        codec = compression.ENCODINGS[encoding]
+                        wire = codec.oneshot(body)
+                        compress_s = timeit(lambda: codec.oneshot(body), args.seconds)
+                        decompress_s = timeit(lambda: decompress(wire), args.seconds)
+                    if json_bytes is None:
+                        json_bytes = len(wire)
+                    server_ms = (encode_s + compress_s) * 1000
+                    client_ms = (decompress_s + decode_s) * 1000
+                    transfer_ms = len(wire) * 8 / args.kbps
+                    print(f"{model.__name__:<10}{n:>7}  {name:<9}{encoding:<10}{len(wire):>12,}"
+                          f"{len(wire) / json_bytes:>8.0%} {server_ms:>10.2f} {client_ms:>10.2f}"
+                          f" {server_ms + transfer_ms + client_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+HTTP load test and latency benchmark for the backend API.
+
+Drives a realistic mix of alert/device reads and PATCHes against the FastAPI
+app, either in process (ASGI transport, no network) or against a running
+server, and reports p50/p95/p99 latency and throughput per route.
+
+Usage (from ./backend):
+    python -m benchmarks.loadtest run --target asgi --concurrency 1,8,32 --duration 10
+    python -m benchmarks.loadtest run --target http://localhost:5001 --save-baseline
+    python -m benchmarks.loadtest compare benchmarks/results/baseline.json benchmarks/results/latest.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Route name -> weight. Names are stable keys in the result files.
+DEFAULT_MIX = {
+    "list_alerts": 30,
+    "list_devices": 25,
+    "get_alert": 10,
+    "device_location": 20,
+    "patch_alert": 10,
+    "patch_device": 5,
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Fixtures:
+    """IDs and payloads discovered from the API before the run."""
+
+    def __init__(self, alerts: List[Dict], devices: List[Dict], locations: Dict[str, Dict]):
+        self.alerts = alerts
+        self.devices = devices
+        self.locations = locations
+
+    @classmethod
+    async def load(cls, client: httpx.AsyncClient) -> "Fixtures":
+        alerts = (await client.get("/api/alerts")).json()
+        devices = (await client.get("/api/devices")).json()
+        if not alerts or not devices:
+            raise SystemExit("The database has no alerts or devices to benchmark; seed it first")
+        locations = {}
+        for device in devices[:50]:
+            response = await client.get(f"/api/devices/{device['id']}/location")
+            if response.status_code == 200:
+                locations[device["id"]] = response.json()
+        return cls(alerts, devices, locations)
+
+
+def build_scenarios(fixtures: Fixtures) -> Dict[str, Callable]:
+    """Route name -> coroutine factory issuing one request."""
+    located_devices = [d for d in fixtures.devices if d["id"] in fixtures.locations] or fixtures.devices
+
+    async def list_alerts(client):
+        return await client.get("/api/alerts")
+
+    async def list_devices(client):
+        return await client.get("/api/devices")
+
+    async def get_alert(client):
+        return await client.get(f"/api/alerts/{random.choice(fixtures.alerts)['id']}")
+
+    async def device_location(client):
+        return await client.get(f"/api/devices/{random.choice(located_devices)['id']}/location")
+
+    async def patch_alert(client):
+        alert = random.choice(fixtures.alerts)
+        # Rewrite the current priority so the dataset does not drift between runs
+        return await client.patch(f"/api/alerts/{alert['id']}", json={"priority": alert["priority"]})
+
+    async def patch_device(client):
+        device = random.choice(located_devices)
+        location = fixtures.locations.get(device["id"], {})
+        # update_device writes every coordinate it receives (None included),
+        # so all of them are sent with the device's current position, clamped
+        # to the ranges the request model accepts
+        lat = max(-90.0, min(90.0, location.get("latitude", 0.0)))
+        lon = max(-180.0, min(180.0, location.get("longitude", 0.0)))
+        payload = {
+            "resource_type": device.get("resource_type"),
+            "status": device.get("status"),
+            "responsible": device.get("responsible"),
+            "telephone": device.get("telephone"),
+            "email": device.get("email"),
+            "actual_latitude": lat, "actual_longitude": lon,
+            "actual_address_latitude": lat, "actual_address_longitude": lon,
+            "normal_latitude": lat, "normal_longitude": lon,
+            "normal_address_latitude": lat, "normal_address_longitude": lon,
+        }
+        return await client.patch(f"/api/devices/{device['id']}", json=payload)
+
+    return {
+        "list_alerts": list_alerts,
+        "list_devices": list_devices,
+        "get_alert": get_alert,
+        "device_location": device_location,
+        "patch_alert": patch_alert,
+        "patch_device": patch_device,
+    }
+
+
+async def run_level(client: httpx.AsyncClient, scenarios: Dict[str, Callable], mix: Dict[str, int],
+                    concurrency: int, duration: float, max_requests: Optional[int]) -> Dict:
+    """Run `concurrency` closed-loop workers for `duration` seconds (or `max_requests` in total)."""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    issued = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal issued
+        while time.perf_counter() < deadline:
+            if max_requests is not None:
+                if issued >= max_requests:
+                    return
+                issued += 1
+            name = random.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await scenarios[name](client)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if failed:
+                errors[name] += 1
+            else:
+                samples[name].append(elapsed_ms)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    routes = {}
+    for name in names:
+        values = sorted(samples[name])
+        count = len(values)
+        routes[name] = {
+            "count": count,
+            "errors": errors[name],
+            "p50_ms": round(percentile(values, 50), 3),
+            "p95_ms": round(percentile(values, 95), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+            "mean_ms": round(sum(values) / count, 3) if count else 0.0,
+            "max_ms": round(values[-1], 3) if values else 0.0,
+            "rps": round(count / wall, 2),
+        }
+    total = sum(r["count"] for r in routes.values())
+    return {
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "total_requests": total,
+        "total_errors": sum(errors.values()),
+        "throughput_rps": round(total / wall, 2),
+        "routes": routes,
+    }
+
+
+def _asgi_app():
+    # Imported lazily: the in-process mode needs the backend's settings and DB env
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from main import app
+    return app
+
+
+@asynccontextmanager
+async def app_lifespan(target: str):
+    """Run the app's startup and shutdown around the in-process run.
+
+    ASGITransport sends no lifespan events, so without this the alert board
+    is never loaded, the GPS buffer never flushes and the background jobs
+    never start.
+    """
+    if target != "asgi":
+        yield
+        return
+    app = _asgi_app()
+    async with app.router.lifespan_context(app):
+        yield
+
+
+def make_client(target: str, concurrency: int) -> httpx.AsyncClient:
+    timeout = httpx.Timeout(30.0)
+    if target == "asgi":
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=_asgi_app(), raise_app_exceptions=False), base_url="http://benchmark", timeout=timeout)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits)
+
+
+def parse_mix(value: Optional[str]) -> Dict[str, int]:
+    if not value:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in value.split(","):
+        name, weight = item.split("=")
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown route '{name}', expected one of {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+async def run(args) -> Dict:
+    random.seed(args.seed)
+    mix = parse_mix(args.mix)
+    levels = [int(c) for c in args.concurrency.split(",")]
+    result = {
+        "meta": {
+            "target": args.target,
+            "mix": mix,
+            "duration_seconds": args.duration,
+            "max_requests": args.requests,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "host": platform.node(),
+        },
+        "levels": {},
+    }
+    async with app_lifespan(args.target):
+        for concurrency in levels:
+            async with make_client(args.target, concurrency) as client:
+                scenarios = build_scenarios(await Fixtures.load(client))
+                if args.warmup > 0:
+                    await run_level(client, scenarios, mix, concurrency, args.warmup, None)
+                level = await run_level(client, scenarios, mix, concurrency, args.duration, args.requests)
+            result["levels"][str(concurrency)] = level
+            print_level(level)
+    return result
+
+
+def print_level(level: Dict):
+    print(f"\nconcurrency={level['concurrency']}  requests={level['total_requests']}  "
+          f"errors={level['total_errors']}  throughput={level['throughput_rps']} req/s")
+    print(f"  {'route':<18}{'count':>8}{'err':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'rps':>10}")
+    for name, r in level["routes"].items():
+        print(f"  {name:<18}{r['count']:>8}{r['errors']:>6}{r['p50_ms']:>10.2f}"
+              f"{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['rps']:>10.1f}")
+
+
+def compare(baseline: Dict, current: Dict, metric: str, threshold: float, min_delta_ms: float) -> List[str]:
+    """Return one message per route whose latency (or throughput) regressed past `threshold`."""
+    regressions = []
+    for level_key, base_level in baseline["levels"].items():
+        cur_level = current["levels"].get(level_key)
+        if cur_level is None:
+            continue
+        for name, base in base_level["routes"].items():
+            cur = cur_level["routes"].get(name)
+            if cur is None or not base["count"] or not cur["count"]:
+                continue
+            before, after = base[metric], cur[metric]
+            if after - before > min_delta_ms and before > 0 and (after - before) / before > threshold:
+                regressions.append(f"c={level_key} {name}: {metric} {before:.2f} -> {after:.2f} ms "
+                                   f"(+{(after - before) / before:.0%})")
+            if base["rps"] > 0 and (base["rps"] - cur["rps"]) / base["rps"] > threshold:
+                regressions.append(f"c={level_key} {name}: rps {base['rps']:.1f} -> {cur['rps']:.1f} "
+                                   f"(-{(base['rps'] - cur['rps']) / base['rps']:.0%})")
+            if cur["errors"] > base["errors"] and cur["errors"] / (cur["count"] + cur["errors"]) > 0.01:
+                regressions.append(f"c={level_key} {name}: errors {base['errors']} -> {cur['errors']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SERP backend load test")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run the benchmark")
+    run_parser.add_argument("--target", default="asgi", help="'asgi' for in-process, or a base URL")
+    run_parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    run_parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    run_parser.add_argument("--requests", type=int, default=None, help="Stop each level after N requests")
+    run_parser.add_argument("--warmup", type=float, default=2.0, help="Warm-up seconds per level, not recorded")
+    run_parser.add_argument("--mix", default=None, help="route=weight,... (default: %s)" %
+                            ",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()))
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--out", default=os.path.join(RESULTS_DIR, "latest.json"))
+    run_parser.add_argument("--save-baseline", action="store_true", help="Also write results/baseline.json")
+
+    cmp_parser = sub.add_parser("compare", help="Fail if a route regressed against a baseline")
+    cmp_parser.add_argument("baseline")
+    cmp_parser.add_argument("current")
+    cmp_parser.add_argument("--metric", default="p95_ms", choices=["p50_ms", "p95_ms", "p99_ms", "mean_ms"])
+    cmp_parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression")
+    cmp_parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore smaller absolute changes")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        result = asyncio.run(run(args))
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.out}")
+        if args.save_baseline:
+            baseline_path = os.path.join(RESULTS_DIR, "baseline.json")
+            with open(baseline_path, "w") as f:
+                json.dump(result, f, indent=2)
+            print(f"Baseline written to {baseline_path}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.metric, args.threshold, args.min_delta_ms)
+    if regressions:
+        print("Regressions:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
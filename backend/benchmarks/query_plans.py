@@ -0,0 +1,214 @@
+"""
+Query plan checks for the emergency and resource tables.
+
+Runs EXPLAIN on the queries the API depends on against a seeded database
+and fails when one stops using the index it was written for: a dropped or
+renamed index, a query rewrite that no longer matches a partial index's
+predicate, or a table that grew past what a sequential scan handles well.
+
+The statements are built with SQLAlchemy the same way the routes build them
+and compiled with literal values taken from the database, so the planner
+sees real selectivity.
+
+Usage (from ./backend, after `alembic upgrade head` and seeding):
+    python -m benchmarks.query_plans                 # exit 1 if a check fails
+    python -m benchmarks.query_plans --analyze -v    # refresh statistics, print plans
+"""
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+
+from src.configs.DBSessionManager import sessionmanager
+from src.models.emergency import Emergency, PriorityType, StatusType
+from src.models.emergencyresourceslink import EmergencyResourceLink
+from src.models.location import Location
+from src.models.resource import Resource
+from src.services.map_clusters import in_bbox
+
+INDEX_NODES = ("Index Scan", "Index Only Scan", "Bitmap Index Scan")
+# Sequential scans of smaller tables (e.g. empty future partitions) are fine
+SEQ_SCAN_MIN_ROWS = 1000
+
+
+@dataclass
+class PlanCheck:
+    name: str
+    # fixtures -> SQLAlchemy statement
+    build: Callable[[Dict[str, Any]], Any]
+    index: str
+    # Tables that must not be read with a sequential scan
+    no_seq_scan_on: tuple = ()
+
+
+CHECKS: List[PlanCheck] = [
+    PlanCheck(
+        "active emergencies of one priority, oldest first",
+        lambda f: select(Emergency)
+        .where(Emergency.status == StatusType.Active, Emergency.priority == PriorityType.Alta)
+        .order_by(Emergency.time_created).limit(50),
+        "ix_emergency_active_priority_time", ("emergency",),
+    ),
+    PlanCheck(
+        "active emergencies by priority and age",
+        lambda f: select(Emergency)
+        .where(Emergency.status == StatusType.Active)
+        .order_by(Emergency.priority, Emergency.time_created).limit(50),
+        "ix_emergency_active_priority_time", ("emergency",),
+    ),
+    PlanCheck(
+        "most recent active emergencies",
+        lambda f: select(Emergency)
+        .where(Emergency.status == StatusType.Active)
+        .order_by(Emergency.time_created.desc()).limit(50),
+        "ix_emergency_active_time", ("emergency",),
+    ),
+    PlanCheck(
+        "emergencies assigned to a resource (GET /api/devices/{id}/assignments)",
+        lambda f: select(Emergency)
+        .join(EmergencyResourceLink, EmergencyResourceLink.emergency_id == Emergency.id)
+        .where(EmergencyResourceLink.resource_id == f["linked_resource"]),
+        "ix_emergencyresourcelink_resource_id_emergency_id", ("emergencyresourcelink", "emergency"),
+    ),
+    PlanCheck(
+        "emergencies handled by a resource (DELETE /api/devices/{id})",
+        lambda f: select(Emergency).where(Emergency.resource_id == f["emergency_resource"]),
+        "ix_emergency_resource_id", ("emergency",),
+    ),
+    PlanCheck(
+        "emergencies heading to a resource (DELETE /api/devices/{id})",
+        lambda f: select(Emergency).where(Emergency.destination_id == f["emergency_destination"]),
+        "ix_emergency_destination_id", ("emergency",),
+    ),
+    PlanCheck(
+        "emergencies at a location (ON DELETE SET NULL)",
+        lambda f: select(Emergency.id).where(Emergency.location_emergency == f["emergency_location"]),
+        "ix_emergency_location_emergency", ("emergency",),
+    ),
+    PlanCheck(
+        "resources at a location (ON DELETE SET NULL)",
+        lambda f: select(Resource.id).where(Resource.actual_location == f["resource_location"]),
+        "ix_resource_actual_location", ("resource",),
+    ),
+    PlanCheck(
+        "locations in a map viewport (GET /api/map)",
+        lambda f: select(Location.id).where(in_bbox((2.16, 41.38, 2.17, 41.385))),
+        "ix_location_point", ("location",),
+    ),
+]
+
+FIXTURE_QUERIES = {
+    "linked_resource": select(EmergencyResourceLink.resource_id).limit(1),
+    "emergency_resource": select(Emergency.resource_id).where(Emergency.resource_id.is_not(None)).limit(1),
+    "emergency_destination": select(Emergency.destination_id).where(Emergency.destination_id.is_not(None)).limit(1),
+    "emergency_location": select(Emergency.location_emergency).where(Emergency.location_emergency.is_not(None)).limit(1),
+    "resource_location": select(Resource.actual_location).where(Resource.actual_location.is_not(None)).limit(1),
+}
+
+
+def compile_sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def plan_nodes(node: Dict[str, Any]):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def evaluate(check: PlanCheck, plan: Dict[str, Any], parents: Dict[str, str], sizes: Dict[str, float]) -> Optional[str]:
+    """None if the plan is as expected, otherwise why not.
+
+    `parents` maps partitions and their indexes to the partitioned table or
+    index they belong to, so checks are written against the parent names.
+    `sizes` holds the estimated rows of each table.
+    """
+    nodes = list(plan_nodes(plan["Plan"]))
+    seq_scans = [parents.get(n["Relation Name"], n["Relation Name"]) for n in nodes
+                 if n["Node Type"] == "Seq Scan" and sizes.get(n["Relation Name"], 0) >= SEQ_SCAN_MIN_ROWS]
+    seq_scans = [name for name in seq_scans if name in check.no_seq_scan_on]
+    if seq_scans:
+        return f"sequential scan on {', '.join(sorted(set(seq_scans)))}"
+    used = {parents.get(n.get("Index Name"), n.get("Index Name")) for n in nodes if n["Node Type"] in INDEX_NODES}
+    if check.index not in used:
+        return f"does not use {check.index} (uses {', '.join(sorted(i for i in used if i)) or 'no index'})"
+    return None
+
+
+def render(plan: Dict[str, Any]) -> str:
+    lines = []
+
+    def walk(node, depth):
+        target = node.get("Index Name") or node.get("Relation Name") or ""
+        lines.append(f"{'  ' * depth}-> {node['Node Type']} {target} (cost {node['Total Cost']:.0f}, rows {node['Plan Rows']})")
+        for child in node.get("Plans", ()):
+            walk(child, depth + 1)
+
+    walk(plan["Plan"], 0)
+    return "\n".join(lines)
+
+
+async def run(analyze: bool, verbose: bool) -> int:
+    failures = 0
+    async with sessionmanager.session() as session:
+        if analyze:
+            for table in ("emergency", "resource", "emergencyresourcelink", "location"):
+                await session.execute(text(f"ANALYZE {table}"))
+
+        result = await session.execute(text("""
+            SELECT c.relname, p.relname
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent
+        """))
+        parents = dict(result.all())
+        result = await session.execute(text("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'"))
+        sizes = dict(result.all())
+
+        # Missing fixtures (e.g. no links yet) skip the checks that need them
+        fixtures = {}
+        for name, query in FIXTURE_QUERIES.items():
+            value = (await session.execute(query)).scalar()
+            if value is not None:
+                fixtures[name] = value
+
+        for check in CHECKS:
+            try:
+                statement = check.build(fixtures)
+            except KeyError as e:
+                print(f"SKIP {check.name}: no fixture {e}")
+                continue
+            sql = compile_sql(statement)
+            result = await session.execute(text("EXPLAIN (FORMAT JSON) " + sql))
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            plan = plan[0]
+            problem = evaluate(check, plan, parents, sizes)
+            failures += problem is not None
+            print(f"{'FAIL' if problem else 'ok  '} {check.name}" + (f": {problem}" if problem else ""))
+            if verbose or problem:
+                print("     " + sql.replace("\n", " "))
+                print("\n".join("     " + line for line in render(plan).splitlines()))
+    await sessionmanager.close()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that key queries use their indexes")
+    parser.add_argument("--analyze", action="store_true", help="Run ANALYZE on the tables first")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print every plan")
+    args = parser.parse_args(argv)
+
+    failures = asyncio.run(run(args.analyze, args.verbose))
+    if failures:
+        print(f"\n{failures} of {len(CHECKS)} plan checks failed")
+        sys.exit(1)
+    print(f"\nAll {len(CHECKS)} plan checks passed")
+
+
+if __name__ == "__main__":
+    main()
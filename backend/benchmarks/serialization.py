@@ -0,0 +1,105 @@
+"""
+Microbenchmark: FastAPI response_model serialization vs. src.services.serializer.
+
+Builds synthetic Emergency/Resource rows (no database needed) and times the
+two ways of turning a list of them into JSON bytes:
+
+- fastapi: what a route with `response_model=List[Model]` does, i.e.
+  `serialize_response` (Pydantic validation + dump) followed by JSONResponse
+- orjson: `serializer_for(Model).dumps_list`
+
+Usage (from ./backend):
+    python -m benchmarks.serialization --rows 100,1000,10000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from src.models.emergency import Emergency, EmergencyType, PriorityType, StatusType
+from src.models.resource import Resource, ResourceStatusEnum
+from src.services.serializer import serializer_for
+
+
+def make_emergency() -> Emergency:
+    now = datetime.now(timezone.utc)
+    return Emergency(
+        id=uuid.uuid4(), name=f"ambulance-{random.randint(100, 999)}",
+        description="That's a pseudorandom type for an emergency",
+        priority=random.choice(list(PriorityType)), emergency_type=random.choice(list(EmergencyType)),
+        status=random.choice(list(StatusType)),
+        location_emergency=uuid.uuid4(), address_emergency=uuid.uuid4(),
+        resource_id=uuid.uuid4(), location_resource=uuid.uuid4(), address_resource=uuid.uuid4(),
+        destination_id=uuid.uuid4(), location_destination=uuid.uuid4(), address_destination=uuid.uuid4(),
+        name_contact="Paul", telephone_contact="+34 600 000 000", id_contact="1234567A",
+        time_created=now, time_updated=now,
+    )
+
+
+def make_resource() -> Resource:
+    now = datetime.now(timezone.utc)
+    return Resource(
+        id=uuid.uuid4(), resource_type=random.choice(["ambulance", "firetruck", "police"]),
+        actual_address=uuid.uuid4(), actual_location=uuid.uuid4(),
+        normal_address=uuid.uuid4(), normal_location=uuid.uuid4(),
+        status=random.choice(list(ResourceStatusEnum)), responsible="Rachel Fernandez",
+        telephone="+34 600 000 000", email="rachel@mail.com", time_created=now, time_updated=now,
+    )
+
+
+def timeit(fn: Callable[[], bytes], min_seconds: float) -> float:
+    """Best-of-runs seconds per call, running for at least `min_seconds`."""
+    best = float("inf")
+    deadline = time.perf_counter() + min_seconds
+    while True:
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+        if time.perf_counter() > deadline:
+            return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List serialization microbenchmark")
+    parser.add_argument("--rows", default="100,1000,10000")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Minimum time per measurement")
+    args = parser.parse_args(argv)
+    random.seed(1)
+
+    # serialize_response is a coroutine: one loop for the whole run, so the
+    # timings do not include creating and closing one per call
+    loop = asyncio.new_event_loop()
+    print(f"{'model':<10}{'rows':>8}{'fastapi ms':>14}{'orjson ms':>12}{'speedup':>10}{'rows/s (orjson)':>18}")
+    for model, factory in ((Emergency, make_emergency), (Resource, make_resource)):
+        field = create_model_field(name="Response", type_=List[model], mode="serialization")
+        serializer = serializer_for(model)
+        for n in [int(r) for r in args.rows.split(",")]:
+            rows = [factory() for _ in range(n)]
+
+            def fastapi_path():
+                content = loop.run_until_complete(serialize_response(field=field, response_content=rows))
+                return JSONResponse(content).body
+
+            def orjson_path():
+                return serializer.dumps_list(rows)
+
+            slow = timeit(fastapi_path, args.seconds)
+            fast = timeit(orjson_path, args.seconds)
+            print(f"{model.__name__:<10}{n:>8}{slow * 1000:>14.2f}{fast * 1000:>12.2f}"
+                  f"{slow / fast:>9.1f}x{n / fast:>18,.0f}")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
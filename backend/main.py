@@ -1,9 +1,11 @@
+import time
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 from datetime import datetime
-import httpx
 import uuid
 import logging
 import asyncio
@@ -32,26 +34,175 @@ app.add_middleware(
 )
 
 
-from src.routes import emergencies, location, qosod, resources
+from src.routes import analytics, emergencies, export, location, qosod, resources, system, tiles, viewport
 
 app.include_router(emergencies.router)
 app.include_router(location.router)
 app.include_router(qosod.router)
 app.include_router(resources.router)
+app.include_router(system.router)
+app.include_router(analytics.router)
+app.include_router(tiles.router)
+app.include_router(viewport.router)
+app.include_router(export.router)
 
 
 # Config DB
 from src.configs.DBSessionManager import sessionmanager
 
-#Seed DB
-from src.seeders.main import seed_db
+# Prometheus metrics
+from src.services.metrics import register_gauges, setup_metrics
+setup_metrics(app)
+
+
+def _pool_connections():
+    status = sessionmanager.pool_status()
+    for state in ("checked_out", "checked_in", "overflow"):
+        yield (state,), status[state]
+
+
+def _pool_wait():
+    wait = sessionmanager.pool_status()["wait"] or {}
+    for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+        yield (quantile,), wait.get(key, 0.0) / 1000
+
+
+register_gauges("db_pool_connections", "Connections in the DB pool by state", ["state"], _pool_connections)
+register_gauges("db_pool_acquire_wait_seconds", "Recent connection acquire wait", ["quantile"], _pool_wait)
+
+def _replica_health():
+    for replica in sessionmanager.replicas.replicas:
+        yield (replica.name,), 1.0 if replica.healthy else 0.0
+
+
+register_gauges("db_replica_healthy", "1 if the read replica passes its health check", ["replica"], _replica_health)
+
+from src.services.alert_board import alert_board
+from src.services.emergency_partitions import archival_job
+from src.services.analytics_rollups import rollup_refresh_job
+register_gauges("alert_board_size", "Active emergencies on the in-memory board", [], lambda: [((), len(alert_board))])
+from src.services.location_buffer import location_buffer
+from src.services.reverse_geocoder import reverse_geocoder
+from src.services.duplicate_detector import duplicate_detector
+register_gauges("location_buffer_pending", "GPS positions waiting to be written", [], lambda: [((), len(location_buffer))])
+
+# Read replicas: clients that just wrote keep reading from the primary
+if sessionmanager.replicas.replicas:
+    from src.configs.database import ReadYourWritesMiddleware
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# SQL instrumentation
+if settings.SQL_STATS_ENABLED:
+    from src.services.query_stats import QueryStatsMiddleware, instrument_engine
+    instrument_engine(sessionmanager.engine)
+    for replica in sessionmanager.replicas.replicas:
+        instrument_engine(replica.engine)
+    app.add_middleware(QueryStatsMiddleware)
+
+# Retries of creation requests with an Idempotency-Key get the first response back
+if settings.IDEMPOTENCY_ENABLED:
+    from src.services.idempotency import IdempotencyMiddleware
+    app.add_middleware(IdempotencyMiddleware, session_factory=sessionmanager.session)
+
+# Admission control: outside the SQL instrumentation, so a rejected request never reaches it
+from src.services import admission
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(admission.AdmissionMiddleware, pool_wait=sessionmanager.pool_wait)
+
+
+def _admission(field):
+    def collect():
+        for name, route_class in admission.classes.items():
+            yield (name,), route_class.status()[field]
+    return collect
+
+
+register_gauges("admission_active_requests", "Requests in flight by admission class", ["class"], _admission("active"))
+register_gauges("admission_waiting_requests", "Requests queued by admission class", ["class"], _admission("waiting"))
+
+# Compression outside the idempotency store, so stored responses are plain and each replay is encoded for its client
+if settings.COMPRESSION_ENABLED:
+    from src.services.compression import CompressionMiddleware
+    app.add_middleware(CompressionMiddleware)
+
+# Tracing, added last so its span wraps the other middlewares too
+from src.services import tracing
+if tracing.TRACE_ENABLED:
+    from src.services.query_stats import trace_engine
+    tracing.configure("backend")
+    trace_engine(sessionmanager.engine)
+    for replica in sessionmanager.replicas.replicas:
+        trace_engine(replica.engine)
+    app.add_middleware(tracing.TracingMiddleware)
+
+logger.info(f"App modules imported in {(time.perf_counter() - _import_started) * 1000:.0f} ms")
+
 @app.on_event("startup")
 async def startup_event():
     # Initialize the DatabaseSessionManager
     # sessionmanager.init_db()
-    await seed_db()
+    started = time.perf_counter()
+    logger.info(f"Startup profile: {settings.STARTUP_PROFILE}")
+
+    if settings.DB_POOL_PREWARM > 0:
+        phase = time.perf_counter()
+        opened = await sessionmanager.prewarm(settings.DB_POOL_PREWARM)
+        logger.info(f"Pool pre-warmed with {opened} connections in {(time.perf_counter() - phase) * 1000:.0f} ms")
+
+    if sessionmanager.replicas.replicas:
+        await sessionmanager.replicas.check_all()
+        sessionmanager.replicas.start(settings.DB_REPLICA_CHECK_INTERVAL_S)
+        healthy = sum(r.healthy for r in sessionmanager.replicas.replicas)
+        logger.info(f"Read replicas: {healthy}/{len(sessionmanager.replicas.replicas)} healthy")
+
+    # Upcoming emergency partitions and archival of old closed incidents, in
+    # the background: the first pass can take a while on a large table
+    archival_job.start(sessionmanager.engine, settings.EMERGENCY_ARCHIVE_INTERVAL_S)
+
+    #Seed DB
+    if settings.SEED_ON_STARTUP:
+        phase = time.perf_counter()
+        # Imported here: the seeders pull in Faker, which is slow to import
+        from src.seeders.main import seed_db
+        seeded = await seed_db()
+        logger.info(f"Seeding {'done' if seeded else 'skipped, data present'} in {(time.perf_counter() - phase) * 1000:.0f} ms")
+
+    # Active emergencies board, after seeding so it sees the seeded rows
+    if settings.ALERT_BOARD_ENABLED:
+        phase = time.perf_counter()
+        async with sessionmanager.session() as session:
+            loaded = await alert_board.load(session)
+        logger.info(f"Alert board loaded with {loaded} active emergencies in {(time.perf_counter() - phase) * 1000:.0f} ms")
+
+    phase = time.perf_counter()
+    async with sessionmanager.session() as session:
+        indexed = await duplicate_detector.load(session)
+    logger.info(f"Duplicate detector indexed {indexed} recent emergencies in {(time.perf_counter() - phase) * 1000:.0f} ms")
+
+    # GPS reports are written in batches from here on
+    location_buffer.start(sessionmanager.session)
+
+    # Reverse geocoder: new addresses are filled in the background
+    phase = time.perf_counter()
+    entries = await reverse_geocoder.load(settings.GEOCODER_GAZETTEER_PATH)
+    reverse_geocoder.start(sessionmanager.session)
+    if entries:
+        logger.info(f"Gazetteer loaded with {entries} entries in {(time.perf_counter() - phase) * 1000:.0f} ms")
+    else:
+        logger.info(f"No gazetteer at {settings.GEOCODER_GAZETTEER_PATH!r}, reverse geocoding off")
+
+    # Analytics rollups: a full build the first time, then only changed hours.
+    # In the background, as the full build reads the whole table; while it
+    # runs the route answers with a null refreshed_at
+    rollup_refresh_job.start(sessionmanager.engine, settings.ANALYTICS_REFRESH_INTERVAL_S)
+
+    logger.info(f"Startup completed in {(time.perf_counter() - started) * 1000:.0f} ms")
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    await archival_job.close()
+    await rollup_refresh_job.close()
+    await location_buffer.close()
+    await reverse_geocoder.close()
     await sessionmanager.close()  # Cleanup DB connecti
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Render the critical path of slow traces written by src/services/tracing.py.
+
+Reads one or more JSONL span files (e.g. the backend's and the NAC's),
+joins them by trace id and, for each trace slower than --min-ms, prints the
+span tree with the critical path marked and a breakdown of where the time
+went: the self time of each span on the path, i.e. the part not explained
+by a child on the path.
+
+Usage (from ./backend):
+    python scripts/critical_path.py traces/backend.jsonl ../SERP-nokia-nac/traces/nokia-nac.jsonl --min-ms 500
+    python scripts/critical_path.py traces/*.jsonl* --trace <trace_id>   (rotated files too)
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+
+def load_spans(paths: List[str]) -> Dict[str, List[dict]]:
+    traces: Dict[str, List[dict]] = defaultdict(list)
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    span = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def build_tree(spans: List[dict]):
+    by_id = {s["span_id"]: s for s in spans}
+    children = defaultdict(list)
+    roots = []
+    for s in spans:
+        if s.get("parent_id") in by_id:
+            children[s["parent_id"]].append(s)
+        else:
+            roots.append(s)
+    for kids in children.values():
+        kids.sort(key=lambda s: s["start"])
+    roots.sort(key=lambda s: s["start"])
+    return roots, children
+
+
+def critical_path(span: dict, children) -> List[dict]:
+    """Walk back from the end of `span`: the child that finishes last is on the path,
+    then the one that finishes last before that child started, and so on."""
+    path = [span]
+    cursor = span["end"]
+    on_path = []
+    for child in sorted(children[span["span_id"]], key=lambda s: s["end"], reverse=True):
+        if child["end"] <= cursor + 1e-6:
+            on_path.append(child)
+            cursor = child["start"]
+    for child in reversed(on_path):
+        path.extend(critical_path(child, children))
+    span["_critical_children"] = on_path
+    return path
+
+
+def self_time_ms(span: dict) -> float:
+    covered = sum(c["end"] - c["start"] for c in span.get("_critical_children", []))
+    return max(0.0, (span["end"] - span["start"] - covered) * 1000)
+
+
+def render_tree(span: dict, children, critical_ids, origin: float, depth: int = 0, out=sys.stdout):
+    marker = "*" if span["span_id"] in critical_ids else " "
+    offset = (span["start"] - origin) * 1000
+    error = f"  !! {span['error']}" if span.get("error") else ""
+    out.write(f"{marker} {offset:9.1f} ms {span['duration_ms']:9.1f} ms  {'  ' * depth}"
+              f"{span['name']} [{span.get('service', '?')}]{error}\n")
+    for child in children[span["span_id"]]:
+        render_tree(child, children, critical_ids, origin, depth + 1, out)
+
+
+def report(trace_id: str, spans: List[dict], out=sys.stdout):
+    roots, children = build_tree(spans)
+    root = max(roots, key=lambda s: s["end"] - s["start"])
+    path = critical_path(root, children)
+    total = root["duration_ms"] or 1e-9
+
+    out.write(f"\nTrace {trace_id}  {root['name']}  {root['duration_ms']:.1f} ms  ({len(spans)} spans)\n")
+    out.write(f"  {'start':>9}    {'duration':>9}\n")
+    critical_ids = {s["span_id"] for s in path}
+    for r in roots:
+        render_tree(r, children, critical_ids, root["start"], out=out)
+
+    out.write("\n  Critical path (self time)\n")
+    for s in sorted(path, key=self_time_ms, reverse=True):
+        own = self_time_ms(s)
+        if own < 0.05:
+            continue
+        out.write(f"  {own:9.1f} ms {own / total * 100:5.1f}%  {s['name']} [{s.get('service', '?')}]\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Critical path of slow traces")
+    parser.add_argument("files", nargs="+", help="JSONL span files")
+    parser.add_argument("--min-ms", type=float, default=1000, help="Only traces whose root took at least this long")
+    parser.add_argument("--limit", type=int, default=10, help="Slowest N traces")
+    parser.add_argument("--trace", help="Show this trace id only")
+    args = parser.parse_args(argv)
+
+    traces = load_spans(args.files)
+    if args.trace:
+        if args.trace not in traces:
+            sys.exit(f"Trace {args.trace} not found")
+        report(args.trace, traces[args.trace])
+        return
+
+    def root_duration(spans):
+        roots, _ = build_tree(spans)
+        return max(s["duration_ms"] for s in roots)
+
+    slow = [(root_duration(spans), trace_id) for trace_id, spans in traces.items()]
+    slow = sorted((d, t) for d, t in slow if d >= args.min_ms)[::-1][:args.limit]
+    if not slow:
+        print(f"No traces slower than {args.min_ms:.0f} ms in {len(traces)} traces")
+        return
+    for _, trace_id in slow:
+        report(trace_id, traces[trace_id])
+
+
+if __name__ == "__main__":
+    main()
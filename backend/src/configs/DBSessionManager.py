@@ -1,5 +1,11 @@
+import asyncio
 import contextlib
-from typing import Any, AsyncIterator
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, List, Optional
 
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
@@ -7,9 +13,15 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src.configs.config import settings
+from src.services import tracing
+
+logger = logging.getLogger(__name__)
 
 # Define a context variable to store the current task
 # current_task = ContextVar("current_task")
@@ -21,26 +33,302 @@ POSTGRES_HOST = settings.POSTGRES_HOST
 POSTGRES_PORT = settings.POSTGRES_PORT
 DATABASE_URL = "postgresql+asyncpg://" + POSTGRES_USER + ":" + POSTGRES_PASSWORD + "@" + POSTGRES_HOST + ":" + POSTGRES_PORT + "/" + POSTGRES_DB
 
+# Read replicas, same credentials and database as the primary
+REPLICA_URLS = [
+    "postgresql+asyncpg://" + POSTGRES_USER + ":" + POSTGRES_PASSWORD + "@" + host.strip()
+    + ("" if ":" in host else ":" + POSTGRES_PORT) + "/" + POSTGRES_DB
+    for host in settings.DB_REPLICA_HOSTS.split(",") if host.strip()
+]
+
 
 
 Base = declarative_base()
 
+
+class PoolStats:
+    """Connection acquire times, so the pool can be sized from data instead of guesses."""
+
+    # Weight of each new acquire in the moving average, and how fast it fades once acquires stop
+    EWMA_ALPHA = 0.1
+    EWMA_IDLE_DECAY_S = 5.0
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.acquired = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._ewma = 0.0
+        self._ewma_at = time.monotonic()
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self._ewma += self.EWMA_ALPHA * (seconds - self._ewma)
+            self._ewma_at = time.monotonic()
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.acquired += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self._recent.append(seconds)
+
+    def recent_wait(self) -> float:
+        """Moving average of the acquire wait in seconds; cheap enough to read on every request."""
+        idle = time.monotonic() - self._ewma_at
+        return self._ewma * math.exp(-idle / self.EWMA_IDLE_DECAY_S)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            count = self.acquired
+            total, max_wait, timeouts = self.total_wait, self.max_wait, self.timeouts
+
+        def pct(p: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(p / 100 * len(recent)))] * 1000
+
+        return {
+            "acquired": count,
+            "timeouts": timeouts,
+            "avg_ms": round(total / count * 1000, 3) if count else 0.0,
+            "p50_ms": round(pct(50), 3),
+            "p95_ms": round(pct(95), 3),
+            "p99_ms": round(pct(99), 3),
+            "max_ms": round(max_wait * 1000, 3),
+            "recent_ms": round(self.recent_wait() * 1000, 3),
+        }
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waited.
+
+    The wait covers both queueing for a free connection and opening a new
+    one when the pool grows into its overflow.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        span = tracing.start_span("db.pool.acquire", root=False)
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError as e:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            if span is not None:
+                span.finish(e)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        if span is not None:
+            span.finish()
+        return conn
+
+    def recreate(self):
+        # Keep the stats across dispose()/recreate()
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+
+# SQLAlchemy keeps its own pool loggers at WARNING (see sqlalchemy.log); this
+# subclass logs under our module instead, so do the same for it
+logging.getLogger(f"{__name__}.{TimedQueuePool.__name__}").setLevel(logging.WARNING)
+
+
+def create_engine_from_settings(url: str = DATABASE_URL, **overrides: Any) -> AsyncEngine:
+    """Single place where the async engine is configured, driven by the DB_* settings."""
+    server_settings = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+
+    engine_kwargs: dict[str, Any] = {
+        "echo": settings.DB_ECHO,
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": {
+            # asyncpg's own cache of prepared statements, per connection
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            # SQLAlchemy's cache of asyncpg prepared statement objects, per connection
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": server_settings,
+        },
+    }
+    engine_kwargs.update(overrides)
+    return create_async_engine(url, **engine_kwargs)
+
+
+def engine_pool_status(engine: AsyncEngine) -> dict:
+    """Utilisation of an engine's connection pool plus acquire wait times."""
+    pool = engine.pool
+    status = {
+        "pool_class": type(pool).__name__,
+        "size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "timeout_s": settings.DB_POOL_TIMEOUT,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        # QueuePool counts overflow from -size, only the positive part are extra connections
+        "overflow": max(0, pool.overflow()),
+    }
+    status["utilisation"] = round(
+        status["checked_out"] / (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW), 3
+    ) if settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW > 0 else 0.0
+    stats = getattr(pool, "stats", None)
+    status["wait"] = stats.snapshot() if stats is not None else None
+    return status
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        # Without the password, for logs and the status endpoint
+        self.name = url.rsplit("@", 1)[-1]
+        self.engine = create_engine_from_settings(url)
+        self.sessionmaker = async_sessionmaker(autocommit=False, bind=self.engine)
+        self.healthy = True
+        self.lag_s: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_check: Optional[float] = None
+
+
+class ReplicaSet:
+    """Read replicas picked round-robin among the ones that pass the health check."""
+
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(url) for url in urls]
+        self._next = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def pick(self) -> Optional[Replica]:
+        count = len(self.replicas)
+        for _ in range(count):
+            replica = self.replicas[self._next % count]
+            self._next = (self._next + 1) % count
+            if replica.healthy:
+                return replica
+        return None
+
+    async def check(self, replica: Replica):
+        try:
+            async with replica.engine.connect() as conn:
+                result = await asyncio.wait_for(conn.execute(text(
+                    "SELECT pg_is_in_recovery(), "
+                    "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+                )), settings.DB_REPLICA_CHECK_TIMEOUT_S)
+                in_recovery, lag = result.one()
+            # Replay timestamp only moves when the primary writes, so an idle
+            # primary reads as lag; only trust it while in recovery
+            replica.lag_s = float(lag) if in_recovery and lag is not None else None
+            healthy = replica.lag_s is None or replica.lag_s <= settings.DB_REPLICA_MAX_LAG_S
+            replica.last_error = None if healthy else f"replication lag {replica.lag_s:.1f}s"
+        except Exception as e:
+            healthy = False
+            replica.last_error = f"{type(e).__name__}: {e}"
+        if healthy != replica.healthy:
+            log = logger.info if healthy else logger.warning
+            log(f"Read replica {replica.name} is now {'healthy' if healthy else 'unhealthy'}"
+                + ("" if healthy else f": {replica.last_error}"))
+        replica.healthy = healthy
+        replica.last_check = time.time()
+
+    async def check_all(self):
+        await asyncio.gather(*(self.check(r) for r in self.replicas))
+
+    async def _run(self, interval: float):
+        while True:
+            await self.check_all()
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float):
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def status(self) -> List[dict]:
+        return [
+            {
+                "replica": r.name,
+                "healthy": r.healthy,
+                "lag_s": r.lag_s,
+                "last_error": r.last_error,
+                "last_check": r.last_check,
+                "pool": engine_pool_status(r.engine),
+            }
+            for r in self.replicas
+        ]
+
 # Heavily inspired by https://praciano.com.br/fastapi-and-async-sqlalchemy-20-with-pytest-done-right.html
 
 
 class DatabaseSessionManager:
-    def __init__(self, host: str, engine_kwargs: dict[str, Any] = {}):
-        self._engine = create_async_engine(host, **engine_kwargs)
+    def __init__(self, host: str, engine_kwargs: dict[str, Any] = {}, replica_urls: List[str] = []):
+        self._engine = create_engine_from_settings(host, **engine_kwargs)
         self._sessionmaker = async_sessionmaker(autocommit=False, bind=self._engine)
+        self.replicas = ReplicaSet(replica_urls)
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        return self._engine
+
+    def pool_status(self) -> dict:
+        """Current utilisation of the primary's connection pool plus acquire wait times."""
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        return engine_pool_status(self._engine)
+
+    def pool_wait(self) -> float:
+        """Recent acquire wait on the primary's pool, in seconds."""
+        stats = getattr(self._engine.pool, "stats", None) if self._engine is not None else None
+        return stats.recent_wait() if stats is not None else 0.0
 
     async def close(self):
         if self._engine is None:
             raise Exception("DatabaseSessionManager is not initialized")
+        await self.replicas.close()
         await self._engine.dispose()
 
         self._engine = None
         self._sessionmaker = None
 
+    async def prewarm(self, connections: int) -> int:
+        """Open up to `connections` pooled connections concurrently so the first requests don't pay for them."""
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        pool_size = getattr(self._engine.pool, "size", lambda: connections)()
+        connections = min(connections, pool_size)
+        if connections <= 0:
+            return 0
+
+        async def open_one():
+            conn = await self._engine.connect()
+            await conn.execute(text("SELECT 1"))
+            return conn
+
+        # Hold them all open at once, otherwise the pool hands back the same one
+        opened = await asyncio.gather(*(open_one() for _ in range(connections)))
+        for conn in opened:
+            await conn.close()
+        return len(opened)
+
     @contextlib.asynccontextmanager
     async def connect(self) -> AsyncIterator[AsyncConnection]:
         if self._engine is None:
@@ -67,9 +355,24 @@ class DatabaseSessionManager:
         finally:
             await session.close()
 
+    @contextlib.asynccontextmanager
+    async def read_session(self) -> AsyncIterator[AsyncSession]:
+        """Session on a healthy read replica, or on the primary when there is none."""
+        if self._sessionmaker is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+
+        replica = self.replicas.pick()
+        session = replica.sessionmaker() if replica is not None else self._sessionmaker()
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
 
-# sessionmanager = DatabaseSessionManager(DATABASE_URL, {"echo": settings.echo_sql})
-sessionmanager = DatabaseSessionManager(DATABASE_URL, {"echo": True})
+sessionmanager = DatabaseSessionManager(DATABASE_URL, replica_urls=REPLICA_URLS)
 
 
 async def get_db_session():
@@ -1,11 +1,25 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from typing import Optional
-from pydantic_settings import BaseSettings
 import os
-from dotenv import load_dotenv
-load_dotenv(".env",verbose=True)
+import tempfile
 
-print("DEBUG = ",  os.getenv("DATABASE_URL"))
+# Containers get their environment from compose; .env is only read for local
+# runs and can be skipped entirely with LOAD_DOTENV=0
+if os.getenv("LOAD_DOTENV", "1") != "0":
+    from dotenv import load_dotenv
+    load_dotenv(".env")
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+# "full": seed on startup (development). "fast": no seeding, ready as soon as
+# the pool is warm (rolling restarts behind a load balancer).
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "full")
 
 class Settings(BaseModel):
     POSTGRES_HOST: Optional[str] = os.getenv("POSTGRES_HOST")
@@ -14,7 +28,143 @@ class Settings(BaseModel):
     POSTGRES_DB: Optional[str] = os.getenv("POSTGRES_DB")
     POSTGRES_PORT: Optional[str] = os.getenv("POSTGRES_PORT")
 
+    # Startup
+    STARTUP_PROFILE: str = STARTUP_PROFILE
+    SEED_ON_STARTUP: bool = env_bool("SEED_ON_STARTUP", STARTUP_PROFILE == "full")
+    DB_POOL_PREWARM: int = int(os.getenv("DB_POOL_PREWARM", "0" if STARTUP_PROFILE == "full" else "5"))
+
+    # Database engine
+    DB_ECHO: bool = env_bool("DB_ECHO", False)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = env_bool("DB_POOL_PRE_PING", False)
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+    # Server-side statement_timeout for every connection, 0 disables it.
+    # Routes can tighten it with src.configs.database.get_db_with_timeout
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    DB_LIST_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_LIST_STATEMENT_TIMEOUT_MS", "10000"))
+
+    # Read replicas: comma separated host[:port], empty sends everything to the primary
+    DB_REPLICA_HOSTS: str = os.getenv("DB_REPLICA_HOSTS", "")
+    DB_REPLICA_CHECK_INTERVAL_S: float = float(os.getenv("DB_REPLICA_CHECK_INTERVAL_S", "5"))
+    DB_REPLICA_CHECK_TIMEOUT_S: float = float(os.getenv("DB_REPLICA_CHECK_TIMEOUT_S", "2"))
+    DB_REPLICA_MAX_LAG_S: float = float(os.getenv("DB_REPLICA_MAX_LAG_S", "10"))
+    # After a write, reads from the same client go to the primary for this long
+    DB_READ_YOUR_WRITES_S: float = float(os.getenv("DB_READ_YOUR_WRITES_S", "5"))
+    # Proxies (comma separated IPs or CIDRs) whose X-Forwarded-For is believed for read-your-writes
+    DB_TRUSTED_PROXIES: str = os.getenv("DB_TRUSTED_PROXIES", "")
+
+    # Admission control and load shedding per route class (src/services/admission.py)
+    ADMISSION_ENABLED: bool = env_bool("ADMISSION_ENABLED", True)
+    ADMISSION_CRITICAL_LIMIT: int = int(os.getenv("ADMISSION_CRITICAL_LIMIT", "20"))
+    ADMISSION_CRITICAL_QUEUE: int = int(os.getenv("ADMISSION_CRITICAL_QUEUE", "500"))
+    ADMISSION_DISPATCHER_LIMIT: int = int(os.getenv("ADMISSION_DISPATCHER_LIMIT", "12"))
+    ADMISSION_DISPATCHER_QUEUE: int = int(os.getenv("ADMISSION_DISPATCHER_QUEUE", "100"))
+    ADMISSION_ANALYTICS_LIMIT: int = int(os.getenv("ADMISSION_ANALYTICS_LIMIT", "4"))
+    ADMISSION_ANALYTICS_QUEUE: int = int(os.getenv("ADMISSION_ANALYTICS_QUEUE", "20"))
+    ADMISSION_QUEUE_TIMEOUT_S: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "5"))
+    # Recent DB pool acquire wait above which the class is shed; writes never are
+    ADMISSION_SHED_DISPATCHER_WAIT_MS: float = float(os.getenv("ADMISSION_SHED_DISPATCHER_WAIT_MS", "500"))
+    ADMISSION_SHED_ANALYTICS_WAIT_MS: float = float(os.getenv("ADMISSION_SHED_ANALYTICS_WAIT_MS", "100"))
+    ADMISSION_RETRY_AFTER_S: int = int(os.getenv("ADMISSION_RETRY_AFTER_S", "2"))
+
+    # Arrow / Parquet exports (src/services/export.py)
+    # Rows per cursor fetch, Arrow record batch and Parquet row group
+    EXPORT_BATCH_ROWS: int = int(os.getenv("EXPORT_BATCH_ROWS", "10000"))
+    EXPORT_PARQUET_COMPRESSION: str = os.getenv("EXPORT_PARQUET_COMPRESSION", "zstd")
+
+    # Response compression (src/services/compression.py)
+    COMPRESSION_ENABLED: bool = env_bool("COMPRESSION_ENABLED", True)
+    # Smaller bodies are not worth the CPU or the header bytes
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "5"))
+    COMPRESSION_ZSTD_LEVEL: int = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+    # Idempotency-Key for POST /api/alerts and /api/devices (src/services/idempotency.py)
+    IDEMPOTENCY_ENABLED: bool = env_bool("IDEMPOTENCY_ENABLED", True)
+    IDEMPOTENCY_TTL_S: int = int(os.getenv("IDEMPOTENCY_TTL_S", "86400"))
+    # A key whose request has not answered after this long can be claimed by a retry
+    IDEMPOTENCY_LOCK_TIMEOUT_S: int = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT_S", "60"))
+    IDEMPOTENCY_CACHE_SIZE: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+
+    # SQL instrumentation (src/services/query_stats.py)
+    SQL_STATS_ENABLED: bool = env_bool("SQL_STATS_ENABLED", True)
+    SQL_STATS_HEADERS: bool = env_bool("SQL_STATS_HEADERS", False)
+    SQL_STATS_BUFFER: int = int(os.getenv("SQL_STATS_BUFFER", "500"))
+    SQL_N_PLUS_ONE_THRESHOLD: int = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "3"))
+    SQL_SLOW_QUERY_MS: float = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+    SQL_EXPLAIN_SLOW: bool = env_bool("SQL_EXPLAIN_SLOW", True)
+
+    # In-memory board of active emergencies (src/services/alert_board.py)
+    ALERT_BOARD_ENABLED: bool = env_bool("ALERT_BOARD_ENABLED", True)
+    ALERT_BOARD_PAGE_MAX: int = int(os.getenv("ALERT_BOARD_PAGE_MAX", "500"))
+
+    # Emergency partitions and archival (src/services/emergency_partitions.py)
+    EMERGENCY_ARCHIVE_AFTER_DAYS: float = float(os.getenv("EMERGENCY_ARCHIVE_AFTER_DAYS", "90"))
+    EMERGENCY_PARTITIONS_AHEAD: int = int(os.getenv("EMERGENCY_PARTITIONS_AHEAD", "3"))
+    # 0 runs it only at startup
+    EMERGENCY_ARCHIVE_INTERVAL_S: float = float(os.getenv("EMERGENCY_ARCHIVE_INTERVAL_S", "3600"))
+
+    # Response-time analytics rollups (src/services/analytics_rollups.py)
+    # 0 refreshes only at startup and on POST /api/analytics/refresh
+    ANALYTICS_REFRESH_INTERVAL_S: float = float(os.getenv("ANALYTICS_REFRESH_INTERVAL_S", "60"))
+    ANALYTICS_REFRESH_OVERLAP_S: float = float(os.getenv("ANALYTICS_REFRESH_OVERLAP_S", "300"))
+    # Day, week and month buckets start at midnight in this time zone
+    ANALYTICS_TIMEZONE: str = os.getenv("ANALYTICS_TIMEZONE", "Europe/Madrid")
+
+    # Emergency density heatmap tiles (src/services/heatmap_tiles.py)
+    # Cells per tile side; a divisor of 256
+    HEATMAP_GRID: int = int(os.getenv("HEATMAP_GRID", "64"))
+    HEATMAP_MAX_ZOOM: int = int(os.getenv("HEATMAP_MAX_ZOOM", "18"))
+    HEATMAP_MEMORY_TILES: int = int(os.getenv("HEATMAP_MEMORY_TILES", "1024"))
+    # Empty disables the disk cache
+    HEATMAP_CACHE_DIR: str = os.getenv("HEATMAP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "serp-heatmap-tiles"))
+    HEATMAP_CACHE_TTL_S: float = float(os.getenv("HEATMAP_CACHE_TTL_S", "600"))
+    # Oldest tiles are deleted from the disk cache past this size
+    HEATMAP_CACHE_MAX_MB: float = float(os.getenv("HEATMAP_CACHE_MAX_MB", "256"))
+
+    # Viewport queries and marker clustering (src/services/map_clusters.py)
+    MAP_CLUSTER_CELL_PX: int = int(os.getenv("MAP_CLUSTER_CELL_PX", "60"))
+    # Above this zoom every point is returned on its own, up to MAP_MAX_FEATURES per layer
+    MAP_CLUSTER_MAX_ZOOM: int = int(os.getenv("MAP_CLUSTER_MAX_ZOOM", "16"))
+    MAP_MAX_FEATURES: int = int(os.getenv("MAP_MAX_FEATURES", "2000"))
+
+    # Write-behind buffer for GPS reports (src/services/location_buffer.py)
+    # false writes every accepted report right away (the dead-band still applies)
+    GPS_BUFFER_ENABLED: bool = env_bool("GPS_BUFFER_ENABLED", True)
+    GPS_FLUSH_INTERVAL_MS: int = int(os.getenv("GPS_FLUSH_INTERVAL_MS", "1000"))
+    GPS_BUFFER_MAX_PENDING: int = int(os.getenv("GPS_BUFFER_MAX_PENDING", "5000"))
+    GPS_DEADBAND_M: float = float(os.getenv("GPS_DEADBAND_M", "10"))
+    GPS_DEADBAND_HEADING_DEG: float = float(os.getenv("GPS_DEADBAND_HEADING_DEG", "15"))
+    GPS_DEADBAND_MAX_AGE_S: float = float(os.getenv("GPS_DEADBAND_MAX_AGE_S", "60"))
+
+    # Offline reverse geocoding of addresses (src/services/reverse_geocoder.py)
+    # Missing file: geocoding off
+    GEOCODER_GAZETTEER_PATH: str = os.getenv("GEOCODER_GAZETTEER_PATH", "data/gazetteer.csv")
+    GEOCODER_MAX_DISTANCE_M: float = float(os.getenv("GEOCODER_MAX_DISTANCE_M", "150"))
+    # About 11 m of latitude
+    GEOCODER_CELL_DEG: float = float(os.getenv("GEOCODER_CELL_DEG", "0.0001"))
+    GEOCODER_MEMO_SIZE: int = int(os.getenv("GEOCODER_MEMO_SIZE", "100000"))
+    GEOCODER_QUEUE_MAX: int = int(os.getenv("GEOCODER_QUEUE_MAX", "10000"))
+    GEOCODER_BATCH_SIZE: int = int(os.getenv("GEOCODER_BATCH_SIZE", "200"))
+
+    # Duplicate emergency reports (src/services/duplicate_detector.py)
+    # "flag" creates the report with duplicate_of set, "merge" returns the original instead
+    DUPLICATE_ACTION: str = os.getenv("DUPLICATE_ACTION", "flag")
+    DUPLICATE_RADIUS_M: float = float(os.getenv("DUPLICATE_RADIUS_M", "150"))
+    DUPLICATE_WINDOW_MIN: float = float(os.getenv("DUPLICATE_WINDOW_MIN", "15"))
+
     class Config:
         env_file = "../../.env"
 
-settings = Settings()
\ No newline at end of file
+    @model_validator(mode="after")
+    def check_heatmap_grid(self):
+        # Every cell is drawn as a square block of pixels of the 256 px tile
+        if self.HEATMAP_GRID <= 0 or 256 % self.HEATMAP_GRID:
+            raise ValueError(f"HEATMAP_GRID must divide 256, got {self.HEATMAP_GRID}")
+        return self
+
+settings = Settings()
@@ -1,9 +1,16 @@
+import contextlib
+import ipaddress
+import time
+from typing import Dict, Optional
+
 from fastapi import Depends, Request
 
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
 
 from src.configs.DBSessionManager import sessionmanager
+from src.configs.config import settings
 
 Base = declarative_base()
 
@@ -26,4 +33,119 @@ Base = declarative_base()
 
 async def get_db():
     async with sessionmanager.session() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+# Read-your-writes: a client that just wrote reads from the primary for
+# DB_READ_YOUR_WRITES_S, so replica lag never hides its own changes. Clients
+# are told apart by X-Client-Id when sent, else by address. Behind a proxy
+# the address is the proxy's, shared by every client, so for connections from
+# DB_TRUSTED_PROXIES the client address is taken from X-Forwarded-For; a
+# proxied request without it gets no stickiness at all.
+_recent_writers: Dict[str, float] = {}
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+_trusted_proxies = [ipaddress.ip_network(p.strip(), strict=False)
+                    for p in settings.DB_TRUSTED_PROXIES.split(",") if p.strip()]
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_proxies)
+
+
+def _client_key(headers, client) -> Optional[str]:
+    """Who made the request, or None when that cannot be told apart from other clients."""
+    client_id = headers.get("x-client-id")
+    if client_id:
+        return client_id
+    if not client:
+        return None
+    address = client[0]
+    if not _is_trusted_proxy(address):
+        return address
+    # The nearest hop not added by one of our proxies is the client
+    for hop in reversed((headers.get("x-forwarded-for") or "").split(",")):
+        hop = hop.strip()
+        if hop and not _is_trusted_proxy(hop):
+            return hop
+    return None
+
+
+def note_write(key: Optional[str]):
+    if key is None:
+        return
+    now = time.monotonic()
+    _recent_writers[key] = now + settings.DB_READ_YOUR_WRITES_S
+    # Forget expired clients once in a while instead of on every write
+    if len(_recent_writers) > 1000:
+        for k in [k for k, until in _recent_writers.items() if until < now]:
+            del _recent_writers[k]
+
+
+def wrote_recently(key: Optional[str]) -> bool:
+    if key is None:
+        return False
+    until = _recent_writers.get(key)
+    return until is not None and until > time.monotonic()
+
+
+class ReadYourWritesMiddleware:
+    """Remembers clients that made a successful write request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in _SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", ())}
+                note_write(_client_key(headers, scope.get("client")))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+@contextlib.asynccontextmanager
+async def _read_session(request: Request):
+    if not sessionmanager.replicas.replicas or wrote_recently(_client_key(request.headers, request.client)):
+        async with sessionmanager.session() as session:
+            yield session
+    else:
+        async with sessionmanager.read_session() as session:
+            yield session
+
+
+async def get_read_db(request: Request):
+    """Session for read-only routes: a healthy replica unless this client wrote recently."""
+    async with _read_session(request) as session:
+        yield session
+
+
+def get_db_with_timeout(timeout_ms: int, read_only: bool = False):
+    """Session dependency whose statements are cancelled by Postgres after `timeout_ms`.
+
+    Uses SET LOCAL, so the limit lasts for the first transaction of the
+    request, which for read-only routes is all of it. 0 leaves the engine
+    default (DB_STATEMENT_TIMEOUT_MS) in place. With `read_only` the session
+    comes from `get_read_db`'s replica routing.
+    """
+    timeout_ms = int(timeout_ms)
+
+    async def get_db_limited(request: Request):
+        if read_only:
+            session_context = _read_session(request)
+        else:
+            session_context = sessionmanager.session()
+        async with session_context as session:
+            if timeout_ms > 0:
+                await session.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+            yield session
+
+    return get_db_limited
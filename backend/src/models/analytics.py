@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Enum, Integer, Float, DateTime, String
+from sqlmodel import Field, SQLModel
+from typing import Optional
+from datetime import datetime
+
+from src.models.emergency import EmergencyType, PriorityType
+
+
+class EmergencyRollupHourly(SQLModel, table=True):
+    # Incident volume and time to resolve per hour (of time_created), type and
+    # priority. Maintained by src/services/analytics_rollups.py, never written
+    # by the routes
+    __tablename__ = "emergency_rollup_hourly"
+
+    bucket: datetime = Field(sa_column=Column(DateTime(timezone=True), primary_key=True))
+    emergency_type: EmergencyType = Field(sa_column=Column(Enum(EmergencyType), primary_key=True))
+    priority: PriorityType = Field(sa_column=Column(Enum(PriorityType), primary_key=True))
+
+    incidents: int = Field(sa_column=Column(Integer, nullable=False))
+    resolved: int = Field(sa_column=Column(Integer, nullable=False))
+    # Seconds from time_created to time_updated of the resolved ones; the sum
+    # (not the average) so buckets can be merged
+    resolve_seconds_sum: float = Field(sa_column=Column(Float, nullable=False))
+    resolve_seconds_min: Optional[float] = Field(sa_column=Column(Float, nullable=True))
+    resolve_seconds_max: Optional[float] = Field(sa_column=Column(Float, nullable=True))
+
+
+class AnalyticsWatermark(SQLModel, table=True):
+    # Up to when each rollup has seen changes
+    __tablename__ = "analytics_watermark"
+
+    name: str = Field(sa_column=Column(String(64), primary_key=True))
+    value: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Enum, Integer, Float, ForeignKey, DateTime, func
+from sqlalchemy import Column, String, Enum, Integer, Float, ForeignKey, ForeignKeyConstraint, DateTime, Index, UniqueConstraint, event, func, text
 # from sqlalchemy.dialects.postgresql import UUID
 from uuid import uuid4, UUID
 import enum
@@ -10,8 +10,8 @@ from src.models.resource import Resource
 from pydantic import BaseModel
 from typing import Optional
 from sqlmodel import Field, Session, SQLModel, create_engine, select, Relationship
-from sqlalchemy.orm import relationship
-from datetime import datetime
+from sqlalchemy.orm import Session as OrmSession, relationship
+from datetime import datetime, timezone
 
 from src.models.emergencyresourceslink import EmergencyResourceLink
 
@@ -32,8 +32,40 @@ class StatusType(str, enum.Enum):
     Solved = "Resolt"
     Archived = "Arxivad"
 
+class EmergencyId(SQLModel, table=True):
+    # Every emergency id, hot or archived. emergency is partitioned, so its
+    # primary key has to be (id, time_created) and cannot make id unique or be
+    # referenced by id alone; this plain table does both. emergency and
+    # emergency_archive reference (id, time_created) here, so an id can only
+    # be used by one row, and links and duplicate_of reference id. Deleting
+    # the row here deletes the emergency and its links.
+    __tablename__ = "emergency_id"
+    __table_args__ = (
+        UniqueConstraint("id", "time_created", name="emergency_id_id_time_created_key"),
+    )
+
+    id: uuid_pkg.UUID = Field(primary_key=True, nullable=False)
+    time_created: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+
+
 class Emergency(SQLModel, table=True):
     # __tablename__ = "emergencies"
+    # Range-partitioned by time_created in the database (see
+    # src/services/emergency_partitions.py); the primary key there is
+    # (id, time_created), and emergency_id keeps id unique.
+    # Active emergencies are a small, hot slice of the table: partial indexes
+    # keep them ordered by priority and age without indexing the history
+    __table_args__ = (
+        # Checked at commit: a flush inserts the emergency_id row in no set order
+        ForeignKeyConstraint(["id", "time_created"], ["emergency_id.id", "emergency_id.time_created"],
+                             ondelete="CASCADE", deferrable=True, initially="DEFERRED",
+                             name="emergency_id_time_created_fkey"),
+        Index("ix_emergency_active_priority_time", "priority", "time_created", postgresql_where=text("status = 'Active'")),
+        Index("ix_emergency_active_time", "time_created", postgresql_where=text("status = 'Active'")),
+        # Rows created or changed since the last analytics refresh
+        Index("ix_emergency_time_created", "time_created"),
+        Index("ix_emergency_time_updated", "time_updated"),
+    )
 
     id: uuid_pkg.UUID = Field(
         default_factory=uuid_pkg.uuid4,
@@ -47,22 +79,34 @@ class Emergency(SQLModel, table=True):
     emergency_type: EmergencyType = Field(sa_column=Column(Enum(EmergencyType), default=EmergencyType.Altres))
     status: StatusType = Field(sa_column=Column(Enum(StatusType), default=StatusType.Active))
 
-    location_emergency: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="location.id", ondelete="SET NULL")
-    address_emergency: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="address.id", ondelete="SET NULL")
+    location_emergency: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="location.id", ondelete="SET NULL", index=True)
+    address_emergency: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="address.id", ondelete="SET NULL", index=True)
 
-    resource_id: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="resource.id", ondelete="SET NULL")
-    location_resource: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="location.id", ondelete="SET NULL")
-    address_resource: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="address.id", ondelete="SET NULL")
+    resource_id: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="resource.id", ondelete="SET NULL", index=True)
+    location_resource: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="location.id", ondelete="SET NULL", index=True)
+    address_resource: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="address.id", ondelete="SET NULL", index=True)
 
-    destination_id: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="resource.id", ondelete="SET NULL")
-    location_destination: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="location.id", ondelete="SET NULL")
-    address_destination: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="address.id", ondelete="SET NULL")
+    destination_id: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="resource.id", ondelete="SET NULL", index=True)
+    location_destination: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="location.id", ondelete="SET NULL", index=True)
+    address_destination: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="address.id", ondelete="SET NULL", index=True)
 
     name_contact: str = Field(sa_column=Column(String(128)))
     telephone_contact: str = Field(sa_column=Column(String(128)))
     id_contact: str = Field(sa_column=Column(String(128)))
 
-    time_created: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=True), server_default=func.now()))
+    # First report of the same incident, when this one was flagged as a duplicate (hot or archived)
+    duplicate_of: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="emergency_id.id", ondelete="SET NULL",
+                                                  nullable=True, index=True)
+
+    time_created: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), sa_column=Column(DateTime(timezone=True), nullable=False, server_default=func.now()))
     time_updated: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True), onupdate=func.now()))
 
-    resources: list[Resource] = Relationship(back_populates="emergencies", link_model=EmergencyResourceLink)
\ No newline at end of file
+    resources: list[Resource] = Relationship(back_populates="emergencies", link_model=EmergencyResourceLink)
+
+
+@event.listens_for(OrmSession, "before_flush")
+def register_emergency_ids(session, flush_context, instances):
+    """Add the emergency_id row of every new Emergency to the same flush."""
+    for obj in list(session.new):
+        if isinstance(obj, Emergency):
+            session.add(EmergencyId(id=obj.id, time_created=obj.time_created))
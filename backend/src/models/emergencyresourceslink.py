@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Column, ForeignKey, Index, Uuid
 from typing import List, Optional
 
 import uuid as uuid_pkg
@@ -12,5 +13,14 @@ import uuid as uuid_pkg
 
 
 class EmergencyResourceLink(SQLModel, table=True):
-    emergency_id: uuid_pkg.UUID | None = Field(default=None, foreign_key="emergency.id", primary_key=True)
+    # The primary key serves lookups by emergency; this one, lookups by resource
+    __table_args__ = (
+        Index("ix_emergencyresourcelink_resource_id_emergency_id", "resource_id", "emergency_id"),
+    )
+
+    # emergency.id is only there for the ORM relationship: the database
+    # enforces emergency_id.id, as emergency cannot be referenced by id alone
+    emergency_id: uuid_pkg.UUID | None = Field(default=None, sa_column=Column(
+        Uuid, ForeignKey("emergency.id"),
+        ForeignKey("emergency_id.id", ondelete="CASCADE", deferrable=True, initially="DEFERRED"), primary_key=True))
     resource_id: uuid_pkg.UUID | None = Field(default=None, foreign_key="resource.id", primary_key=True)
@@ -0,0 +1,25 @@
+from sqlalchemy import JSON, Column, DateTime, Index, LargeBinary, SmallInteger, String
+from sqlmodel import Field, SQLModel
+from typing import List, Optional
+from datetime import datetime
+
+
+class IdempotencyKey(SQLModel, table=True):
+    # First response to a POST sent with an Idempotency-Key header, replayed
+    # to retries. Written by src/services/idempotency.py; rows older than
+    # IDEMPOTENCY_TTL_S are purged
+    __tablename__ = "idempotency_key"
+    __table_args__ = (
+        Index("ix_idempotency_key_created_at", "created_at"),
+    )
+
+    key: str = Field(sa_column=Column(String(255), primary_key=True))
+    # SHA-256 of method, path and body: the same key with another request is refused
+    fingerprint: bytes = Field(sa_column=Column(LargeBinary(32), nullable=False))
+    created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+    # NULL while the first request is still running
+    status_code: Optional[int] = Field(default=None, sa_column=Column(SmallInteger, nullable=True))
+    # [name, value] pairs of the response headers, minus the ones that only
+    # describe that connection (see src/services/idempotency.py)
+    headers: Optional[List[List[str]]] = Field(default=None, sa_column=Column(JSON, nullable=True))
+    body: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary, nullable=True))
@@ -18,7 +18,7 @@
 #     time_created = Column(DateTime(timezone=True), server_default=func.now())
 #     time_updated = Column(DateTime(timezone=True), onupdate=func.now())
 
-from sqlalchemy import Column, Float, DateTime, func
+from sqlalchemy import Column, Float, DateTime, Index, func, text
 # from sqlalchemy.dialects.postgresql import UUID
 import uuid as uuid_pkg
 from src.configs.database import Base
@@ -43,6 +43,12 @@ from sqlmodel import Field, Session, SQLModel, create_engine, select
 
 class Location(SQLModel, table=True):
     # __tablename__ = "locations"
+    # Viewport queries: point(longitude, latitude) <@ box(...) (src/services/map_clusters.py)
+    __table_args__ = (
+        Index("ix_location_point", text("point(longitude, latitude)"), postgresql_using="gist"),
+        # Time-range exports (src/services/export.py)
+        Index("ix_location_time_created", "time_created"),
+    )
 
     # id: uuid.UUID = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     id: uuid_pkg.UUID = Field(
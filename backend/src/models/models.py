@@ -1,7 +1,9 @@
 from src.configs.database import Base
 
 from src.models.user import User
-from src.models.emergency import Emergency
+from src.models.emergency import Emergency, EmergencyId
 from src.models.resource import Resource
 from src.models.address import Address
 from src.models.location import Location
+from src.models.analytics import EmergencyRollupHourly, AnalyticsWatermark
+from src.models.idempotency import IdempotencyKey
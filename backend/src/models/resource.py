@@ -69,11 +69,11 @@ class Resource(SQLModel, table=True):
     )
     resource_type: Optional[str] = Field(sa_column=Column(String(128), nullable=False))
 
-    actual_address: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="address.id", ondelete="SET NULL")
-    actual_location: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="location.id", ondelete="SET NULL")
+    actual_address: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="address.id", ondelete="SET NULL", index=True)
+    actual_location: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="location.id", ondelete="SET NULL", index=True)
 
-    normal_address: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="address.id", ondelete="SET NULL")
-    normal_location: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="location.id", ondelete="SET NULL")
+    normal_address: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="address.id", ondelete="SET NULL", index=True)
+    normal_location: Optional[uuid_pkg.UUID] = Field(default=None, foreign_key="location.id", ondelete="SET NULL", index=True)
 
     status: Optional[ResourceStatusEnum] = Field(sa_column=Column(Enum(ResourceStatusEnum), default=ResourceStatusEnum.UNKNOWN))
     responsible: Optional[str] = Field(sa_column=Column(String(128), nullable=False))
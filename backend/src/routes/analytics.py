@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import settings
+from src.configs.database import get_read_db
+from src.configs.DBSessionManager import sessionmanager
+from src.models.analytics import AnalyticsWatermark, EmergencyRollupHourly
+from src.models.emergency import EmergencyType, PriorityType
+from src.services.analytics_rollups import rollup_refresh_job
+
+router = APIRouter()
+
+Rollup = EmergencyRollupHourly
+
+
+# RESPONSE TIMES
+@router.get("/api/analytics/response-times", tags=["Analytics"])
+async def response_times(
+    session: Annotated[AsyncSession, Depends(get_read_db)],
+    bucket: Literal["hour", "day", "week", "month"] = "day",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    emergency_type: Optional[EmergencyType] = None,
+    priority: Optional[PriorityType] = None,
+):
+    """Incidents opened and time to resolve per bucket, emergency type and priority.
+
+    Served from the hourly rollups, so it is as fresh as the last refresh
+    (`refreshed_at`). Defaults to the last 30 days.
+    """
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(days=30)
+    if since.tzinfo is None or until.tzinfo is None:
+        raise HTTPException(status_code=400, detail="since and until need a time zone offset")
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+
+    period = func.date_trunc(bucket, Rollup.bucket, settings.ANALYTICS_TIMEZONE).label("bucket")
+    resolved = func.sum(Rollup.resolved)
+    query = (
+        select(
+            period,
+            Rollup.emergency_type,
+            Rollup.priority,
+            func.sum(Rollup.incidents).label("incidents"),
+            resolved.label("resolved"),
+            (func.sum(Rollup.resolve_seconds_sum) / func.nullif(resolved, 0)).label("avg_resolve_s"),
+            func.min(Rollup.resolve_seconds_min).label("min_resolve_s"),
+            func.max(Rollup.resolve_seconds_max).label("max_resolve_s"),
+        )
+        .where(Rollup.bucket >= since, Rollup.bucket < until)
+        .group_by(period, Rollup.emergency_type, Rollup.priority)
+        .order_by(period, Rollup.emergency_type, Rollup.priority)
+    )
+    if emergency_type is not None:
+        query = query.where(Rollup.emergency_type == emergency_type)
+    if priority is not None:
+        query = query.where(Rollup.priority == priority)
+
+    result = await session.execute(query)
+    items = [
+        {
+            "bucket": row.bucket,
+            "emergency_type": row.emergency_type.value,
+            "priority": row.priority.value,
+            "incidents": row.incidents,
+            "resolved": row.resolved,
+            "avg_resolve_s": row.avg_resolve_s,
+            "min_resolve_s": row.min_resolve_s,
+            "max_resolve_s": row.max_resolve_s,
+        }
+        for row in result
+    ]
+    refreshed_at = (await session.execute(
+        select(AnalyticsWatermark.value).where(AnalyticsWatermark.name == Rollup.__tablename__)
+    )).scalar()
+    return ORJSONResponse({
+        "bucket": bucket,
+        "since": since,
+        "until": until,
+        "refreshed_at": refreshed_at,
+        "items": items,
+    })
+
+
+@router.post("/api/analytics/refresh", tags=["Analytics"])
+async def refresh_rollups(full: bool = False):
+    """Refresh the rollups now; `full` recomputes every hour instead of the changed ones"""
+    await rollup_refresh_job.run_once(sessionmanager.engine, full)
+    return rollup_refresh_job.status()
+
+
+@router.get("/api/analytics/refresh", tags=["Analytics"])
+async def refresh_status():
+    """Last refresh of the rollups"""
+    return rollup_refresh_job.status()
@@ -2,42 +2,59 @@ from typing import List, Optional, Dict
 from pydantic import BaseModel, Field # type: ignore No warning about pydantic. Imported in requirements.txt
 from datetime import datetime
 import uuid
-from fastapi import APIRouter, HTTPException, Depends # type: ignore No warning about pydantic. Imported in requirements.txt
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response # type: ignore No warning about pydantic. Imported in requirements.txt
 # from src.routes.resources import devices
 from src.routes.qosod import QoSConfig, activate_device_qos, deactivate_device_qos
 
 # Importar servicio de asignaciones de emergencia
 # Esto es una suposición basada en el uso - necesitarás crear este módulo si no existe
 from src.services.emergency_assignments import emergency_assignments
-from src.configs.database import get_db
+from src.configs.database import get_db, get_db_with_timeout, get_read_db
+from src.configs.config import settings
 from typing import Annotated
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import delete, select
 
 
 from enum import Enum
 
-from src.models.emergency import Emergency, EmergencyType, StatusType, PriorityType
+from src.models.emergency import Emergency, EmergencyId, EmergencyType, StatusType, PriorityType
 from src.models.resource import Resource
 from src.models.location import Location
 from src.models.address import Address
 
 import json
+import orjson
 
 import uuid as uuid_pkg
 from fastapi.responses import ORJSONResponse
+from src.services.serializer import ORJSON_OPTIONS, _default, etag_response, list_response, serializer_for
+from src.services.emergency_partitions import archive_table
+from src.services.alert_board import alert_board
+from src.services.heatmap_tiles import heatmap_tiles
+from src.services.reverse_geocoder import reverse_geocoder
+from src.services.duplicate_detector import duplicate_detector
 
 router = APIRouter()
 
+# Full-table listings get a tighter statement timeout than the rest
+get_list_db = get_db_with_timeout(settings.DB_LIST_STATEMENT_TIMEOUT_MS, read_only=True)
+
 # LIST ALL EMERGENCIES
 @router.get("/api/alerts", response_model=List[Emergency], tags=["Alerts"])
-async def list_alerts(session: Annotated[AsyncSession, Depends(get_db)]):
-    """List all alerts"""
+async def list_alerts(session: Annotated[AsyncSession, Depends(get_list_db)], request: Request, archived: bool = False):
+    """List all alerts. Archived (old, closed) ones are only listed with ?archived=true"""
+    if archived:
+        result = await session.execute(select(archive_table))
+        # Core rows key their columns by quoted_name, which orjson does not take as str
+        fields = [str(f) for f in result.keys()]
+        content = orjson.dumps([dict(zip(fields, row)) for row in result], default=_default, option=ORJSON_OPTIONS)
+        return Response(content=content, media_type="application/json")
     # return [Alert(**alert.dict()) for alert in alerts.values()]
     emergencies = await session.execute(select(Emergency))
     # return emergencies
     items = emergencies.scalars().all()
-    return items
+    return list_response(Emergency, items, request)
 
 
 # CREATE EMERGENCY
@@ -48,46 +65,114 @@ class EmergencyRequest(BaseModel):
     longitude: float = Field(..., ge=-180, le=180)
     emergency_type: EmergencyType
     priority: PriorityType
+    # Create it even if it looks like another report of a recent emergency
+    allow_duplicate: bool = False
 
 
 @router.post("/api/alerts", response_model=Emergency, status_code=201, tags=["Alerts"])
-async def create_alert(request: EmergencyRequest, db: AsyncSession = Depends(get_db)):
-    """Create a new alert"""
-    async with db.begin():  # Ensures rollback on failure
-        location = Location(
-            latitude=request.latitude,
-            longitude=request.longitude
-        )
-        db.add(location)
-        await db.flush()  # Get user.id before committing
-
-        #For future implementations
-        address = Address(
-            latitude=request.latitude,
-            longitude=request.longitude
-        )
-        db.add(address)
-        await db.flush()  # Get product.id before committing
-
-        emergency = Emergency(
-            name=request.name,
-            description=request.description,
-            location_emergency=location.id,
-            address_emergency=address.id,
-            priority=request.priority
-        )
-        db.add(emergency)
-        e_id =  emergency.id
+async def create_alert(request: EmergencyRequest, response: Response, db: AsyncSession = Depends(get_db)):
+    """Create a new alert.
+
+    A report of the same type close in space and time to an Active emergency
+    is flagged with duplicate_of, or with DUPLICATE_ACTION=merge answered
+    with that emergency (200) instead of creating a new one.
+    """
+    original = None
+    if not request.allow_duplicate:
+        original = duplicate_detector.find(request.emergency_type, request.latitude, request.longitude)
+    if original is not None:
+        response.headers["X-Duplicate-Of"] = str(original.root)
+        if settings.DUPLICATE_ACTION == "merge":
+            existing = await db.get(Emergency, original.root)
+            if existing is not None:
+                response.status_code = 200
+                return existing
+            duplicate_detector.forget(original.root)
+            original = None
+
+    e_id = uuid_pkg.uuid4()
+    # Indexed before the insert so a simultaneous report already sees it
+    duplicate_detector.add(e_id, request.emergency_type, request.latitude, request.longitude,
+                           root=original.root if original else None)
+    try:
+        async with db.begin():  # Ensures rollback on failure
+            location = Location(
+                latitude=request.latitude,
+                longitude=request.longitude
+            )
+            db.add(location)
+            await db.flush()  # Get user.id before committing
+
+            #Street, city... are filled in later by the reverse geocoder
+            address = Address(
+                latitude=request.latitude,
+                longitude=request.longitude
+            )
+            db.add(address)
+            await db.flush()  # Get product.id before committing
+
+            emergency = Emergency(
+                id=e_id,
+                name=request.name,
+                description=request.description,
+                location_emergency=location.id,
+                address_emergency=address.id,
+                priority=request.priority,
+                emergency_type=request.emergency_type,
+                status=StatusType.Active,
+                duplicate_of=original.root if original else None,
+            )
+            db.add(emergency)
+            # Taken before commit, which expires the instance
+            board_entry = serializer_for(Emergency).to_dict(emergency)
+            address_id = address.id
+
+        await db.commit()
+    except Exception:
+        duplicate_detector.forget(e_id)
+        raise
+    alert_board.upsert(board_entry)
+    await heatmap_tiles.invalidate_point(request.latitude, request.longitude)
+    reverse_geocoder.enqueue(address_id, request.latitude, request.longitude)
+
+    return board_entry
+
+# ACTIVE EMERGENCIES BOARD
+# Declared before /api/alerts/{alert_id} so "board" is not taken for an id
+@router.get("/api/alerts/board", tags=["Alerts"])
+async def get_alert_board(
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    priority: Optional[PriorityType] = None,
+):
+    """Active emergencies by priority (Alta first) and age, served from memory"""
+    if not alert_board.loaded:
+        raise HTTPException(status_code=503, detail="Alert board not loaded")
+    limit = min(limit, settings.ALERT_BOARD_PAGE_MAX)
+    try:
+        items, next_cursor = alert_board.page(limit, cursor=cursor, offset=offset, priority=priority)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    body = b"".join((
+        b'{"total":', str(alert_board.count(priority)).encode(),
+        b',"next_cursor":', orjson.dumps(next_cursor),
+        b',"items":[', b",".join(items), b"]}",
+    ))
+    return Response(content=body, media_type="application/json")
 
-    await db.commit()
-    
-    return {"message": "Alert Created", "alert_id": e_id}
 
 # READ EMERGENCY
 @router.get("/api/alerts/{alert_id}", response_model=Emergency, tags=["Alerts"])
 # @router.get("/api/alerts/{alert_id}", tags=["Alerts"])
-async def get_alert(alert_id: str, db: AsyncSession = Depends(get_db)):
-    """Get alert details"""
+async def get_alert(alert_id: str, db: AsyncSession = Depends(get_read_db), archived: bool = False):
+    """Get alert details. Archived alerts need ?archived=true"""
+    if archived:
+        result = await db.execute(select(archive_table).where(archive_table.c.id == alert_id))
+        row = result.first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Emergency not found")
+        return row._asdict()
     stmt = select(Emergency).where(Emergency.id == alert_id)
     result = await db.execute(stmt)
     emergency = result.scalar_one_or_none()
@@ -134,9 +219,14 @@ async def update_alert(alert_id: str, request: EmergencyUpdateRequest, db: Async
     #Update Emergency
     for field, value in request.dict(exclude_unset=True).items():
         setattr(emergency, field, value)
-    db.commit()
+    await db.commit()
 
     await db.refresh(emergency)
+    alert_board.upsert(emergency)
+    if emergency.status != StatusType.Active:
+        duplicate_detector.forget(emergency.id)
+    elif request.emergency_type is not None:
+        duplicate_detector.retype(emergency.id, emergency.emergency_type)
     # await db.refresh(emergency.scalars().first())
 
     # Si estamos resolviendo la alerta
@@ -182,13 +272,49 @@ async def delete_device(db: Annotated[AsyncSession, Depends(get_db)], emergency_
     if not emergency:
         raise HTTPException(status_code=404, detail="Resource not found")
     
-    #Delete Emergency
-    await db.delete(emergency)
+    #Delete Emergency: through its id, which takes its resource links along
+    await db.execute(delete(EmergencyId).where(EmergencyId.id == emergency_uuid))
     await db.commit()
+    alert_board.remove(emergency_uuid)
+    duplicate_detector.forget(emergency_uuid)
     
     return {"message": "Emergency Deleted"}
 
 
+# ASSIGN / UNASSIGN RESOURCES
+class ResourceAssignmentRequest(BaseModel):
+    assign: List[uuid_pkg.UUID] = Field(default_factory=list)
+    unassign: List[uuid_pkg.UUID] = Field(default_factory=list)
+
+
+@router.post("/api/alerts/{alert_id}/resources", response_class=ORJSONResponse, tags=["Alerts"])
+async def assign_alert_resources(alert_id: str, request: ResourceAssignmentRequest, db: AsyncSession = Depends(get_db)):
+    """Assign and unassign many resources of an alert at once"""
+    try:
+        alert_uuid = uuid_pkg.UUID(alert_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid UUID format")
+    overlap = set(request.assign) & set(request.unassign)
+    if overlap:
+        raise HTTPException(status_code=422, detail=f"Resources both assigned and unassigned: {sorted(map(str, overlap))}")
+
+    result = await db.execute(select(Emergency.id).where(Emergency.id == alert_uuid))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Emergency not found")
+
+    assigned, unassigned = await emergency_assignments.apply(db, alert_uuid, request.assign, request.unassign)
+    # From the table, not the in-memory copy: another process may have changed the links too
+    result = await db.execute(
+        select(EmergencyResourceLink.resource_id).where(EmergencyResourceLink.emergency_id == alert_uuid)
+    )
+    return {
+        "id": str(alert_uuid),
+        "assigned": sorted(assigned),
+        "unassigned": sorted(unassigned),
+        "resources": sorted(str(r) for r in result.scalars()),
+    }
+
+
 
 
 
@@ -215,13 +341,33 @@ async def delete_device(db: Annotated[AsyncSession, Depends(get_db)], emergency_
 #     return assigned_alerts
 
 
-# I DO NOT KNOW WHAT IS IT FOR - ^^' - To Do - Check IF it works
 @router.get("/api/devices/{resource_id}/assignments", response_model=List[Emergency], tags=["Alerts"])
-# async def get_device_assignments(device_id: str):
-async def get_device_assignments(resource_id: str, db: AsyncSession = Depends(get_db)):
-    """Get alerts assigned to a specific device"""
-    stmt = select(Resource).where(Resource.id == resource_id)
-    result = await db.execute(stmt)
-    if not result:
-        raise HTTPException(status_code=404, detail="Example not found")
-    return result.scalars().first()
\ No newline at end of file
+async def get_device_assignments(
+    request: Request,
+    resource_id: str,
+    status: Optional[StatusType] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Get alerts assigned to a specific device, oldest first. Send If-None-Match to poll cheaply"""
+    try:
+        resource_uuid = uuid_pkg.UUID(resource_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid UUID format")
+
+    # Served by ix_emergencyresourcelink_resource_id_emergency_id
+    stmt = (
+        select(Emergency)
+        .join(EmergencyResourceLink, EmergencyResourceLink.emergency_id == Emergency.id)
+        .where(EmergencyResourceLink.resource_id == resource_uuid)
+        .order_by(Emergency.time_created, Emergency.id)
+    )
+    if status is not None:
+        stmt = stmt.where(Emergency.status == status)
+    emergencies = (await db.execute(stmt)).scalars().all()
+
+    if not emergencies:
+        exists = await db.execute(select(Resource.id).where(Resource.id == resource_uuid))
+        if exists.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Resource not found")
+
+    return etag_response(request, serializer_for(Emergency).dumps_list(emergencies))
\ No newline at end of file
@@ -0,0 +1,62 @@
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from src.configs.DBSessionManager import sessionmanager
+from src.services import export
+
+router = APIRouter()
+
+
+def _export(table_name: str, format: str, columns: Optional[str], since: Optional[datetime],
+            until: Optional[datetime], include_archived: bool = False) -> StreamingResponse:
+    available = export.columns_of(table_name)
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else available
+    unknown = [c for c in selected if c not in available]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown columns {unknown}; available: {available}")
+    if (since and since.tzinfo is None) or (until and until.tzinfo is None):
+        raise HTTPException(status_code=400, detail="since and until need a time zone offset")
+    if since and until and since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+
+    # The generator opens its own read session: a dependency's would be closed once the response starts
+    body = export.stream(sessionmanager.read_session, table_name, selected, format, since, until, include_archived)
+    filename = f"{table_name}.{export.EXTENSIONS[format]}"
+    return StreamingResponse(body, media_type=export.MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+# EMERGENCIES EXPORT
+@router.get("/api/export/emergencies", tags=["Export"])
+async def export_emergencies(
+    format: Literal["arrow", "parquet"] = "arrow",
+    columns: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    archived: bool = False,
+):
+    """Emergencies as an Arrow IPC stream or a Parquet file, streamed in batches.
+
+    `columns` is a comma separated list (all by default); `since`/`until`
+    filter on time_created. `archived=true` adds the archived emergencies.
+    """
+    return _export("emergencies", format, columns, since, until, archived)
+
+
+# LOCATIONS EXPORT
+@router.get("/api/export/locations", tags=["Export"])
+async def export_locations(
+    format: Literal["arrow", "parquet"] = "arrow",
+    columns: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Locations (positions of resources and emergency sites) as an Arrow IPC stream or a Parquet file.
+
+    `columns` is a comma separated list (all by default); `since`/`until`
+    filter on time_created.
+    """
+    return _export("locations", format, columns, since, until)
@@ -1,5 +1,5 @@
 from typing import List, Optional, Dict
-from pydantic import BaseModel # type: ignore No warning about pydantic. Imported in requirements.txt
+from pydantic import BaseModel, Field # type: ignore No warning about pydantic. Imported in requirements.txt
 from datetime import datetime
 #Import Nokia Api Service
 from src.services.opencameragateway import nokia_api_call
@@ -9,12 +9,13 @@ from fastapi import APIRouter,  HTTPException, Depends # type: ignore No warning
 
 from typing import Annotated
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.configs.database import get_db
+from src.configs.database import get_db, get_read_db
 from sqlalchemy import select
 
 from src.models.resource import Resource
 from src.models.location import Location
 import uuid as uuid_pkg
+from src.services.location_buffer import Sample, location_buffer
 
 router = APIRouter()
 
@@ -56,15 +57,22 @@ router = APIRouter()
 # #END LOCATION ENDPOINTS
 
 @router.get("/api/devices/{resource_id}/location", response_model=Location, tags=["Location"])
-async def get_device_location(resource_id: str, db: Annotated[AsyncSession, Depends(get_db)]):
+async def get_device_location(resource_id: str, db: Annotated[AsyncSession, Depends(get_read_db)]):
     try:
         resource_uuid = uuid_pkg.UUID(resource_id)  # Convert to UUID type
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid UUID format")
 
+    # Positions reported to this process that are not written yet
+    buffered = location_buffer.get(resource_uuid)
+    if buffered is not None:
+        return buffered
+
     stmt = select(Resource).where(Resource.id == resource_uuid)
     result = await db.execute(stmt)
     resource = result.scalar_one_or_none()
+    if resource is None:
+        raise HTTPException(status_code=404, detail="Resource not found")
 
     stmt = select(Location).where(Location.id == resource.actual_location)
     result = await db.execute(stmt)
@@ -72,3 +80,30 @@ async def get_device_location(resource_id: str, db: Annotated[AsyncSession, Depe
     if location is None:
         raise HTTPException(status_code=404, detail="Location not found")
     return location
+
+
+# POSITION REPORTS
+class LocationReport(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    accuracy: Optional[float] = Field(None, ge=0)
+    speed: Optional[float] = Field(None, ge=0)
+    heading: Optional[float] = Field(None, ge=0, lt=360)
+
+
+@router.post("/api/devices/{resource_id}/location", status_code=202, tags=["Location"])
+async def report_device_location(resource_id: str, report: LocationReport, db: Annotated[AsyncSession, Depends(get_db)]):
+    """Report the current position of a device.
+
+    Written in batches (see src/services/location_buffer.py); `accepted` is
+    false when the position is within the dead-band of the last one.
+    """
+    try:
+        resource_uuid = uuid_pkg.UUID(resource_id)  # Convert to UUID type
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid UUID format")
+
+    accepted = await location_buffer.report(db, resource_uuid, Sample(**report.model_dump()))
+    if accepted is None:
+        raise HTTPException(status_code=404, detail="Resource or its location not found")
+    return {"resource_id": resource_uuid, "accepted": accepted}
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import List, Optional, Dict
-from fastapi import APIRouter,  HTTPException, Depends # type: ignore No warning about pydantic. Imported in requirements.txt
+from fastapi import APIRouter,  HTTPException, Depends, Request # type: ignore No warning about pydantic. Imported in requirements.txt
 
 from src.models.resource import Resource, ResourceStatusEnum
 from src.models.location import Location
@@ -10,21 +10,28 @@ from src.models.emergencyresourceslink import EmergencyResourceLink
 
 from typing import Annotated
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.configs.database import get_db
+from src.configs.database import get_db, get_db_with_timeout, get_read_db
+from src.configs.config import settings
 from sqlalchemy import select
 from pydantic import BaseModel, Field
 import uuid as uuid_pkg
+from src.services.serializer import list_response
+from src.services.location_buffer import location_buffer
+from src.services.reverse_geocoder import reverse_geocoder
 
 router = APIRouter()
 
+# Full-table listings get a tighter statement timeout than the rest
+get_list_db = get_db_with_timeout(settings.DB_LIST_STATEMENT_TIMEOUT_MS, read_only=True)
+
 # LIST ALL RESOURCES
 @router.get("/api/devices", response_model=List[Resource], tags=["Devices"])
-async def list_devices(session: Annotated[AsyncSession, Depends(get_db)]):
+async def list_devices(session: Annotated[AsyncSession, Depends(get_list_db)], request: Request):
     """List all devices"""
     resources = await session.execute(select(Resource))
     # return emergencies
     items = resources.scalars().all()
-    return items
+    return list_response(Resource, items, request)
 
 
 
@@ -62,7 +69,7 @@ async def create_device(db: Annotated[AsyncSession, Depends(get_db)], request: R
         db.add(actual_location)
         # await db.flush()  # Get user.id before committing
 
-        #For future implementations
+        #Street, city... are filled in later by the reverse geocoder
         actual_address = Address(
             latitude=request.actual_address_latitude,
             longitude=request.actual_address_longitude
@@ -77,7 +84,7 @@ async def create_device(db: Annotated[AsyncSession, Depends(get_db)], request: R
         db.add(normal_location)
         # await db.flush()  # Get user.id before committing
 
-        #For future implementations
+        #Street, city... are filled in later by the reverse geocoder
         normal_address = Address(
             latitude=request.normal_address_latitude,
             longitude=request.normal_address_longitude
@@ -101,8 +108,14 @@ async def create_device(db: Annotated[AsyncSession, Depends(get_db)], request: R
         db.add(resource)
         # await db.flush()  # Get product.id before committing
         resource_id =  resource.id
+        addresses = [
+            (actual_address.id, request.actual_address_latitude, request.actual_address_longitude),
+            (normal_address.id, request.normal_address_latitude, request.normal_address_longitude),
+        ]
 
     await db.commit()
+    for address_id, latitude, longitude in addresses:
+        reverse_geocoder.enqueue(address_id, latitude, longitude)
     
     return {"message": "Resource Created", "resouce_id:": resource_id}
     # return resource
@@ -112,7 +125,7 @@ async def create_device(db: Annotated[AsyncSession, Depends(get_db)], request: R
 
 # READ A RESOURCE
 @router.get("/api/devices/{resource_id}", response_model=Resource, tags=["Devices"])
-async def get_device(db: Annotated[AsyncSession, Depends(get_db)], resource_id: str):
+async def get_device(db: Annotated[AsyncSession, Depends(get_read_db)], resource_id: str):
     """Get device details"""
 
     try:
@@ -179,6 +192,8 @@ async def update_device(db: Annotated[AsyncSession, Depends(get_db)], resource_i
     actual_location.longitude = request.actual_longitude
     actual_location.latitude = request.actual_latitude
     db.commit()
+    # Buffered GPS reports must not overwrite this position
+    location_buffer.forget(resource.id)
     #Update Actual Address
     stmt = select(Address).where(Address.id == resource.actual_address)
     result = await db.execute(stmt)
@@ -265,6 +280,7 @@ async def delete_device(db: Annotated[AsyncSession, Depends(get_db)], resource_i
     #Delete Resource
     await db.delete(resource)
     await db.commit()
+    location_buffer.forget(resource_uuid)
     
     return {"message": "Resource Deleted"}
 
@@ -0,0 +1,101 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.DBSessionManager import sessionmanager
+from src.configs.database import get_read_db
+from src.services import admission, query_stats
+from src.services.duplicate_detector import duplicate_detector
+from src.services.emergency_partitions import archival_job
+from src.services.idempotency import idempotency_store
+from src.services.location_buffer import location_buffer
+from src.services.reverse_geocoder import reverse_geocoder
+
+router = APIRouter()
+
+
+# DATABASE POOL UTILISATION
+@router.get("/api/system/pool", tags=["System"])
+async def pool_status():
+    """Connection pool utilisation: checked-out and overflow connections plus acquire wait times"""
+    return sessionmanager.pool_status()
+
+
+# READ REPLICAS
+@router.get("/api/system/replicas", tags=["System"])
+async def replica_status():
+    """Health, replication lag and pool usage of each read replica"""
+    return sessionmanager.replicas.status()
+
+
+# SQL INSTRUMENTATION
+@router.get("/api/system/queries", tags=["System"])
+async def recent_queries(limit: int = Query(50, ge=1, le=1000), n_plus_one: bool = False):
+    """Query count, DB time and slowest statement of the most recent requests"""
+    items = list(query_stats.recent_requests)
+    if n_plus_one:
+        items = [r for r in items if r["n_plus_one"]]
+    return items[-limit:][::-1]
+
+
+@router.get("/api/system/slow-queries", tags=["System"])
+async def slow_queries(limit: int = Query(50, ge=1, le=1000)):
+    """Slow statements with their EXPLAIN (ANALYZE, BUFFERS) plan"""
+    return list(query_stats.slow_queries)[-limit:][::-1]
+
+
+# EMERGENCY ARCHIVAL
+@router.get("/api/system/archival", tags=["System"])
+async def archival_status():
+    """Last run of the job that moves old closed emergencies to emergency_archive"""
+    return archival_job.status()
+
+
+@router.post("/api/system/archival", tags=["System"])
+async def run_archival():
+    """Create upcoming partitions and archive old closed emergencies now"""
+    await archival_job.run_once(sessionmanager.engine)
+    return archival_job.status()
+
+
+# GPS WRITE-BEHIND BUFFER
+@router.get("/api/system/location-buffer", tags=["System"])
+async def location_buffer_status():
+    """Reported, dropped (dead-band) and written GPS positions, and what is waiting to be flushed"""
+    return location_buffer.status()
+
+
+# REVERSE GEOCODER
+@router.get("/api/system/geocoder", tags=["System"])
+async def geocoder_status():
+    """Gazetteer size, queue and outcome of the background address filling"""
+    return reverse_geocoder.status()
+
+
+@router.post("/api/system/geocoder/backfill", tags=["System"])
+async def geocoder_backfill(session: Annotated[AsyncSession, Depends(get_read_db)], limit: int = Query(1000, ge=1, le=100000)):
+    """Queue addresses that have coordinates but no street or city yet"""
+    queued = await reverse_geocoder.backfill(session, limit)
+    return {"queued": queued, **reverse_geocoder.status()}
+
+
+# ADMISSION CONTROL
+@router.get("/api/system/admission", tags=["System"])
+async def admission_status():
+    """Requests in flight, queued and rejected per route class, and the pool wait used to shed them"""
+    return admission.status(sessionmanager.pool_wait)
+
+
+# DUPLICATE REPORTS
+@router.get("/api/system/duplicates", tags=["System"])
+async def duplicates_status():
+    """Recent emergencies indexed for duplicate detection and how many reports matched one"""
+    return duplicate_detector.status()
+
+
+# IDEMPOTENCY KEYS
+@router.get("/api/system/idempotency", tags=["System"])
+async def idempotency_status():
+    """Keyed creation requests run, replayed, refused and purged"""
+    return idempotency_store.status()
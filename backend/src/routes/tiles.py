@@ -0,0 +1,42 @@
+from datetime import date
+from typing import Annotated, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import settings
+from src.configs.database import get_read_db
+from src.models.emergency import EmergencyType
+from src.services.heatmap_tiles import heatmap_tiles
+
+router = APIRouter()
+
+MEDIA_TYPES = {"png": "image/png", "json": "application/json"}
+
+
+# EMERGENCY DENSITY HEATMAP
+@router.get("/api/tiles/heatmap/{z}/{x}/{y}", tags=["Map"])
+async def heatmap_tile(
+    session: Annotated[AsyncSession, Depends(get_read_db)],
+    z: int,
+    x: int,
+    y: int,
+    emergency_type: Optional[EmergencyType] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    format: Literal["png", "json"] = "png",
+):
+    """Density of emergencies in an XYZ map tile, as a transparent PNG overlay or JSON grid.
+
+    `since` and `until` are inclusive days (UTC) of time_created.
+    """
+    if not 0 <= z <= settings.HEATMAP_MAX_ZOOM:
+        raise HTTPException(status_code=400, detail=f"z must be between 0 and {settings.HEATMAP_MAX_ZOOM}")
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    if since and until and since > until:
+        raise HTTPException(status_code=400, detail="since must not be after until")
+
+    body, outcome = await heatmap_tiles.tile(session, z, x, y, emergency_type, since, until, format)
+    headers = {"Cache-Control": "public, max-age=60", "X-Tile-Cache": outcome}
+    return Response(content=body, media_type=MEDIA_TYPES[format], headers=headers)
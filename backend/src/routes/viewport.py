@@ -0,0 +1,54 @@
+from typing import Annotated, Optional
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.database import get_read_db
+from src.models.emergency import StatusType
+from src.services.serializer import ORJSON_OPTIONS, _default
+from src.services.map_clusters import EmergencyLayer, ResourceLayer, layer_features
+
+router = APIRouter()
+
+LAYERS = ("emergencies", "resources")
+
+
+def parse_bbox(bbox: str):
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
+    if not (-180 <= west < east <= 180 and -90 <= south < north <= 90):
+        raise HTTPException(status_code=400, detail="bbox out of range or empty")
+    return west, south, east, north
+
+
+# MAP VIEWPORT
+@router.get("/api/map", tags=["Map"])
+async def map_viewport(
+    session: Annotated[AsyncSession, Depends(get_read_db)],
+    bbox: str = Query(..., description="west,south,east,north, as Leaflet's getBounds().toBBoxString()"),
+    zoom: int = Query(..., ge=0, le=22),
+    layers: str = "emergencies,resources",
+    status: Optional[StatusType] = StatusType.Active,
+):
+    """Emergencies and resources inside the viewport as GeoJSON, clustered for the zoom level.
+
+    Emergencies are filtered by `status` (active by default). Clusters have
+    `cluster: true` and a `count`; single points carry their own fields.
+    """
+    bounds = parse_bbox(bbox)
+    requested = [layer for layer in layers.split(",") if layer]
+    unknown = set(requested) - set(LAYERS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown layers: {', '.join(sorted(unknown))}")
+
+    features = []
+    if "emergencies" in requested:
+        features += await layer_features(session, EmergencyLayer(status), bounds, zoom)
+    if "resources" in requested:
+        features += await layer_features(session, ResourceLayer(), bounds, zoom)
+    content = orjson.dumps({"type": "FeatureCollection", "bbox": bounds, "zoom": zoom, "features": features},
+                           default=_default, option=ORJSON_OPTIONS)
+    return Response(content=content, media_type="application/geo+json")
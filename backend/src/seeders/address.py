@@ -3,6 +3,7 @@ from src.models.address import Address
 import random
 
 from src.configs.database import get_db
+from src.seeders.location import BARCELONA_BOUNDS
 
 fake = Faker()
 
@@ -15,8 +16,9 @@ async def address_seeder():
     postal_code = fake.zipcode()
     country = fake.country()
     country_code = ""
-    latitude = round(random.uniform(0, 360), 5)
-    longitude = round(random.uniform(0, 360), 5)
+    (lat_min, lon_min), (lat_max, lon_max) = BARCELONA_BOUNDS
+    latitude = round(random.uniform(lat_min, lat_max), 5)
+    longitude = round(random.uniform(lon_min, lon_max), 5)
     address_line_1 = "This is an example line as address line"
 
     addressSeed = Address(
@@ -0,0 +1,297 @@
+"""
+Bulk seeder for scale testing.
+
+Generates N emergencies, M resources and K extra location samples with
+vectorised NumPy sampling (Barcelona-area coordinates) and loads them with
+COPY. Work is split into self-contained chunks (each chunk's emergencies only
+reference that chunk's resources) that run in parallel worker processes, one
+transaction per chunk.
+
+Usage (from ./backend):
+    python -m src.seeders.bulk --emergencies 1000000 --resources 20000 --locations 2000000 --workers 8
+"""
+import argparse
+import asyncio
+import logging
+import math
+import multiprocessing
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+import asyncpg
+import numpy as np
+
+from src.configs.DBSessionManager import DATABASE_URL
+from src.models.emergency import EmergencyType, PriorityType, StatusType
+from src.models.resource import ResourceStatusEnum
+from src.seeders.location import BARCELONA_BOUNDS
+
+logger = logging.getLogger(__name__)
+
+ASYNCPG_URL = DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+
+LOCATION_COLUMNS = ["id", "latitude", "longitude", "accuracy", "speed", "heading", "time_created", "time_updated"]
+ADDRESS_COLUMNS = ["id", "street_number", "street_name", "neighborhood", "city", "state", "postal_code",
+                   "country", "country_code", "latitude", "longitude", "address_line_1", "time_created", "time_updated"]
+RESOURCE_COLUMNS = ["id", "resource_type", "actual_address", "actual_location", "normal_address", "normal_location",
+                    "status", "responsible", "telephone", "email", "time_created", "time_updated"]
+EMERGENCY_COLUMNS = ["id", "name", "description", "priority", "emergency_type", "status",
+                     "location_emergency", "address_emergency",
+                     "resource_id", "location_resource", "address_resource",
+                     "destination_id", "location_destination", "address_destination",
+                     "name_contact", "telephone_contact", "id_contact", "time_created", "time_updated"]
+LINK_COLUMNS = ["emergency_id", "resource_id"]
+
+RESOURCE_TYPES = np.array(["ambulance", "firetruck", "police"])
+# SQLAlchemy stores Python enums by member name
+PRIORITIES = np.array([p.name for p in PriorityType])
+PRIORITY_WEIGHTS = [0.2, 0.5, 0.3]
+EMERGENCY_TYPES = np.array([t.name for t in EmergencyType])
+STATUSES = np.array([s.name for s in StatusType])
+STATUS_WEIGHTS = [0.1, 0.6, 0.3]
+RESOURCE_STATUSES = np.array([s.name for s in ResourceStatusEnum])
+NEIGHBORHOODS = np.array(["Ciutat Vella", "Eixample", "Sants-Montjuic", "Les Corts", "Sarria-Sant Gervasi",
+                          "Gracia", "Horta-Guinardo", "Nou Barris", "Sant Andreu", "Sant Marti"])
+
+# Names are drawn from small pools; building them is the only non-vectorised step
+POOL_SIZE = 2000
+
+
+class Pools:
+    """Text pools built once per worker with Faker (imported lazily, it is slow to load)."""
+
+    def __init__(self, seed: int):
+        from faker import Faker
+        fake = Faker("es_ES")
+        fake.seed_instance(seed)
+        self.first_names = np.array([fake.first_name() for _ in range(POOL_SIZE)])
+        self.last_names = np.array([fake.last_name() for _ in range(POOL_SIZE)])
+        self.streets = np.array([fake.street_name()[:64] for _ in range(POOL_SIZE)])
+
+
+def uuids(rng: np.random.Generator, n: int) -> List[uuid.UUID]:
+    """n random version-4 UUIDs."""
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    return [uuid.UUID(bytes=row.tobytes()) for row in raw]
+
+
+def coordinates(rng: np.random.Generator, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    (lat_min, lon_min), (lat_max, lon_max) = BARCELONA_BOUNDS
+    return (np.round(rng.uniform(lat_min, lat_max, n), 6), np.round(rng.uniform(lon_min, lon_max, n), 6))
+
+
+def timestamps(rng: np.random.Generator, n: int, now: datetime, days: int) -> List[datetime]:
+    offsets = rng.uniform(0, days * 86400, n)
+    return [now - timedelta(seconds=float(s)) for s in offsets]
+
+
+def phones(rng: np.random.Generator, n: int) -> List[str]:
+    return [f"+34 6{v:08d}" for v in rng.integers(0, 10 ** 8, n)]
+
+
+def location_rows(rng, n: int, now: datetime, days: int):
+    ids = uuids(rng, n)
+    lat, lon = coordinates(rng, n)
+    accuracy = np.round(rng.uniform(3, 200, n), 2)
+    speed = np.round(rng.exponential(6, n), 2)
+    heading = np.round(rng.uniform(0, 360, n), 2)
+    created = timestamps(rng, n, now, days)
+    rows = list(zip(ids, lat.tolist(), lon.tolist(), accuracy.tolist(), speed.tolist(), heading.tolist(),
+                    created, [None] * n))
+    return ids, rows
+
+
+def address_rows(rng, pools: Pools, n: int, now: datetime, days: int):
+    ids = uuids(rng, n)
+    lat, lon = coordinates(rng, n)
+    numbers = rng.integers(1, 400, n).astype(str)
+    streets = pools.streets[rng.integers(0, POOL_SIZE, n)]
+    neighborhoods = NEIGHBORHOODS[rng.integers(0, len(NEIGHBORHOODS), n)]
+    postal = np.char.add("080", np.char.zfill(rng.integers(1, 43, n).astype(str), 2))
+    created = timestamps(rng, n, now, days)
+    lines = np.char.add(np.char.add(streets, ", "), numbers)
+    rows = list(zip(ids, numbers.tolist(), streets.tolist(), neighborhoods.tolist(), ["Barcelona"] * n,
+                    ["Catalunya"] * n, postal.tolist(), ["Spain"] * n, ["ES"] * n, lat.tolist(), lon.tolist(),
+                    lines.tolist(), created, [None] * n))
+    return ids, rows
+
+
+def generate_chunk(seed: int, n_emergencies: int, n_resources: int, n_locations: int, days: int) -> Dict[str, list]:
+    """Generate one self-contained chunk of rows, keyed by table name."""
+    rng = np.random.default_rng(seed)
+    pools = Pools(seed)
+    now = datetime.now(timezone.utc)
+
+    # Each resource has an actual and a normal location/address,
+    # each emergency its own site location/address
+    n_loc = 2 * n_resources + n_emergencies + n_locations
+    n_addr = 2 * n_resources + n_emergencies
+    loc_ids, locations = location_rows(rng, n_loc, now, days)
+    addr_ids, addresses = address_rows(rng, pools, n_addr, now, days)
+
+    # RESOURCES
+    res_ids = uuids(rng, n_resources)
+    actual_loc, normal_loc = loc_ids[:n_resources], loc_ids[n_resources:2 * n_resources]
+    actual_addr, normal_addr = addr_ids[:n_resources], addr_ids[n_resources:2 * n_resources]
+    first = pools.first_names[rng.integers(0, POOL_SIZE, n_resources)]
+    last = pools.last_names[rng.integers(0, POOL_SIZE, n_resources)]
+    responsible = np.char.add(np.char.add(first, " "), last)
+    emails = np.char.add(np.char.lower(np.char.add(np.char.add(first, "."), last)), "@mail.com")
+    resources = list(zip(
+        res_ids, RESOURCE_TYPES[rng.integers(0, len(RESOURCE_TYPES), n_resources)].tolist(),
+        actual_addr, actual_loc, normal_addr, normal_loc,
+        RESOURCE_STATUSES[rng.integers(0, len(RESOURCE_STATUSES), n_resources)].tolist(),
+        responsible.tolist(), phones(rng, n_resources), emails.tolist(),
+        timestamps(rng, n_resources, now, days), [None] * n_resources,
+    ))
+
+    # EMERGENCIES
+    n = n_emergencies
+    em_ids = uuids(rng, n)
+    site_loc = loc_ids[2 * n_resources:2 * n_resources + n]
+    site_addr = addr_ids[2 * n_resources:]
+    status = rng.choice(STATUSES, n, p=STATUS_WEIGHTS)
+    assigned = rng.integers(0, n_resources, n)
+    destination = rng.integers(0, n_resources, n)
+    # Creation spread over the window; closed incidents were last updated
+    # after a log-normal resolution time (median ~45 min)
+    created_offsets = rng.uniform(0, days * 86400, n)
+    resolve_seconds = rng.lognormal(math.log(45 * 60), 0.8, n)
+    created = [now - timedelta(seconds=float(s)) for s in created_offsets]
+    updated = [
+        min(c + timedelta(seconds=float(r)), now) if s != "Active" else None
+        for c, r, s in zip(created, resolve_seconds, status)
+    ]
+    names = np.char.add(np.char.add(RESOURCE_TYPES[rng.integers(0, len(RESOURCE_TYPES), n)], "-"),
+                        rng.integers(100, 1000, n).astype(str))
+    id_contact = np.char.add(np.char.zfill(rng.integers(0, 10 ** 7, n).astype(str), 7),
+                             np.array(list("ABCDEFGHJKLMNPQRSTVWXYZ"))[rng.integers(0, 23, n)])
+    res_ids_arr = np.array(res_ids, dtype=object)
+    actual_loc_arr = np.array(actual_loc, dtype=object)
+    actual_addr_arr = np.array(actual_addr, dtype=object)
+    emergencies = list(zip(
+        em_ids, names.tolist(), ["Bulk seeded emergency"] * n,
+        rng.choice(PRIORITIES, n, p=PRIORITY_WEIGHTS).tolist(),
+        EMERGENCY_TYPES[rng.integers(0, len(EMERGENCY_TYPES), n)].tolist(),
+        status.tolist(), site_loc, site_addr,
+        res_ids_arr[assigned].tolist(), actual_loc_arr[assigned].tolist(), actual_addr_arr[assigned].tolist(),
+        res_ids_arr[destination].tolist(), actual_loc_arr[destination].tolist(),
+        actual_addr_arr[destination].tolist(),
+        pools.first_names[rng.integers(0, POOL_SIZE, n)].tolist(), phones(rng, n), id_contact.tolist(),
+        created, updated,
+    ))
+    links = list(zip(em_ids, res_ids_arr[assigned].tolist()))
+
+    return {
+        "location": locations,
+        "address": addresses,
+        "resource": resources,
+        "emergency_id": list(zip(em_ids, created)),
+        "emergency": emergencies,
+        "emergencyresourcelink": links,
+    }
+
+
+TABLE_COLUMNS = {
+    "location": LOCATION_COLUMNS,
+    "address": ADDRESS_COLUMNS,
+    "resource": RESOURCE_COLUMNS,
+    "emergency_id": ["id", "time_created"],
+    "emergency": EMERGENCY_COLUMNS,
+    "emergencyresourcelink": LINK_COLUMNS,
+}
+
+
+async def copy_chunk(chunk: Dict[str, list], skip_fk_checks: bool = False):
+    """COPY a chunk in FK order inside one transaction."""
+    conn = await asyncpg.connect(ASYNCPG_URL)
+    try:
+        async with conn.transaction():
+            if skip_fk_checks:
+                # FK triggers dominate COPY time on emergency (8 foreign keys).
+                # Generated chunks are consistent by construction. Needs superuser.
+                await conn.execute("SET LOCAL session_replication_role = replica")
+            for table, columns in TABLE_COLUMNS.items():
+                if chunk[table]:
+                    await conn.copy_records_to_table(table, records=chunk[table], columns=columns)
+    finally:
+        await conn.close()
+
+
+def run_chunk(task: Tuple[int, int, int, int, int, bool]) -> Dict[str, int]:
+    """Worker entry point: generate and load one chunk. Returns row counts."""
+    seed, n_emergencies, n_resources, n_locations, days, skip_fk_checks = task
+    chunk = generate_chunk(seed, n_emergencies, n_resources, n_locations, days)
+    asyncio.run(copy_chunk(chunk, skip_fk_checks))
+    return {table: len(rows) for table, rows in chunk.items()}
+
+
+def plan_chunks(n_emergencies: int, n_resources: int, n_locations: int, chunk_size: int) -> List[Tuple[int, int, int]]:
+    """Split the totals into chunks of at most ~chunk_size generated rows each."""
+    if n_emergencies and not n_resources:
+        raise ValueError("Emergencies need at least one resource to be assigned to")
+    total = n_emergencies + n_resources + n_locations
+    n_chunks = max(1, math.ceil(total / chunk_size))
+    if n_emergencies:
+        # Every chunk that holds emergencies needs its own resources
+        n_chunks = min(n_chunks, n_resources)
+    split = lambda value: [len(part) for part in np.array_split(np.arange(value), n_chunks)]
+    return list(zip(split(n_emergencies), split(n_resources), split(n_locations)))
+
+
+async def truncate():
+    conn = await asyncpg.connect(ASYNCPG_URL)
+    try:
+        await conn.execute("TRUNCATE emergencyresourcelink, emergency, emergency_archive, emergency_id, resource, address, location CASCADE")
+    finally:
+        await conn.close()
+
+
+def seed_bulk(n_emergencies: int, n_resources: int, n_locations: int, workers: int = 0,
+              chunk_size: int = 100_000, days: int = 365, seed: int = 0,
+              skip_fk_checks: bool = False) -> Dict[str, int]:
+    """Generate and load the dataset. Returns total row counts per table."""
+    chunks = plan_chunks(n_emergencies, n_resources, n_locations, chunk_size)
+    tasks = [(seed * 1_000_003 + i, e, r, loc, days, skip_fk_checks) for i, (e, r, loc) in enumerate(chunks)]
+    workers = workers or multiprocessing.cpu_count()
+    totals: Dict[str, int] = {}
+    with multiprocessing.get_context("spawn").Pool(min(workers, len(tasks))) as pool:
+        for counts in pool.imap_unordered(run_chunk, tasks):
+            for table, count in counts.items():
+                totals[table] = totals.get(table, 0) + count
+            logger.info(f"Chunk loaded: {counts}")
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk seed the SERP database with COPY")
+    parser.add_argument("-n", "--emergencies", type=int, default=10_000)
+    parser.add_argument("-m", "--resources", type=int, default=500)
+    parser.add_argument("-k", "--locations", type=int, default=0, help="Extra location samples")
+    parser.add_argument("-w", "--workers", type=int, default=0, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Generated rows per chunk/transaction")
+    parser.add_argument("--days", type=int, default=365, help="Spread time_created over the last N days")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--truncate", action="store_true", help="Empty the tables first")
+    parser.add_argument("--skip-fk-checks", action="store_true",
+                        help="Disable FK triggers while copying (much faster, needs a superuser)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.truncate:
+        asyncio.run(truncate())
+
+    start = time.perf_counter()
+    totals = seed_bulk(args.emergencies, args.resources, args.locations, args.workers,
+                       args.chunk_size, args.days, args.seed, args.skip_fk_checks)
+    elapsed = time.perf_counter() - start
+    rows = sum(totals.values())
+    logger.info(f"Seeded {rows:,} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s): {totals}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,14 @@ import random
 from src.configs.database import get_db
 import asyncio
 
+# (lat, lon) south-west and north-east corners of the Barcelona area
+BARCELONA_BOUNDS = ((41.32, 2.07), (41.47, 2.23))
 
 async def location_seeder():
     
-    latitude: float = round(random.uniform(0, 360), 5)
-    longitude:float = round(random.uniform(0, 360), 5)
+    (lat_min, lon_min), (lat_max, lon_max) = BARCELONA_BOUNDS
+    latitude: float = round(random.uniform(lat_min, lat_max), 5)
+    longitude:float = round(random.uniform(lon_min, lon_max), 5)
     accuracy:float = round(random.uniform(0, 200), 5)
     speed:float = round(random.uniform(0, 360), 3)
     heading:float = round(random.uniform(0, 360), 5)
@@ -1,5 +1,15 @@
+from sqlalchemy import select
+
+from src.configs.DBSessionManager import sessionmanager
+from src.models.emergency import Emergency
 from src.seeders.emergency import emergency_seeder
 
-async def seed_db():
+async def seed_db() -> bool:
+    """Seed a few random records unless the database already has emergencies. Returns True if it seeded."""
+    async with sessionmanager.session() as session:
+        existing = await session.execute(select(Emergency.id).limit(1))
+        if existing.first() is not None:
+            return False
     for _ in range(5):  # Seed 10 random records
-        await emergency_seeder()
\ No newline at end of file
+        await emergency_seeder()
+    return True
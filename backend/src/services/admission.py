@@ -0,0 +1,235 @@
+"""
+Priority-aware admission control for the API.
+
+Every /api request falls into a class:
+- critical: writes (POST, PATCH, PUT, DELETE), which includes new alerts,
+  dispatching and GPS reports
+- dispatcher: the other reads the dispatch UI polls
+- analytics: /api/analytics, /api/tiles, /api/export and the archive
+  listing (GET /api/alerts?archived=true)
+/api/system, /metrics and the docs are not controlled, so the service can
+still be inspected while it sheds load.
+
+Each class has its own limit of requests in flight and its own FIFO queue
+behind it, so a burst of dashboard reads cannot take the slots writes need.
+A request that finds its class's queue full, or waits in it longer than
+ADMISSION_QUEUE_TIMEOUT_S, gets 503 with Retry-After.
+
+Reads are also shed before they are queued when the DB pool is congested:
+analytics when the recent acquire wait (a moving average, see
+PoolStats.recent_wait) is over ADMISSION_SHED_ANALYTICS_WAIT_MS, dispatcher
+reads over ADMISSION_SHED_DISPATCHER_WAIT_MS. Writes are never shed this way.
+A POST /api/alerts with priority Alta is never rejected at all: it skips
+the limit and the queue.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+from urllib.parse import parse_qs
+
+import orjson
+
+from src.configs.config import settings
+from src.models.emergency import PriorityType
+from src.services.request_replay import replay_receive
+
+CRITICAL, DISPATCHER, ANALYTICS = "critical", "dispatcher", "analytics"
+
+_READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+ANALYTICS_PREFIXES = ("/api/analytics", "/api/tiles", "/api/export")
+# Strings a bool query parameter accepts as true (pydantic's rules, case-insensitive)
+_TRUE_VALUES = {"1", "on", "t", "true", "y", "yes"}
+# Bodies larger than this are not inspected for the alert priority
+_MAX_PEEK_BYTES = 64 * 1024
+
+
+def classify(method: str, path: str, query_string: bytes) -> Optional[str]:
+    if not path.startswith("/api/") or path.startswith("/api/system"):
+        return None
+    if path.startswith(ANALYTICS_PREFIXES):
+        return ANALYTICS
+    if method not in _READ_METHODS:
+        return CRITICAL
+    if path == "/api/alerts" and _query_flag(query_string, "archived"):
+        return ANALYTICS
+    return DISPATCHER
+
+
+def _query_flag(query_string: bytes, name: str) -> bool:
+    """Whether the route would read `name` as True (the last value wins, as in FastAPI)."""
+    values = parse_qs(query_string.decode("latin-1")).get(name)
+    return bool(values) and values[-1].lower() in _TRUE_VALUES
+
+
+class RouteClass:
+    """A concurrency limit with a bounded FIFO queue in front of it."""
+
+    def __init__(self, name: str, limit: int, queue: int, shed_wait_ms: Optional[float]):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        # Pool wait above which requests of this class are refused; None: never
+        self.shed_wait_ms = shed_wait_ms
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.stats = {"admitted": 0, "queued": 0, "forced": 0, "shed": 0, "queue_full": 0, "timed_out": 0}
+
+    async def acquire(self, timeout: float) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.stats["admitted"] += 1
+            return True
+        if len(self._waiters) >= self.queue:
+            self.stats["queue_full"] += 1
+            return False
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            # release() may have handed over the slot just as the timeout fired
+            if future.done() and not future.cancelled():
+                self.stats["admitted"] += 1
+                return True
+            self._discard(future)
+            self.stats["timed_out"] += 1
+            return False
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self._discard(future)
+            raise
+        self.stats["admitted"] += 1
+        return True
+
+    def force(self):
+        """Take a slot even over the limit."""
+        self.active += 1
+        self.stats["forced"] += 1
+
+    def release(self):
+        self.active -= 1
+        while self._waiters and self.active < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                # The slot passes straight to the waiter, nobody can take it in between
+                self.active += 1
+                future.set_result(None)
+
+    def _discard(self, future: asyncio.Future):
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+
+    def status(self) -> dict:
+        return {
+            **self.stats,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "limit": self.limit,
+            "queue": self.queue,
+            "shed_wait_ms": self.shed_wait_ms,
+        }
+
+
+classes: Dict[str, RouteClass] = {
+    CRITICAL: RouteClass(CRITICAL, settings.ADMISSION_CRITICAL_LIMIT, settings.ADMISSION_CRITICAL_QUEUE, None),
+    DISPATCHER: RouteClass(DISPATCHER, settings.ADMISSION_DISPATCHER_LIMIT, settings.ADMISSION_DISPATCHER_QUEUE,
+                           settings.ADMISSION_SHED_DISPATCHER_WAIT_MS),
+    ANALYTICS: RouteClass(ANALYTICS, settings.ADMISSION_ANALYTICS_LIMIT, settings.ADMISSION_ANALYTICS_QUEUE,
+                          settings.ADMISSION_SHED_ANALYTICS_WAIT_MS),
+}
+
+
+def status(pool_wait: Callable[[], float]) -> dict:
+    return {
+        "enabled": settings.ADMISSION_ENABLED,
+        "pool_wait_ms": round(pool_wait() * 1000, 3),
+        "classes": {name: route_class.status() for name, route_class in classes.items()},
+    }
+
+
+async def _read_body(receive):
+    """The whole request body and the messages it came in."""
+    messages, size = [], 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            return None, messages
+        size += len(message.get("body", b""))
+        if not message.get("more_body") or size > _MAX_PEEK_BYTES:
+            break
+    if messages[-1].get("more_body"):
+        return None, messages
+    return b"".join(m.get("body", b"") for m in messages), messages
+
+
+def _is_high_priority_alert(body: Optional[bytes]) -> bool:
+    if not body:
+        return False
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return False
+    return isinstance(payload, dict) and payload.get("priority") == PriorityType.Alta.value
+
+
+async def _reject(send, route_class: RouteClass, reason: str):
+    body = orjson.dumps({"detail": "Service overloaded, retry later", "class": route_class.name, "reason": reason})
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(settings.ADMISSION_RETRY_AFTER_S).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that admits, queues or rejects each request by its class."""
+
+    def __init__(self, app, pool_wait: Callable[[], float]):
+        self.app = app
+        # Recent DB pool acquire wait in seconds
+        self.pool_wait = pool_wait
+
+    async def __call__(self, scope, receive, send):
+        name = classify(scope["method"], scope["path"], scope["query_string"]) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        route_class = classes[name]
+
+        if scope["method"] == "POST" and scope["path"] == "/api/alerts":
+            body, messages = await _read_body(receive)
+            receive = replay_receive(messages, receive)
+            if _is_high_priority_alert(body):
+                route_class.force()
+                try:
+                    await self.app(scope, receive, send)
+                finally:
+                    route_class.release()
+                return
+
+        if route_class.shed_wait_ms is not None and self.pool_wait() * 1000 > route_class.shed_wait_ms:
+            route_class.stats["shed"] += 1
+            await _reject(send, route_class, "db_pool_wait")
+            return
+
+        started = time.perf_counter()
+        if not await route_class.acquire(settings.ADMISSION_QUEUE_TIMEOUT_S):
+            timed_out = time.perf_counter() - started >= settings.ADMISSION_QUEUE_TIMEOUT_S
+            await _reject(send, route_class, "queue_timeout" if timed_out else "queue_full")
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.release()
@@ -0,0 +1,246 @@
+"""
+In-memory board of active emergencies, ordered by priority and age.
+
+Every emergency with status Active is kept in a sorted index keyed by
+(priority rank, time_created, id): Alta first, and within a priority the
+oldest first. The board is loaded once at startup and then kept current by
+the emergency write paths in src/routes/emergencies.py, which call
+`upsert()`/`remove()` after committing. `GET /api/alerts/board` reads it
+without touching the database.
+
+Each entry keeps its JSON already encoded, so a page of k items costs a
+bisect to the cursor (or a skip over whole buckets to an offset) plus k
+joins. Per-priority counts are kept up to date on every change, so a
+filtered page finds where its priority starts, and the total, without
+scanning the board.
+
+Writes that bypass the API (the bulk seeder, manual SQL) are only picked
+up on the next `load()`.
+"""
+import logging
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import select
+
+from src.models.emergency import Emergency, PriorityType, StatusType
+from src.services.serializer import ORJSON_OPTIONS, _default, serializer_for
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_RANK = {PriorityType.Alta: 0, PriorityType.Mitjana: 1, PriorityType.Baixa: 2}
+# Emergencies without a priority go last
+UNKNOWN_RANK = len(PRIORITY_RANK)
+
+Key = Tuple[int, float, str]
+
+
+class SortedKeyList:
+    """Sorted list split in buckets of bounded size.
+
+    add/remove bisect the bucket maxima and then one bucket, so they cost
+    O(log n) comparisons plus a memmove of at most 2 * LOAD pointers.
+    Iteration from a key is O(log n) to find it and O(1) per item after.
+    """
+
+    LOAD = 500
+
+    def __init__(self):
+        self._lists: List[List[Key]] = []
+        self._maxes: List[Key] = []
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def clear(self):
+        self._lists, self._maxes, self._len = [], [], 0
+
+    def update(self, keys: List[Key]):
+        """Bulk load, replacing the contents."""
+        keys = sorted(keys)
+        self._lists = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._maxes = [lst[-1] for lst in self._lists]
+        self._len = len(keys)
+
+    def add(self, key: Key):
+        if not self._maxes:
+            self._lists.append([key])
+            self._maxes.append(key)
+        else:
+            i = bisect_left(self._maxes, key)
+            if i == len(self._maxes):
+                i -= 1
+                self._lists[i].append(key)
+                self._maxes[i] = key
+            else:
+                insort(self._lists[i], key)
+            if len(self._lists[i]) > 2 * self.LOAD:
+                bucket = self._lists[i]
+                half = bucket[self.LOAD:]
+                del bucket[self.LOAD:]
+                self._maxes[i] = bucket[-1]
+                self._lists.insert(i + 1, half)
+                self._maxes.insert(i + 1, half[-1])
+        self._len += 1
+
+    def remove(self, key: Key):
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            raise KeyError(key)
+        bucket = self._lists[i]
+        j = bisect_left(bucket, key)
+        if j == len(bucket) or bucket[j] != key:
+            raise KeyError(key)
+        del bucket[j]
+        self._len -= 1
+        if not bucket:
+            del self._lists[i]
+            del self._maxes[i]
+        elif j == len(bucket):
+            self._maxes[i] = bucket[-1]
+
+    def iter_from(self, key: Optional[Key] = None, exclusive: bool = False) -> Iterator[Key]:
+        """Keys >= `key` (> with `exclusive`), in order."""
+        if key is None:
+            i, j = 0, 0
+        else:
+            find = bisect_right if exclusive else bisect_left
+            i = find(self._maxes, key)
+            if i == len(self._maxes):
+                return
+            j = find(self._lists[i], key)
+        for bucket in self._lists[i:]:
+            yield from bucket[j:]
+            j = 0
+
+    def iter_at(self, offset: int) -> Iterator[Key]:
+        """Keys from position `offset`, skipping whole buckets."""
+        for i, bucket in enumerate(self._lists):
+            if offset < len(bucket):
+                yield from bucket[offset:]
+                for rest in self._lists[i + 1:]:
+                    yield from rest
+                return
+            offset -= len(bucket)
+
+
+def encode_cursor(key: Key) -> str:
+    return f"{key[0]}~{key[1]!r}~{key[2]}"
+
+
+def decode_cursor(cursor: str) -> Key:
+    rank, ts, emergency_id = cursor.split("~", 2)
+    return int(rank), float(ts), emergency_id
+
+
+class AlertBoard:
+    def __init__(self):
+        self._index = SortedKeyList()
+        # id -> (sort key, encoded JSON)
+        self._entries: Dict[str, Tuple[Key, bytes]] = {}
+        # priority rank -> entries with that rank
+        self._counts: Dict[int, int] = {}
+        self.loaded = False
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(entry: Dict[str, Any]) -> Key:
+        created = entry.get("time_created")
+        return (
+            PRIORITY_RANK.get(entry.get("priority"), UNKNOWN_RANK),
+            created.timestamp() if isinstance(created, datetime) else 0.0,
+            str(entry["id"]),
+        )
+
+    @staticmethod
+    def _snapshot(emergency: Any) -> Dict[str, Any]:
+        if isinstance(emergency, dict):
+            entry = dict(emergency)
+        else:
+            entry = serializer_for(Emergency).to_dict(emergency)
+        return entry
+
+    def upsert(self, emergency: Any):
+        """Add or move an emergency (row or field dict); drops it once it is no longer Active."""
+        entry = self._snapshot(emergency)
+        emergency_id = str(entry["id"])
+        if entry.get("status") != StatusType.Active:
+            self.remove(emergency_id)
+            return
+        key = self._key(entry)
+        encoded = orjson.dumps(entry, default=_default, option=ORJSON_OPTIONS)
+        previous = self._entries.get(emergency_id)
+        if previous is not None and previous[0] != key:
+            self._index.remove(previous[0])
+            self._counts[previous[0][0]] -= 1
+        if previous is None or previous[0] != key:
+            self._index.add(key)
+            self._counts[key[0]] = self._counts.get(key[0], 0) + 1
+        self._entries[emergency_id] = (key, encoded)
+        self.version += 1
+
+    def remove(self, emergency_id: Any):
+        previous = self._entries.pop(str(emergency_id), None)
+        if previous is not None:
+            self._index.remove(previous[0])
+            self._counts[previous[0][0]] -= 1
+            self.version += 1
+
+    def page(self, limit: int, cursor: Optional[str] = None, offset: int = 0,
+             priority: Optional[PriorityType] = None) -> Tuple[List[bytes], Optional[str]]:
+        """Up to `limit` encoded entries after `cursor` (or from `offset`), and the next cursor."""
+        if cursor:
+            keys = self._index.iter_from(decode_cursor(cursor), exclusive=True)
+        elif priority is not None:
+            # The entries of a priority sit after those of every higher one
+            rank = PRIORITY_RANK[priority]
+            if offset >= self._counts.get(rank, 0):
+                return [], None
+            start = sum(count for r, count in self._counts.items() if r < rank)
+            keys = self._index.iter_at(start + offset)
+        else:
+            keys = self._index.iter_at(offset)
+
+        rank = PRIORITY_RANK[priority] if priority is not None else None
+        items: List[bytes] = []
+        last: Optional[Key] = None
+        for key in keys:
+            if rank is not None and key[0] != rank:
+                break
+            if len(items) == limit:
+                return items, encode_cursor(last)
+            items.append(self._entries[key[2]][1])
+            last = key
+        return items, None
+
+    def count(self, priority: Optional[PriorityType] = None) -> int:
+        if priority is None:
+            return len(self._entries)
+        return self._counts.get(PRIORITY_RANK[priority], 0)
+
+    async def load(self, session) -> int:
+        """Replace the board with the Active emergencies in the database."""
+        result = await session.execute(select(Emergency).where(Emergency.status == StatusType.Active))
+        entries: Dict[str, Tuple[Key, bytes]] = {}
+        for emergency in result.scalars():
+            entry = self._snapshot(emergency)
+            key = self._key(entry)
+            entries[key[2]] = (key, orjson.dumps(entry, default=_default, option=ORJSON_OPTIONS))
+        counts: Dict[int, int] = {}
+        for key, _ in entries.values():
+            counts[key[0]] = counts.get(key[0], 0) + 1
+        self._entries = entries
+        self._counts = counts
+        self._index.update([key for key, _ in entries.values()])
+        self.loaded = True
+        self.version += 1
+        return len(entries)
+
+
+alert_board = AlertBoard()
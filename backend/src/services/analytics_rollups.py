@@ -0,0 +1,182 @@
+"""
+Hourly rollups of incident volume and time to resolve.
+
+`emergency_rollup_hourly` holds, per hour of time_created, emergency type
+and priority, how many incidents were opened, how many of them are resolved
+and the sum/min/max of their time to resolve. The time to resolve is
+time_updated - time_created of the closed (Solved/Archived) ones, i.e. up
+to their last change. GET /api/analytics/response-times aggregates the
+rollup into the requested buckets without touching `emergency`.
+
+`refresh()` is incremental: it finds the hours with rows created or updated
+since the watermark (ix_emergency_time_created, ix_emergency_time_updated)
+and recomputes only those hours, reading `emergency` and `emergency_archive`
+within their time range. Recomputing whole hours keeps it idempotent, so
+the watermark is moved back by ANALYTICS_REFRESH_OVERLAP_S to catch
+transactions that committed after the previous refresh but started before
+it. Deleted emergencies leave no trace to detect; they drop out of the
+rollup when their hour is recomputed or on a full refresh.
+"""
+import asyncio
+import contextlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.configs.config import settings
+from src.models.analytics import AnalyticsWatermark, EmergencyRollupHourly
+from src.models.emergency import Emergency
+
+logger = logging.getLogger(__name__)
+
+ROLLUP = EmergencyRollupHourly.__tablename__
+
+# pg_advisory_xact_lock key, so only one backend process refreshes at a time
+REFRESH_LOCK = 0x5E4F0041
+
+# One hour of both tables, the closed incidents carrying their time to resolve
+_HOUR_ROWS = """
+    SELECT emergency_type, priority, status, time_created, time_updated FROM emergency
+    WHERE time_created >= b.bucket AND time_created < b.bucket + interval '1 hour'
+    UNION ALL
+    SELECT emergency_type, priority, status, time_created, time_updated FROM emergency_archive
+    WHERE time_created >= b.bucket AND time_created < b.bucket + interval '1 hour'
+"""
+
+# Null types and priorities count as the model defaults
+_AGGREGATE = f"""
+    INSERT INTO {ROLLUP} (bucket, emergency_type, priority, incidents, resolved,
+                          resolve_seconds_sum, resolve_seconds_min, resolve_seconds_max)
+    SELECT b.bucket,
+           coalesce(e.emergency_type, 'Altres'),
+           coalesce(e.priority, 'Mitjana'),
+           count(*),
+           count(e.resolve_s),
+           coalesce(sum(e.resolve_s), 0),
+           min(e.resolve_s),
+           max(e.resolve_s)
+    FROM {{buckets}} b
+    CROSS JOIN LATERAL (
+        SELECT h.emergency_type, h.priority,
+               CASE WHEN h.status IN ('Solved', 'Archived') AND h.time_updated IS NOT NULL
+                    THEN extract(epoch FROM h.time_updated - h.time_created) END AS resolve_s
+        FROM ({_HOUR_ROWS}) h
+    ) e
+    GROUP BY 1, 2, 3
+"""
+
+
+async def _full_refresh(conn: AsyncConnection) -> int:
+    await conn.execute(text(f"TRUNCATE {ROLLUP}"))
+    result = await conn.execute(text(_AGGREGATE.format(buckets="""(
+        SELECT DISTINCT date_trunc('hour', time_created, 'UTC') AS bucket FROM emergency
+        UNION
+        SELECT DISTINCT date_trunc('hour', time_created, 'UTC') FROM emergency_archive
+    )""")))
+    return result.rowcount
+
+
+async def _incremental_refresh(conn: AsyncConnection, since: datetime) -> int:
+    changed = (Emergency.time_created >= since) | (Emergency.time_updated >= since)
+    result = await conn.execute(
+        select(func.date_trunc("hour", Emergency.time_created, "UTC")).where(changed).distinct()
+    )
+    buckets = [row[0] for row in result]
+    if not buckets:
+        return 0
+    await conn.execute(delete(EmergencyRollupHourly).where(EmergencyRollupHourly.bucket.in_(buckets)))
+    result = await conn.execute(
+        text(_AGGREGATE.format(buckets="(SELECT unnest(CAST(:buckets AS timestamptz[])) AS bucket)")),
+        {"buckets": buckets},
+    )
+    return result.rowcount
+
+
+async def refresh(engine, full: bool = False) -> Optional[Dict]:
+    """Bring the rollup up to date, recomputing every hour if `full`.
+
+    Returns None if another process holds the refresh lock.
+    """
+    async with engine.begin() as conn:
+        locked = (await conn.execute(text(f"SELECT pg_try_advisory_xact_lock({REFRESH_LOCK})"))).scalar()
+        if not locked:
+            return None
+        # now() is the start of this transaction: rows changed later are seen next time
+        now = (await conn.execute(select(func.now()))).scalar()
+        watermark = (await conn.execute(
+            select(AnalyticsWatermark.value).where(AnalyticsWatermark.name == ROLLUP)
+        )).scalar()
+
+        if full or watermark is None:
+            rows = await _full_refresh(conn)
+            mode = "full"
+        else:
+            since = watermark - timedelta(seconds=settings.ANALYTICS_REFRESH_OVERLAP_S)
+            rows = await _incremental_refresh(conn, since)
+            mode = "incremental"
+
+        statement = insert(AnalyticsWatermark).values(name=ROLLUP, value=now)
+        await conn.execute(statement.on_conflict_do_update(
+            index_elements=[AnalyticsWatermark.name], set_={"value": statement.excluded.value}
+        ))
+    return {"mode": mode, "rows_written": rows, "watermark": now}
+
+
+class RollupRefreshJob:
+    """Runs `refresh` in the background: once right away, then every `interval` seconds."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[datetime] = None
+        self.last_summary: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+
+    async def run_once(self, engine, full: bool = False) -> Optional[Dict]:
+        started = datetime.now(timezone.utc)
+        try:
+            summary = await refresh(engine, full)
+            self.last_error = None
+            if summary is None:
+                logger.info("Analytics refresh skipped: another process is running it")
+            else:
+                summary["duration_ms"] = round((datetime.now(timezone.utc) - started).total_seconds() * 1000, 1)
+                self.last_summary = summary
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.warning(f"Analytics refresh failed: {self.last_error}")
+        self.last_run = datetime.now(timezone.utc)
+        return self.last_summary
+
+    async def _run(self, engine, interval: float):
+        while True:
+            await self.run_once(engine)
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+
+    def start(self, engine, interval: float):
+        """Start the job without waiting for its first run; with `interval` 0 it only runs that once."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(engine, interval))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def status(self) -> dict:
+        return {
+            "last_run": self.last_run,
+            "last_summary": self.last_summary,
+            "last_error": self.last_error,
+            "interval_s": settings.ANALYTICS_REFRESH_INTERVAL_S,
+        }
+
+
+rollup_refresh_job = RollupRefreshJob()
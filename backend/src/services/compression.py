@@ -0,0 +1,219 @@
+"""
+Response compression negotiated from Accept-Encoding.
+
+gzip is always available; zstd (the `zstandard` package) and br (`Brotli`)
+are used when installed and the client accepts them. Among the encodings
+the client accepts with the same q-value, the order is zstd, br, gzip: zstd
+compresses about as well as gzip at a fraction of the CPU, brotli a little
+better at about the same cost.
+
+Bodies under COMPRESSION_MIN_SIZE are sent as they are, as is anything that
+already has a Content-Encoding or is compressed already (images, Parquet,
+archives). Streaming responses are compressed chunk by chunk. Large bodies
+are compressed in a worker thread (the three libraries release the GIL),
+so the event loop keeps serving other requests.
+
+A strong ETag promises byte-identical bodies, which the encoded one is
+not, so a compressed response gets the weak form (W/"..."). If-None-Match
+is compared weakly, so the client's next conditional request still
+matches (see serializer.etag_response).
+"""
+import asyncio
+import gzip
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.configs.config import settings
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+# Compressed off the event loop above this size
+THREAD_MIN_SIZE = 256 * 1024
+SKIP_CONTENT_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip",
+                      "application/vnd.apache.parquet")
+
+
+class _Gzip:
+    def __init__(self):
+        # wbits 16 + MAX_WBITS: gzip header and trailer
+        self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    @staticmethod
+    def oneshot(data: bytes) -> bytes:
+        return gzip.compress(data, settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class _Zstd:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    @staticmethod
+    def oneshot(data: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compress(data)
+
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+    @staticmethod
+    def oneshot(data: bytes) -> bytes:
+        return brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+
+# In order of preference
+ENCODINGS: Dict[str, type] = {}
+if zstandard is not None:
+    ENCODINGS["zstd"] = _Zstd
+if brotli is not None:
+    ENCODINGS["br"] = _Brotli
+ENCODINGS["gzip"] = _Gzip
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The encoding to use for an Accept-Encoding header, or None for identity."""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                continue
+        if name:
+            accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _without(headers: List[Tuple[bytes, bytes]], *names: bytes) -> List[Tuple[bytes, bytes]]:
+    return [(k, v) for k, v in headers if k.lower() not in names]
+
+
+def _weaken_etag(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    etag = _header(headers, b"etag")
+    if etag is None or etag.startswith(b"W/"):
+        return headers
+    return _without(headers, b"etag") + [(b"etag", b"W/" + etag)]
+
+
+def _add_vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    vary = _header(headers, b"vary")
+    if vary is None:
+        return headers + [(b"vary", b"Accept-Encoding")]
+    if b"accept-encoding" in vary.lower() or vary == b"*":
+        return headers
+    return _without(headers, b"vary") + [(b"vary", vary + b", Accept-Encoding")]
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses responses with the best encoding the client accepts."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate((_header(scope["headers"], b"accept-encoding") or b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        codec: Callable = ENCODINGS[encoding]
+
+        start: Optional[dict] = None
+        compressor = None
+        # True once the response is known not to be compressed
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+                if (message["status"] < 200 or message["status"] in (204, 304)
+                        or _header(headers, b"content-encoding") is not None
+                        or content_type.startswith(SKIP_CONTENT_TYPES)):
+                    passthrough = True
+                    await send(message)
+                    return
+                # Held until the first body chunk says how large the response is
+                start = {**message, "headers": _add_vary(headers)}
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body, more = message.get("body", b""), message.get("more_body", False)
+            if compressor is None:
+                if not more:
+                    # The whole response in one message
+                    if len(body) < settings.COMPRESSION_MIN_SIZE:
+                        passthrough = True
+                        await send(start)
+                        await send(message)
+                        return
+                    if len(body) >= THREAD_MIN_SIZE:
+                        body = await asyncio.to_thread(codec.oneshot, body)
+                    else:
+                        body = codec.oneshot(body)
+                    start["headers"] = _without(_weaken_etag(start["headers"]), b"content-length") + [
+                        (b"content-encoding", encoding.encode()),
+                        (b"content-length", str(len(body)).encode()),
+                    ]
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                # Streaming: compress each chunk, the length is not known up front
+                compressor = codec()
+                start["headers"] = _without(_weaken_etag(start["headers"]), b"content-length") + [
+                    (b"content-encoding", encoding.encode()),
+                ]
+                await send(start)
+            chunk = compressor.compress(body) if body else b""
+            if not more:
+                chunk += compressor.flush()
+            if chunk or not more:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
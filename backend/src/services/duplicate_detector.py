@@ -0,0 +1,178 @@
+"""
+Spatio-temporal detection of duplicate emergency reports.
+
+A serious incident is usually reported by several callers within minutes
+and a few dozen metres of each other. POST /api/alerts asks `find` for an
+Active emergency of the same EmergencyType within DUPLICATE_RADIUS_M metres
+and DUPLICATE_WINDOW_MIN minutes of the new one. What happens to a match
+depends on DUPLICATE_ACTION:
+- "flag": the new emergency is created with duplicate_of set to the
+  original, so dispatchers can fold it into the first one.
+- "merge": nothing is created and the original emergency is returned.
+
+The recent emergencies live in a hash of (row, column, time bucket) cells:
+rows and columns at least DUPLICATE_RADIUS_M wide and buckets
+DUPLICATE_WINDOW_MIN long. This is the same idea as a geohash prefix plus
+a time prefix, sized to the radius. A match can only be in the 3x3 cells
+around the point, in this bucket or the one before. So a lookup reads at
+most 18 small lists, however many emergencies there are. Buckets older
+than the window are dropped as time moves on.
+
+Each process keeps its own index, loaded from the database at startup, so
+two reports handled by different processes at the same moment can both be
+created.
+"""
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from src.configs.config import settings
+from src.models.emergency import Emergency, EmergencyType, StatusType
+from src.models.location import Location
+
+EARTH_RADIUS_M = 6371000.0
+METRES_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+Cell = Tuple[int, int, int]
+
+
+class Entry:
+    __slots__ = ("id", "root", "emergency_type", "latitude", "longitude", "created", "cell")
+
+    def __init__(self, emergency_id, root, emergency_type, latitude, longitude, created, cell):
+        self.id = emergency_id
+        # The first report of the incident; duplicates point at it, not at each other
+        self.root = root
+        self.emergency_type = emergency_type
+        self.latitude = latitude
+        self.longitude = longitude
+        self.created = created
+        self.cell = cell
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Haversine distance."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class DuplicateDetector:
+    def __init__(self, radius_m: float, window_s: float):
+        self.radius_m = radius_m
+        self.window_s = window_s
+        self._row_deg = radius_m / METRES_PER_DEGREE
+        self._cells: Dict[Cell, List[Entry]] = defaultdict(list)
+        # time bucket -> cells holding entries of that bucket, for eviction
+        self._buckets: Dict[int, set] = defaultdict(set)
+        self._entries: Dict[object, Entry] = {}
+        self.stats = {"checked": 0, "duplicates": 0, "evicted": 0}
+
+    def _row(self, latitude: float) -> int:
+        return math.floor((latitude + 90) / self._row_deg)
+
+    def _column(self, row: int, longitude: float) -> int:
+        # A row is as wide as the radius where it is narrowest, its edge nearest a pole
+        edge = min(89.9999, max(abs(row * self._row_deg - 90), abs((row + 1) * self._row_deg - 90)))
+        column_deg = min(360.0, self._row_deg / math.cos(math.radians(edge)))
+        return math.floor((longitude + 180) / column_deg)
+
+    def _bucket(self, created: float) -> int:
+        return math.floor(created / self.window_s)
+
+    def _evict(self, now: float):
+        oldest = self._bucket(now) - 1
+        for bucket in [b for b in self._buckets if b < oldest]:
+            for cell in self._buckets.pop(bucket):
+                for entry in self._cells.pop(cell, ()):
+                    self._entries.pop(entry.id, None)
+                    self.stats["evicted"] += 1
+
+    def find(self, emergency_type: EmergencyType, latitude: float, longitude: float,
+             now: Optional[float] = None) -> Optional[Entry]:
+        """The closest recent emergency of the same type within the radius, if any."""
+        now = time.time() if now is None else now
+        self._evict(now)
+        self.stats["checked"] += 1
+        row, bucket = self._row(latitude), self._bucket(now)
+        best, best_distance = None, self.radius_m
+        for r in (row - 1, row, row + 1):
+            column = self._column(r, longitude)
+            for c in (column - 1, column, column + 1):
+                for b in (bucket - 1, bucket):
+                    for entry in self._cells.get((r, c, b), ()):
+                        if entry.emergency_type != emergency_type or now - entry.created > self.window_s:
+                            continue
+                        distance = distance_m(latitude, longitude, entry.latitude, entry.longitude)
+                        if distance <= best_distance:
+                            best, best_distance = entry, distance
+        if best is not None:
+            self.stats["duplicates"] += 1
+        return best
+
+    def add(self, emergency_id, emergency_type: EmergencyType, latitude: float, longitude: float,
+            created: Optional[float] = None, root=None):
+        created = time.time() if created is None else created
+        row = self._row(latitude)
+        cell = (row, self._column(row, longitude), self._bucket(created))
+        self.forget(emergency_id)
+        entry = Entry(emergency_id, root or emergency_id, emergency_type, latitude, longitude, created, cell)
+        self._cells[cell].append(entry)
+        self._buckets[cell[2]].add(cell)
+        self._entries[emergency_id] = entry
+
+    def forget(self, emergency_id):
+        """Stop matching an emergency (resolved, deleted, or its insert failed)."""
+        entry = self._entries.pop(emergency_id, None)
+        if entry is None:
+            return
+        entries = self._cells.get(entry.cell)
+        if entries is not None:
+            entries.remove(entry)
+            if not entries:
+                del self._cells[entry.cell]
+                self._buckets[entry.cell[2]].discard(entry.cell)
+
+    def retype(self, emergency_id, emergency_type: EmergencyType):
+        entry = self._entries.get(emergency_id)
+        if entry is not None:
+            entry.emergency_type = emergency_type
+
+    async def load(self, session) -> int:
+        """Index the Active emergencies created within the window."""
+        since = datetime.fromtimestamp(time.time() - self.window_s, timezone.utc)
+        result = await session.execute(
+            select(Emergency.id, Emergency.duplicate_of, Emergency.emergency_type, Emergency.time_created,
+                   Location.latitude, Location.longitude)
+            .join(Location, Location.id == Emergency.location_emergency)
+            .where(Emergency.status == StatusType.Active, Emergency.time_created >= since)
+        )
+        self._cells.clear()
+        self._buckets.clear()
+        self._entries.clear()
+        for row in result:
+            if row.latitude is None or row.longitude is None:
+                continue
+            self.add(row.id, row.emergency_type, row.latitude, row.longitude,
+                     created=row.time_created.timestamp(), root=row.duplicate_of)
+        return len(self._entries)
+
+    def status(self) -> dict:
+        return {
+            **self.stats,
+            "action": settings.DUPLICATE_ACTION,
+            "radius_m": self.radius_m,
+            "window_s": self.window_s,
+            "indexed": len(self._entries),
+            "cells": len(self._cells),
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+duplicate_detector = DuplicateDetector(settings.DUPLICATE_RADIUS_M, settings.DUPLICATE_WINDOW_MIN * 60)
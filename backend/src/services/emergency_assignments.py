@@ -1,43 +1,57 @@
 """
 Servicio para gestionar asignaciones de dispositivos a emergencias
+
+Las asignaciones viven solo en la tabla `EmergencyResourceLink`; las
+consultas por alerta o por dispositivo la leen directamente, así que todos
+los procesos ven lo mismo.
 """
+import uuid as uuid_pkg
+from typing import Iterable, Set, Tuple
+
+from sqlalchemy import delete, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.emergencyresourceslink import EmergencyResourceLink
+from src.models.resource import Resource
+
 
 class EmergencyAssignments:
-    def __init__(self):
-        self.device_to_alerts = {}  # {device_id: [alert_id1, alert_id2, ...]}
-        self.alert_to_devices = {}  # {alert_id: [device_id1, device_id2, ...]}
-    
-    def assign_device(self, alert_id: str, device_id: str):
-        """Asigna un dispositivo a una alerta"""
-        # Actualizar mapping de alerta a dispositivos
-        if alert_id not in self.alert_to_devices:
-            self.alert_to_devices[alert_id] = []
-        if device_id not in self.alert_to_devices[alert_id]:
-            self.alert_to_devices[alert_id].append(device_id)
-        
-        # Actualizar mapping de dispositivo a alertas
-        if device_id not in self.device_to_alerts:
-            self.device_to_alerts[device_id] = []
-        if alert_id not in self.device_to_alerts[device_id]:
-            self.device_to_alerts[device_id].append(alert_id)
-    
-    def unassign_device(self, alert_id: str, device_id: str):
-        """Desasigna un dispositivo de una alerta"""
-        # Remover de alerta a dispositivos
-        if alert_id in self.alert_to_devices and device_id in self.alert_to_devices[alert_id]:
-            self.alert_to_devices[alert_id].remove(device_id)
-        
-        # Remover de dispositivo a alertas
-        if device_id in self.device_to_alerts and alert_id in self.device_to_alerts[device_id]:
-            self.device_to_alerts[device_id].remove(alert_id)
-    
-    def get_alert_devices(self, alert_id: str) -> list:
-        """Obtiene todos los dispositivos asignados a una alerta"""
-        return self.alert_to_devices.get(alert_id, [])
-    
-    def get_device_alerts(self, device_id: str) -> list:
-        """Obtiene todas las alertas asignadas a un dispositivo"""
-        return self.device_to_alerts.get(device_id, [])
+    async def apply(self, session: AsyncSession, alert_id: uuid_pkg.UUID,
+                    assign: Iterable[uuid_pkg.UUID] = (),
+                    unassign: Iterable[uuid_pkg.UUID] = ()) -> Tuple[Set[str], Set[str]]:
+        """Asigna y desasigna varios dispositivos, una sentencia por operación y una sola transacción.
+
+        Los ids que no existen en `resource` se ignoran. Devuelve los
+        dispositivos que se han asignado y desasignado de verdad (no los que
+        ya lo estaban).
+        """
+        assign, unassign = set(assign), set(unassign)
+        assigned: Set[str] = set()
+        unassigned: Set[str] = set()
+
+        if unassign:
+            result = await session.execute(
+                delete(EmergencyResourceLink)
+                .where(EmergencyResourceLink.emergency_id == alert_id,
+                       EmergencyResourceLink.resource_id.in_(unassign))
+                .returning(EmergencyResourceLink.resource_id)
+            )
+            unassigned = {str(r) for r in result.scalars()}
+
+        if assign:
+            # INSERT ... SELECT drops unknown resources, ON CONFLICT the ones already linked
+            rows = select(literal(alert_id, EmergencyResourceLink.emergency_id.type), Resource.id).where(Resource.id.in_(assign))
+            result = await session.execute(
+                insert(EmergencyResourceLink)
+                .from_select(["emergency_id", "resource_id"], rows)
+                .on_conflict_do_nothing()
+                .returning(EmergencyResourceLink.resource_id)
+            )
+            assigned = {str(r) for r in result.scalars()}
+
+        await session.commit()
+        return assigned, unassigned
 
 # Singleton instance
-emergency_assignments = EmergencyAssignments() 
\ No newline at end of file
+emergency_assignments = EmergencyAssignments()
@@ -0,0 +1,378 @@
+"""
+Monthly partitions of the emergency table and archival of old incidents.
+
+`emergency` is range-partitioned by time_created, one partition per month
+(`emergency_pYYYYMM`) plus `emergency_default` for anything outside them.
+Closed incidents (Solved/Archived) older than EMERGENCY_ARCHIVE_AFTER_DAYS
+are moved to `emergency_archive`, which has the same columns and the same
+monthly layout (`emergency_archive_pYYYYMM`). The routes only query
+`emergency`, so they never read cold data unless they ask for it
+(`archive_table`).
+
+`archive()` works a month at a time, for months that ended before the
+cutoff:
+- no Active incident left: the partition is detached from `emergency` and
+  attached to `emergency_archive`, which only touches the catalog
+- otherwise the closed rows are moved with DELETE ... RETURNING / INSERT,
+  MOVE_BATCH_ROWS at a time, and the partition stays hot until its last
+  incident is closed
+Archived incidents keep their resource links (which reference
+`emergency_id`, not the partition), so assignment history survives. They
+only keep the foreign keys `emergency_archive` declares: the ones to
+location, address and resource belong to the hot table, whose indexes on
+those columns are not kept either.
+
+`ensure_partitions()` creates the partitions for the coming months, so new
+rows never land in the default partition. Both run in the background
+shortly after startup and then every EMERGENCY_ARCHIVE_INTERVAL_S.
+
+Every partition change and every batch of rows is its own short
+transaction, with a lock_timeout. DETACH PARTITION locks all of
+`emergency`, so a long maintenance transaction would stall every read and
+write of it. A step that cannot get its lock is left for the next run.
+
+Ids stay unique across `emergency` and `emergency_archive` through the
+`emergency_id` table (see src/models/emergency.py), which both reference.
+
+The migration (alembic/versions/a52c9e7f1d08_partition_emergency.py)
+creates the initial layout.
+"""
+import asyncio
+import contextlib
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import MetaData, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.configs.config import settings
+from src.models.emergency import Emergency
+
+logger = logging.getLogger(__name__)
+
+HOT_TABLE = "emergency"
+ARCHIVE_TABLE = "emergency_archive"
+
+# Core table for reading archived incidents; kept out of SQLModel.metadata
+# so create_all and Alembic do not treat it as a model
+archive_table = Emergency.__table__.to_metadata(MetaData(), name=ARCHIVE_TABLE)
+
+# Maintenance statements give up after this long waiting for a lock instead
+# of queueing every query on emergency behind them; the step is retried on
+# the next run
+LOCK_TIMEOUT_MS = 2000
+# Rows moved to the archive per transaction
+MOVE_BATCH_ROWS = 5000
+
+# Tables created here rather than by the models (partitions and the archive)
+_MANAGED = re.compile(r"^emergency_(archive|archive_default|archive_p\d{6}|default|p\d{6})$")
+
+
+def is_managed_table(name: str) -> bool:
+    return bool(_MANAGED.match(name))
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value: datetime) -> datetime:
+    return value.replace(year=value.year + value.month // 12, month=value.month % 12 + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+async def _partitions(conn: AsyncConnection, table: str) -> Dict[str, Tuple[datetime, datetime]]:
+    """Monthly partitions of `table` by name, with their bounds."""
+    result = await conn.execute(text(f"""
+        SELECT c.relname
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = '{table}'::regclass
+    """))
+    partitions = {}
+    prefix = f"{table}_p"
+    for (name,) in result:
+        if name.startswith(prefix) and name[len(prefix):].isdigit():
+            month = datetime.strptime(name[len(prefix):], "%Y%m").replace(tzinfo=timezone.utc)
+            partitions[name] = (month, next_month(month))
+    return partitions
+
+
+async def _take_from_default(conn: AsyncConnection, table: str, partition: str, lower: str, upper: str):
+    # A partition cannot be attached while the default one has rows in its range
+    await conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {table}_default
+            WHERE time_created >= '{lower}' AND time_created < '{upper}'
+            RETURNING *
+        )
+        INSERT INTO {partition} SELECT * FROM moved
+    """))
+
+
+async def _attach(conn: AsyncConnection, table: str, partition: str, month: datetime):
+    lower, upper = month.isoformat(), next_month(month).isoformat()
+    await _take_from_default(conn, table, partition, lower, upper)
+    await conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {partition} FOR VALUES FROM ('{lower}') TO ('{upper}')"))
+
+
+@contextlib.asynccontextmanager
+async def _transaction(conn: AsyncConnection):
+    """One short maintenance transaction that gives up rather than queue behind other locks."""
+    async with conn.begin() as transaction:
+        await conn.execute(text(f"SET LOCAL lock_timeout = {LOCK_TIMEOUT_MS}"))
+        yield transaction
+
+
+async def _create_partition(conn: AsyncConnection, table: str, month: datetime) -> str:
+    """Add the partition of `month`, taking over the rows the default partition holds for it. Own transaction."""
+    name = partition_name(table, month)
+    async with _transaction(conn):
+        await conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+        await _attach(conn, table, name, month)
+    return name
+
+
+async def ensure_partitions(conn: AsyncConnection, months_ahead: int = None, table: str = HOT_TABLE) -> List[str]:
+    """Create the partitions of `table` from this month to `months_ahead` months ahead, one transaction each."""
+    months_ahead = settings.EMERGENCY_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    existing = await _partitions(conn, table)
+    await conn.commit()
+    created = []
+    month = month_start(datetime.now(timezone.utc))
+    for _ in range(months_ahead + 1):
+        if partition_name(table, month) not in existing:
+            created.append(await _create_partition(conn, table, month))
+        month = next_month(month)
+    return created
+
+
+async def _scalar(conn: AsyncConnection, statement: str):
+    async with _transaction(conn):
+        return (await conn.execute(text(statement))).scalar()
+
+
+async def _move_partition(conn: AsyncConnection, name: str, target: str, month: datetime) -> Optional[int]:
+    """Move a whole partition with no Active incident to the archive: the rows moved, None if one appeared.
+
+    A validated CHECK matching the partition bounds lets ATTACH skip its
+    scan, so the transaction that holds the lock on emergency only changes
+    the catalog. The CHECK is added and validated beforehand without
+    blocking readers or writers.
+    """
+    bounds = f"time_created >= '{month.isoformat()}' AND time_created < '{next_month(month).isoformat()}'"
+    check = f"{name}_bounds"
+    async with _transaction(conn):
+        await conn.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT IF EXISTS {check}"))
+        await conn.execute(text(f"ALTER TABLE {name} ADD CONSTRAINT {check} CHECK ({bounds}) NOT VALID"))
+    async with _transaction(conn):
+        await conn.execute(text(f"ALTER TABLE {name} VALIDATE CONSTRAINT {check}"))
+
+    async with _transaction(conn) as transaction:
+        await conn.execute(text(f"ALTER TABLE {HOT_TABLE} DETACH PARTITION {name}"))
+        # Checked again now that nothing can write to it
+        if (await conn.execute(text(f"SELECT count(*) FROM {name} WHERE status = 'Active'"))).scalar():
+            await transaction.rollback()
+            return None
+        rows = (await conn.execute(text(f"SELECT count(*) FROM {name}"))).scalar()
+        await conn.execute(text(f"ALTER TABLE {name} RENAME TO {target}"))
+        # Cold storage has neither the hot foreign keys nor the indexes behind them
+        # (nor the partial ones on Active incidents)
+        await _drop_hot_foreign_keys(conn, target)
+        await _drop_hot_indexes(conn, target)
+        await _attach(conn, ARCHIVE_TABLE, target, month)
+        await conn.execute(text(f"ALTER TABLE {target} DROP CONSTRAINT {check}"))
+    return rows
+
+
+async def _move_rows(conn: AsyncConnection, source: str, condition: str) -> int:
+    """Move the rows of `source` matching `condition` to the archive, MOVE_BATCH_ROWS per transaction."""
+    rows = 0
+    while True:
+        async with _transaction(conn):
+            moved = (await conn.execute(text(f"""
+                WITH moved AS (
+                    DELETE FROM {source}
+                    WHERE ctid IN (SELECT ctid FROM {source} WHERE {condition} LIMIT {MOVE_BATCH_ROWS})
+                    RETURNING *
+                ),
+                archived AS (INSERT INTO {ARCHIVE_TABLE} SELECT * FROM moved RETURNING 1)
+                SELECT count(*) FROM archived
+            """))).scalar()
+        rows += moved
+        if moved < MOVE_BATCH_ROWS:
+            return rows
+
+
+async def archive(conn: AsyncConnection, older_than_days: Optional[float] = None) -> Dict[str, int]:
+    """Move closed incidents of the months that ended before the cutoff to the archive.
+
+    Every step commits on its own, so emergency is never locked for more
+    than one catalog change or one batch of rows.
+    """
+    days = settings.EMERGENCY_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    summary = {"partitions_moved": 0, "rows_moved": 0, "partitions_kept_hot": 0, "partitions_skipped": 0}
+
+    archived = await _partitions(conn, ARCHIVE_TABLE)
+    hot = await _partitions(conn, HOT_TABLE)
+    await conn.commit()
+    for name, (month, upper) in sorted(hot.items(), key=lambda p: p[1]):
+        if upper > cutoff:
+            continue
+        target = partition_name(ARCHIVE_TABLE, month)
+        try:
+            active = await _scalar(conn, f"SELECT count(*) FROM {name} WHERE status = 'Active'")
+            if active == 0 and target not in archived:
+                moved = await _move_partition(conn, name, target, month)
+                if moved is not None:
+                    archived[target] = (month, upper)
+                    summary["partitions_moved"] += 1
+                    summary["rows_moved"] += moved
+                    continue
+                active = 1
+
+            if target not in archived:
+                await _create_partition(conn, ARCHIVE_TABLE, month)
+                archived[target] = (month, upper)
+            summary["rows_moved"] += await _move_rows(conn, name, "status <> 'Active'")
+            if active:
+                summary["partitions_kept_hot"] += 1
+            else:
+                async with _transaction(conn):
+                    await conn.execute(text(f"ALTER TABLE {HOT_TABLE} DETACH PARTITION {name}"))
+                    await conn.execute(text(f"DROP TABLE {name}"))
+        except DBAPIError as e:
+            # Most likely lock_timeout: the month is retried on the next run
+            if conn.in_transaction():
+                await conn.rollback()
+            summary["partitions_skipped"] += 1
+            logger.warning(f"Archiving {name} postponed: {e.orig}")
+
+    # Rows that fell outside every monthly partition
+    summary["rows_moved"] += await _move_rows(conn, f"{HOT_TABLE}_default",
+                                              f"status <> 'Active' AND time_created < '{cutoff.isoformat()}'")
+    return summary
+
+
+async def _drop_hot_foreign_keys(conn: AsyncConnection, table: str):
+    """Drop the foreign keys a detached partition kept from the hot table, but those to emergency_id.
+
+    emergency_archive only declares the ones to emergency_id, which ATTACH
+    then takes over as they are; rows moved one by one get the same set.
+    """
+    result = await conn.execute(text(f"""
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = '{table}'::regclass AND contype = 'f' AND confrelid <> 'emergency_id'::regclass
+    """))
+    for (constraint,) in result.all():
+        await conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"'))
+
+
+async def _drop_hot_indexes(conn: AsyncConnection, table: str):
+    """Drop the indexes emergency_archive has no counterpart for.
+
+    Those it has (same columns, no predicate) are kept for ATTACH to adopt;
+    dropping them would make it build them again while emergency is locked.
+    """
+    columns = """array(SELECT a.attname FROM unnest(x.indkey) WITH ORDINALITY AS k(attnum, n)
+                       JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum ORDER BY k.n)"""
+    result = await conn.execute(text(f"""
+        SELECT i.relname
+        FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = '{table}'::regclass
+          AND (x.indpred IS NOT NULL OR {columns} NOT IN (
+              SELECT {columns} FROM pg_index x
+              WHERE x.indrelid = '{ARCHIVE_TABLE}'::regclass AND x.indpred IS NULL))
+    """))
+    for (index,) in result.all():
+        await conn.execute(text(f'DROP INDEX "{index}"'))
+
+
+# pg_advisory_lock key, so only one backend process maintains partitions at a time
+MAINTENANCE_LOCK = 0x5E4F0040
+
+
+async def maintain(engine) -> Optional[Dict[str, int]]:
+    """Create upcoming partitions and archive old incidents, each step in its own short transaction.
+
+    Returns None if another process holds the maintenance lock.
+    """
+    async with engine.connect() as conn:
+        # Session-level, so it outlives the transactions below
+        locked = (await conn.execute(text(f"SELECT pg_try_advisory_lock({MAINTENANCE_LOCK})"))).scalar()
+        await conn.commit()
+        if not locked:
+            return None
+        try:
+            created = await ensure_partitions(conn)
+            summary = await archive(conn)
+        finally:
+            if conn.in_transaction():
+                await conn.rollback()
+            await conn.execute(text(f"SELECT pg_advisory_unlock({MAINTENANCE_LOCK})"))
+            await conn.commit()
+    summary["partitions_created"] = len(created)
+    return summary
+
+
+class ArchivalJob:
+    """Runs `maintain` in the background: once right away, then every `interval` seconds."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[datetime] = None
+        self.last_summary: Optional[Dict[str, int]] = None
+        self.last_error: Optional[str] = None
+
+    async def run_once(self, engine) -> Optional[Dict[str, int]]:
+        try:
+            summary = await maintain(engine)
+            self.last_error = None
+            if summary is None:
+                logger.info("Emergency archival skipped: another process is running it")
+            else:
+                self.last_summary = summary
+                if summary["rows_moved"] or summary["partitions_created"] or summary["partitions_skipped"]:
+                    logger.info(f"Emergency archival: {summary}")
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.warning(f"Emergency archival failed: {self.last_error}")
+        self.last_run = datetime.now(timezone.utc)
+        return self.last_summary
+
+    async def _run(self, engine, interval: float):
+        while True:
+            await self.run_once(engine)
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+
+    def start(self, engine, interval: float):
+        """Start the job without waiting for its first run; with `interval` 0 it only runs that once."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(engine, interval))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def status(self) -> dict:
+        return {
+            "last_run": self.last_run,
+            "last_summary": self.last_summary,
+            "last_error": self.last_error,
+            "interval_s": settings.EMERGENCY_ARCHIVE_INTERVAL_S,
+            "archive_after_days": settings.EMERGENCY_ARCHIVE_AFTER_DAYS,
+        }
+
+
+archival_job = ArchivalJob()
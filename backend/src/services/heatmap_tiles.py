@@ -0,0 +1,346 @@
+"""
+Emergency density heatmap tiles (Web Mercator, the XYZ scheme Leaflet uses).
+
+A tile counts the emergencies (hot and archived) whose location falls inside
+it on a HEATMAP_GRID x HEATMAP_GRID grid. The coordinates come back from the
+database as two arrays and are binned with NumPy in one pass
+(`bin_points`). The grid is returned as a transparent 256x256 PNG that goes
+straight into an L.tileLayer, or as JSON with the non-empty cells.
+
+Tiles are cached in memory (LRU, HEATMAP_MEMORY_TILES entries) and on disk
+(HEATMAP_CACHE_DIR/z/x/y/<filters>.<format>), both for HEATMAP_CACHE_TTL_S.
+The disk cache is pruned when the tiles written since the last pass could
+take it past HEATMAP_CACHE_MAX_MB, and at least once per TTL: expired
+files go first, then the oldest until it fits.
+A new emergency invalidates the tile it lands in at every zoom level, for
+every filter combination (`invalidate_point`). Memory caches of other
+processes and changes made outside create_alert (updates, deletes,
+the bulk seeder) only show up when the TTL runs out.
+"""
+import asyncio
+import hashlib
+import math
+import os
+import shutil
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Dict, Optional, Set, Tuple
+
+import numpy as np
+import orjson
+from sqlalchemy import func, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import settings
+from src.models.emergency import Emergency, EmergencyType
+from src.models.location import Location
+from src.services.emergency_partitions import archive_table
+from src.services.map_clusters import in_bbox
+from src.services.metrics import record_cache
+
+TILE_SIZE = 256
+# Web Mercator stops here; points beyond it are clamped into the edge tiles
+MAX_LATITUDE = 85.05112878
+
+Tile = Tuple[int, int, int]
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(west, south, east, north) of a tile in degrees."""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def tile_of(latitude: float, longitude: float, z: int) -> Tile:
+    n = 2 ** z
+    lat = math.radians(max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude)))
+    x = int((longitude + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n)
+    return z, min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def bin_points(lat: np.ndarray, lon: np.ndarray, z: int, x: int, y: int, grid: int) -> np.ndarray:
+    """Counts of the points falling in each cell of the tile, as a (grid, grid) array, row 0 at the top."""
+    scale = 2 ** z * grid
+    lat = np.radians(np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE))
+    col = np.floor((lon + 180) / 360 * scale).astype(np.int64) - x * grid
+    row = np.floor((1 - np.arcsinh(np.tan(lat)) / np.pi) / 2 * scale).astype(np.int64) - y * grid
+    inside = (col >= 0) & (col < grid) & (row >= 0) & (row < grid)
+    cells = row[inside] * grid + col[inside]
+    return np.bincount(cells, minlength=grid * grid).reshape(grid, grid)
+
+
+# Colour ramp from the lowest to the highest count of the tile
+_RAMP_STOPS = np.array([0.0, 0.35, 0.7, 1.0])
+_RAMP_RGB = np.array([[49, 54, 149], [116, 173, 209], [254, 224, 144], [215, 48, 39]], dtype=np.float64)
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """8-bit RGBA PNG of an (h, w, 4) uint8 array."""
+    height, width, _ = rgba.shape
+    # Every scanline starts with filter type 0 (none)
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)) + chunk(b"IEND", b""))
+
+
+def render_png(counts: np.ndarray) -> bytes:
+    peak = counts.max()
+    intensity = np.log1p(counts) / np.log1p(peak) if peak else np.zeros(counts.shape)
+    rgba = np.zeros(counts.shape + (4,), dtype=np.uint8)
+    for channel in range(3):
+        rgba[..., channel] = np.interp(intensity, _RAMP_STOPS, _RAMP_RGB[:, channel])
+    rgba[..., 3] = np.where(counts > 0, 90 + 140 * intensity, 0)
+    # Each cell becomes a block of pixels
+    block = TILE_SIZE // counts.shape[0]
+    return encode_png(rgba.repeat(block, axis=0).repeat(block, axis=1))
+
+
+def render_json(counts: np.ndarray, z: int, x: int, y: int) -> bytes:
+    rows, cols = np.nonzero(counts)
+    return orjson.dumps({
+        "z": z, "x": x, "y": y,
+        "bounds": tile_bounds(z, x, y),
+        "grid": counts.shape[0],
+        "total": int(counts.sum()),
+        "max": int(counts.max()),
+        # [column, row, count], row 0 at the top (north)
+        "cells": np.stack([cols, rows, counts[rows, cols]], axis=1).tolist(),
+    })
+
+
+async def tile_points(session: AsyncSession, z: int, x: int, y: int, emergency_type: Optional[EmergencyType],
+                      since: Optional[date], until: Optional[date]) -> Tuple[np.ndarray, np.ndarray]:
+    """Latitudes and longitudes of the emergencies inside the tile."""
+    sources = []
+    for table in (Emergency.__table__, archive_table):
+        query = select(table.c.location_emergency.label("location_id"))
+        if emergency_type is not None:
+            query = query.where(table.c.emergency_type == emergency_type)
+        if since is not None:
+            query = query.where(table.c.time_created >= datetime.combine(since, dt_time(), timezone.utc))
+        if until is not None:
+            # until is inclusive: the whole day
+            query = query.where(table.c.time_created < datetime.combine(until + timedelta(days=1), dt_time(), timezone.utc))
+        sources.append(query)
+    emergencies = union_all(*sources).subquery()
+
+    query = (
+        select(func.array_agg(Location.latitude), func.array_agg(Location.longitude))
+        .join(emergencies, emergencies.c.location_id == Location.id)
+        .where(in_bbox(tile_bounds(z, x, y)))
+    )
+    lat, lon = (await session.execute(query)).one()
+    return np.asarray(lat or (), dtype=np.float64), np.asarray(lon or (), dtype=np.float64)
+
+
+class TileCache:
+    """Rendered tiles in memory (LRU) and on disk, invalidated per tile."""
+
+    def __init__(self, max_tiles: int, directory: str, ttl: float, max_bytes: int):
+        self.max_tiles = max_tiles
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # (z, x, y, variant) -> (stored at, body)
+        self._memory: "OrderedDict[Tuple, Tuple[float, bytes]]" = OrderedDict()
+        self._variants: Dict[Tile, Set[str]] = {}
+        # Size of the disk cache at the last prune plus what this process wrote
+        # since; None until the first prune
+        self._disk_bytes: Optional[int] = None
+        self._pruned_at = 0.0
+        self._pruning = False
+
+    def _path(self, tile: Tile, variant: str) -> str:
+        z, x, y = tile
+        return os.path.join(self.directory, str(z), str(x), str(y), variant)
+
+    def _read_disk(self, path: str) -> Optional[bytes]:
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, path: str, body: bytes):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            partial = f"{path}.{os.getpid()}.tmp"
+            with open(partial, "wb") as f:
+                f.write(body)
+            os.replace(partial, path)
+        except OSError:
+            pass
+
+    def _prune_disk(self) -> int:
+        """Delete expired tiles, then the oldest ones until the cache fits in max_bytes. Returns its size."""
+        now = time.time()
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if now - stat.st_mtime > self.ttl:
+                        os.remove(path)
+                    else:
+                        files.append((stat.st_mtime, stat.st_size, path))
+                except OSError:
+                    pass
+        size = sum(f[1] for f in files)
+        for _, file_size, path in sorted(files):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                size -= file_size
+            except OSError:
+                pass
+        # Directories of tiles that are gone; rmdir leaves non-empty ones alone
+        for root, _, _ in os.walk(self.directory, topdown=False):
+            if root != self.directory:
+                try:
+                    os.rmdir(root)
+                except OSError:
+                    pass
+        return size
+
+    async def _maybe_prune(self):
+        stale = time.monotonic() - self._pruned_at > self.ttl
+        if self._pruning or not (stale or self._disk_bytes is None or self._disk_bytes > self.max_bytes):
+            return
+        self._pruning = True
+        try:
+            self._disk_bytes = await asyncio.to_thread(self._prune_disk)
+            self._pruned_at = time.monotonic()
+        finally:
+            self._pruning = False
+
+    def _remember(self, tile: Tile, variant: str, body: bytes):
+        key = tile + (variant,)
+        self._memory[key] = (time.monotonic(), body)
+        self._memory.move_to_end(key)
+        self._variants.setdefault(tile, set()).add(variant)
+        while len(self._memory) > self.max_tiles:
+            (z, x, y, old), _ = self._memory.popitem(last=False)
+            self._variants.get((z, x, y), set()).discard(old)
+
+    async def get(self, tile: Tile, variant: str) -> Tuple[Optional[bytes], str]:
+        """(body, "memory" | "disk" | "miss")"""
+        key = tile + (variant,)
+        entry = self._memory.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+            self._memory.move_to_end(key)
+            record_cache("heatmap_tiles", True)
+            return entry[1], "memory"
+        if self.directory:
+            body = await asyncio.to_thread(self._read_disk, self._path(tile, variant))
+            if body is not None:
+                self._remember(tile, variant, body)
+                record_cache("heatmap_tiles", True)
+                return body, "disk"
+        record_cache("heatmap_tiles", False)
+        return None, "miss"
+
+    async def put(self, tile: Tile, variant: str, body: bytes):
+        self._remember(tile, variant, body)
+        if self.directory:
+            await asyncio.to_thread(self._write_disk, self._path(tile, variant), body)
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(body)
+            await self._maybe_prune()
+
+    def _remove_disk(self, tiles):
+        for z, x, y in tiles:
+            shutil.rmtree(os.path.join(self.directory, str(z), str(x), str(y)), ignore_errors=True)
+
+    async def invalidate_point(self, latitude: float, longitude: float):
+        """Forget the tiles containing a point, at every zoom level and with every filter."""
+        tiles = [tile_of(latitude, longitude, z) for z in range(settings.HEATMAP_MAX_ZOOM + 1)]
+        for tile in tiles:
+            for variant in self._variants.pop(tile, ()):
+                self._memory.pop(tile + (variant,), None)
+        if self.directory:
+            await asyncio.to_thread(self._remove_disk, tiles)
+
+    def clear(self):
+        self._memory.clear()
+        self._variants.clear()
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._disk_bytes = 0
+
+    def __len__(self):
+        return len(self._memory)
+
+
+def variant_key(emergency_type: Optional[EmergencyType], since: Optional[date], until: Optional[date], fmt: str) -> str:
+    """File name for a filter combination, the same in every process."""
+    filters = f"{emergency_type.name if emergency_type else ''}|{since or ''}|{until or ''}|{settings.HEATMAP_GRID}"
+    return hashlib.blake2b(filters.encode(), digest_size=8).hexdigest() + "." + fmt
+
+
+class HeatmapTiles:
+    def __init__(self):
+        self.cache = TileCache(
+            settings.HEATMAP_MEMORY_TILES,
+            settings.HEATMAP_CACHE_DIR,
+            settings.HEATMAP_CACHE_TTL_S,
+            int(settings.HEATMAP_CACHE_MAX_MB * 1024 * 1024),
+        )
+        # Requests for a tile being rendered wait for it instead of rendering it again
+        self._rendering: Dict[Tuple, asyncio.Future] = {}
+
+    async def tile(self, session: AsyncSession, z: int, x: int, y: int, emergency_type: Optional[EmergencyType] = None,
+                   since: Optional[date] = None, until: Optional[date] = None, fmt: str = "png") -> Tuple[bytes, str]:
+        """(body, cache outcome) of a tile."""
+        tile, variant = (z, x, y), variant_key(emergency_type, since, until, fmt)
+        body, outcome = await self.cache.get(tile, variant)
+        if body is not None:
+            return body, outcome
+
+        key = tile + (variant,)
+        pending = self._rendering.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending), "shared"
+
+        future = asyncio.get_running_loop().create_future()
+        self._rendering[key] = future
+        try:
+            lat, lon = await tile_points(session, z, x, y, emergency_type, since, until)
+            counts = bin_points(lat, lon, z, x, y, settings.HEATMAP_GRID)
+            body = render_png(counts) if fmt == "png" else render_json(counts, z, x, y)
+            await self.cache.put(tile, variant, body)
+            future.set_result(body)
+            return body, outcome
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; do not log "exception never retrieved"
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._rendering[key]
+
+    async def invalidate_point(self, latitude: float, longitude: float):
+        await self.cache.invalidate_point(latitude, longitude)
+
+
+heatmap_tiles = HeatmapTiles()
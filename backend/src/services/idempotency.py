@@ -0,0 +1,244 @@
+"""
+Idempotency-Key support for the creation endpoints.
+
+Call-taker clients retry POST /api/alerts and POST /api/devices on timeouts.
+A request that carries an `Idempotency-Key` header is run once. Its response
+is stored in the idempotency_key table (and a bounded in-memory LRU in
+front of it), and retries with the same key get that response back, with
+`Idempotent-Replayed: true`, without running the handler. The status, body
+and headers are replayed, except the headers that only describe the
+original connection or run (hop-by-hop ones, Content-Length, the SQL
+stats).
+
+- The key is claimed with an INSERT ... ON CONFLICT before the handler runs,
+  so two copies of a request arriving together cannot both run. The second
+  one gets 409 while the first is still in progress.
+- Reusing a key with another method, path or body is a client bug: 422.
+- Responses with a 5xx status (or an exception) are not stored, the key is
+  released and the client can retry for real.
+- A key still in progress after IDEMPOTENCY_LOCK_TIMEOUT_S (the process died
+  or the request was cancelled) can be claimed again.
+- Keys expire after IDEMPOTENCY_TTL_S and are purged every
+  PURGE_INTERVAL_S.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+import orjson
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from src.configs.config import settings
+from src.models.idempotency import IdempotencyKey
+from src.services.request_replay import replay_receive
+
+logger = logging.getLogger(__name__)
+
+HEADER = b"idempotency-key"
+ROUTES = {("POST", "/api/alerts"), ("POST", "/api/devices")}
+MAX_KEY_LENGTH = IdempotencyKey.__table__.c.key.type.length
+PURGE_INTERVAL_S = 600.0
+
+# Not stored: they describe the original connection or run, not the response
+_NOT_REPLAYED = {b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization", b"te", b"trailer",
+                 b"transfer-encoding", b"upgrade", b"content-length", b"date", b"server"}
+_NOT_REPLAYED_PREFIX = b"x-db-"
+
+# (fingerprint, status code or None while in progress, [name, value] headers, body)
+Stored = Tuple[bytes, Optional[int], List[List[str]], bytes]
+
+
+def replayable_headers(headers) -> List[List[str]]:
+    return [[name.decode("latin-1"), value.decode("latin-1")] for name, value in headers
+            if name.lower() not in _NOT_REPLAYED and not name.lower().startswith(_NOT_REPLAYED_PREFIX)]
+
+
+def fingerprint(method: str, path: str, body: bytes) -> bytes:
+    return hashlib.sha256(b"\0".join((method.encode(), path.encode(), body))).digest()
+
+
+class IdempotencyStore:
+    def __init__(self):
+        # key -> (monotonic expiry, stored response) of completed requests
+        self._cache: "OrderedDict[str, Tuple[float, Stored]]" = OrderedDict()
+        self._last_purge = time.monotonic()
+        self._purge_task: Optional[asyncio.Task] = None
+        self.stats = {"executed": 0, "replayed": 0, "cache_hits": 0, "in_progress": 0, "mismatched": 0,
+                      "released": 0, "purged": 0}
+
+    def cached(self, key: str) -> Optional[Stored]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        self.stats["cache_hits"] += 1
+        return entry[1]
+
+    def _remember(self, key: str, stored: Stored):
+        self._cache[key] = (time.monotonic() + settings.IDEMPOTENCY_TTL_S, stored)
+        self._cache.move_to_end(key)
+        if len(self._cache) > settings.IDEMPOTENCY_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    async def claim(self, session, key: str, digest: bytes) -> Optional[Stored]:
+        """Take the key for this request: None if it is ours now, else what the key holds."""
+        now = datetime.now(timezone.utc)
+        expired = now - timedelta(seconds=settings.IDEMPOTENCY_TTL_S)
+        abandoned = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT_S)
+        statement = insert(IdempotencyKey).values(key=key, fingerprint=digest, created_at=now)
+        # An expired key, or one whose request died without a response, is taken over as if it were new
+        statement = statement.on_conflict_do_update(
+            index_elements=[IdempotencyKey.key],
+            set_={"fingerprint": digest, "created_at": now, "status_code": None, "headers": None, "body": None},
+            where=or_(IdempotencyKey.created_at < expired,
+                      and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.created_at < abandoned)),
+        ).returning(IdempotencyKey.key)
+        claimed = (await session.execute(statement)).scalar_one_or_none()
+        if claimed is not None:
+            await session.commit()
+            return None
+        row = (await session.execute(
+            select(IdempotencyKey.fingerprint, IdempotencyKey.status_code, IdempotencyKey.headers,
+                   IdempotencyKey.body).where(IdempotencyKey.key == key)
+        )).one_or_none()
+        await session.commit()
+        # Deleted in between (released or purged): let the client retry
+        if row is None:
+            return (digest, None, [], b"")
+        return (row.fingerprint, row.status_code, row.headers or [], row.body or b"")
+
+    async def store(self, session, key: str, digest: bytes, status: int, headers: List[List[str]], body: bytes):
+        await session.execute(
+            update(IdempotencyKey).where(IdempotencyKey.key == key)
+            .values(status_code=status, headers=headers, body=body)
+        )
+        await session.commit()
+        self._remember(key, (digest, status, headers, body))
+
+    async def release(self, session, key: str):
+        await session.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+        await session.commit()
+        self.stats["released"] += 1
+
+    def maybe_purge(self, session_factory):
+        if time.monotonic() - self._last_purge < PURGE_INTERVAL_S:
+            return
+        if self._purge_task is not None and not self._purge_task.done():
+            return
+        self._last_purge = time.monotonic()
+        self._purge_task = asyncio.create_task(self._purge(session_factory))
+
+    async def _purge(self, session_factory):
+        expired = datetime.now(timezone.utc) - timedelta(seconds=settings.IDEMPOTENCY_TTL_S)
+        try:
+            async with session_factory() as session:
+                result = await session.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < expired))
+                await session.commit()
+            self.stats["purged"] += result.rowcount
+        except Exception as e:
+            logger.warning(f"Purging idempotency keys failed: {type(e).__name__}: {e}")
+
+    def status(self) -> dict:
+        return {**self.stats, "cached": len(self._cache), "ttl_s": settings.IDEMPOTENCY_TTL_S}
+
+
+idempotency_store = IdempotencyStore()
+
+
+async def _send_json(send, status: int, payload: dict, extra_headers=()):
+    body = orjson.dumps(payload)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                    *extra_headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _replay(send, status: int, headers: List[List[str]], body: bytes):
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+    headers += [(b"content-length", str(len(body)).encode()), (b"idempotent-replayed", b"true")]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware that runs a keyed creation request once and replays its response."""
+
+    def __init__(self, app, session_factory):
+        self.app = app
+        self.session_factory = session_factory
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in ROUTES:
+            await self.app(scope, receive, send)
+            return
+        key = next((v.decode("latin-1") for k, v in scope["headers"] if k == HEADER), None)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"})
+            return
+
+        messages = []
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request" or not message.get("more_body"):
+                break
+        digest = fingerprint(scope["method"], scope["path"], b"".join(m.get("body", b"") for m in messages))
+
+        stored = idempotency_store.cached(key)
+        if stored is None:
+            async with self.session_factory() as session:
+                stored = await idempotency_store.claim(session, key, digest)
+        if stored is not None:
+            if stored[0] != digest:
+                idempotency_store.stats["mismatched"] += 1
+                await _send_json(send, 422, {"detail": "Idempotency-Key was already used for a different request"})
+            elif stored[1] is None:
+                idempotency_store.stats["in_progress"] += 1
+                await _send_json(send, 409, {"detail": "A request with this Idempotency-Key is in progress"},
+                                 [(b"retry-after", b"1")])
+            else:
+                idempotency_store.stats["replayed"] += 1
+                await _replay(send, *stored[1:])
+            return
+
+        await self._run(scope, replay_receive(messages, receive), send, key, digest)
+
+    async def _run(self, scope, receive, send, key: str, digest: bytes):
+        response = {"status": None, "headers": [], "body": []}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = replayable_headers(message.get("headers", ()))
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        idempotency_store.stats["executed"] += 1
+        try:
+            await self.app(scope, receive, capture)
+        except Exception:
+            async with self.session_factory() as session:
+                await idempotency_store.release(session, key)
+            raise
+        async with self.session_factory() as session:
+            if response["status"] is None or response["status"] >= 500:
+                await idempotency_store.release(session, key)
+            else:
+                await idempotency_store.store(session, key, digest, response["status"], response["headers"],
+                                              b"".join(response["body"]))
+        idempotency_store.maybe_purge(self.session_factory)
@@ -0,0 +1,232 @@
+"""
+Write-behind buffer for the GPS positions resources report.
+
+POST /api/devices/{id}/location goes through `LocationBuffer.report`:
+- a sample closer than GPS_DEADBAND_M to the last accepted one, with a
+  heading within GPS_DEADBAND_HEADING_DEG, is dropped: a vehicle parked at
+  its station only reports GPS noise. One is still accepted every
+  GPS_DEADBAND_MAX_AGE_S so time_updated shows the resource is alive.
+- an accepted sample replaces the resource's pending one, if any; only the
+  latest position per resource is ever written.
+- every GPS_FLUSH_INTERVAL_MS the pending samples are written in one
+  executemany UPDATE of `location` by primary key (sooner if
+  GPS_BUFFER_MAX_PENDING resources are waiting).
+
+GET /api/devices/{id}/location reads the buffer before the database, but
+only for positions that are not written yet (pending or being flushed);
+once written, the database is the source of truth, as another process may
+have moved the resource since. Each process has its own buffer: another
+process reads the database, up to one flush interval behind. Resources
+that have not reported for GPS_DEADBAND_MAX_AGE_S are evicted after a
+flush, so the buffer only holds the resources currently reporting.
+Anything that writes a resource's location directly (PATCH /api/devices)
+must call `forget` so the buffer does not overwrite it.
+"""
+import asyncio
+import contextlib
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import settings
+from src.models.location import Location
+from src.models.resource import Resource
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371000.0
+
+
+@dataclass
+class Sample:
+    latitude: float
+    longitude: float
+    accuracy: Optional[float] = None
+    speed: Optional[float] = None
+    heading: Optional[float] = None
+
+
+def distance_m(a: Sample, b: Sample) -> float:
+    """Equirectangular approximation, accurate to well under a metre at these distances."""
+    lat = math.radians((a.latitude + b.latitude) / 2)
+    dx = math.radians(b.longitude - a.longitude) * math.cos(lat)
+    dy = math.radians(b.latitude - a.latitude)
+    return EARTH_RADIUS_M * math.hypot(dx, dy)
+
+
+def heading_change(a: Optional[float], b: Optional[float]) -> float:
+    if a is None or b is None:
+        return 0.0
+    diff = abs(a - b) % 360
+    return min(diff, 360 - diff)
+
+
+class LocationBuffer:
+    def __init__(self):
+        # resource id -> its Location row as last accepted, served to readers
+        self._rows: Dict[object, dict] = {}
+        # resource id -> monotonic time of the last accepted sample
+        self._accepted_at: Dict[object, float] = {}
+        # location id -> values to write
+        self._pending: Dict[object, dict] = {}
+        # location id -> values of the flush under way
+        self._flushing: Dict[object, dict] = {}
+        self._evicted_at = time.monotonic()
+        self._flush_now = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._session_factory = None
+        self.stats = {"reported": 0, "dropped": 0, "flushes": 0, "rows_written": 0, "last_flush_ms": None}
+
+    async def _load(self, session: AsyncSession, resource_id) -> Optional[dict]:
+        location = (await session.execute(
+            select(Location).join(Resource, Resource.actual_location == Location.id).where(Resource.id == resource_id)
+        )).scalar_one_or_none()
+        if location is None:
+            return None
+        return location.model_dump()
+
+    def _within_deadband(self, row: dict, sample: Sample, accepted_at: float) -> bool:
+        if time.monotonic() - accepted_at >= settings.GPS_DEADBAND_MAX_AGE_S:
+            return False
+        previous = Sample(row["latitude"], row["longitude"], heading=row["heading"])
+        return (distance_m(previous, sample) < settings.GPS_DEADBAND_M
+                and heading_change(previous.heading, sample.heading) < settings.GPS_DEADBAND_HEADING_DEG)
+
+    async def report(self, session: AsyncSession, resource_id, sample: Sample) -> Optional[bool]:
+        """Take a position report: True if it will be written, False if dropped, None if the resource has no location."""
+        self.stats["reported"] += 1
+        row = self._rows.get(resource_id)
+        if row is None:
+            row = await self._load(session, resource_id)
+            if row is None:
+                return None
+            # Another report may have loaded it while this one waited
+            row = self._rows.setdefault(resource_id, row)
+
+        accepted_at = self._accepted_at.get(resource_id)
+        if accepted_at is not None and self._within_deadband(row, sample, accepted_at):
+            self.stats["dropped"] += 1
+            return False
+
+        values = {
+            "latitude": sample.latitude, "longitude": sample.longitude, "accuracy": sample.accuracy,
+            "speed": sample.speed, "heading": sample.heading, "time_updated": datetime.now(timezone.utc),
+        }
+        row.update(values)
+        self._accepted_at[resource_id] = time.monotonic()
+        self._pending[row["id"]] = {"id": row["id"], **values}
+
+        if not settings.GPS_BUFFER_ENABLED:
+            await self.flush()
+        elif len(self._pending) >= settings.GPS_BUFFER_MAX_PENDING:
+            self._flush_now.set()
+        return True
+
+    def get(self, resource_id) -> Optional[dict]:
+        """The resource's Location row while a position of it is not written yet, else None: read the database."""
+        row = self._rows.get(resource_id)
+        if row is None or (row["id"] not in self._pending and row["id"] not in self._flushing):
+            return None
+        return row
+
+    def forget(self, resource_id):
+        """Drop what the buffer holds for a resource whose location was written or deleted elsewhere."""
+        row = self._rows.pop(resource_id, None)
+        self._accepted_at.pop(resource_id, None)
+        if row is not None:
+            self._pending.pop(row["id"], None)
+
+    async def flush(self) -> int:
+        """Write every pending position in one statement."""
+        async with self._flush_lock:
+            if not self._pending:
+                self._evict_idle()
+                return 0
+            batch, self._pending = self._pending, {}
+            self._flushing = batch
+            started = time.perf_counter()
+            try:
+                async with self._session_factory() as session:
+                    # ORM bulk UPDATE by primary key: one executemany
+                    await session.execute(update(Location), list(batch.values()))
+                    await session.commit()
+            except Exception:
+                # Keep them for the next flush, unless a newer sample arrived meanwhile
+                for location_id, values in batch.items():
+                    self._pending.setdefault(location_id, values)
+                raise
+            finally:
+                self._flushing = {}
+            self.stats["flushes"] += 1
+            self.stats["rows_written"] += len(batch)
+            self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            self._evict_idle()
+            return len(batch)
+
+    def _evict_idle(self):
+        """Forget resources with nothing pending that have not reported for GPS_DEADBAND_MAX_AGE_S.
+
+        Past that age the next sample is accepted anyway, so the cached row
+        is no longer needed; it is reloaded from the database then. Runs at
+        most once per that age.
+        """
+        now = time.monotonic()
+        max_age = settings.GPS_DEADBAND_MAX_AGE_S
+        if now - self._evicted_at < max_age:
+            return
+        self._evicted_at = now
+        for resource_id, accepted_at in list(self._accepted_at.items()):
+            if now - accepted_at < max_age:
+                continue
+            row = self._rows.get(resource_id)
+            if row is None or row["id"] not in self._pending:
+                self._rows.pop(resource_id, None)
+                del self._accepted_at[resource_id]
+
+    async def _run(self):
+        interval = settings.GPS_FLUSH_INTERVAL_MS / 1000
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._flush_now.wait(), interval)
+            self._flush_now.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"GPS buffer flush failed, will retry: {type(e).__name__}: {e}")
+
+    def start(self, session_factory):
+        self._session_factory = session_factory
+        if settings.GPS_BUFFER_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        # Whatever is still pending is written before the pool closes
+        if self._session_factory is not None:
+            await self.flush()
+
+    def status(self) -> dict:
+        return {
+            **self.stats,
+            "pending": len(self._pending),
+            "tracked_resources": len(self._rows),
+            "enabled": settings.GPS_BUFFER_ENABLED,
+            "flush_interval_ms": settings.GPS_FLUSH_INTERVAL_MS,
+        }
+
+    def __len__(self):
+        return len(self._pending)
+
+
+location_buffer = LocationBuffer()
@@ -0,0 +1,169 @@
+"""
+Viewport queries with server-side grid clustering for the map.
+
+The points of a layer (emergencies or resources, through their Location) are
+first cut to the viewport with the GiST index on point(longitude, latitude)
+(ix_location_point). Below MAP_CLUSTER_MAX_ZOOM they are then grouped in
+Postgres on a grid of MAP_CLUSTER_CELL_PX screen pixels at the requested
+zoom (Web Mercator, like the map tiles). Each group becomes one GeoJSON
+point at its centroid with a `count`. Groups of a single point are returned
+as that point, with the fields a marker needs.
+
+The number of features is bounded by the viewport size in cells, not by
+how many emergencies or resources there are, so the payload and the
+browser's rendering work stay flat as the data grows.
+"""
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import settings
+from src.models.emergency import Emergency, PriorityType, StatusType
+from src.models.location import Location
+from src.models.resource import Resource
+
+BBox = Tuple[float, float, float, float]
+
+# Web Mercator stops here
+MAX_LATITUDE = 85.05112878
+
+
+def in_bbox(bbox: BBox):
+    """Location inside (west, south, east, north); the expression ix_location_point indexes."""
+    west, south, east, north = bbox
+    return func.point(Location.longitude, Location.latitude).op("<@")(
+        func.box(func.point(west, south), func.point(east, north))
+    )
+
+
+def _grid_cell(zoom: int):
+    """(column, row) of a location on the clustering grid at `zoom`."""
+    cells = 2 ** zoom * 256 / settings.MAP_CLUSTER_CELL_PX
+    latitude = func.radians(func.greatest(-MAX_LATITUDE, func.least(MAX_LATITUDE, Location.latitude)))
+    column = func.floor((Location.longitude + 180) / 360 * cells)
+    row = func.floor((1 - func.asinh(func.tan(latitude)) / math.pi) / 2 * cells)
+    return column.label("column"), row.label("row")
+
+
+class Layer:
+    """A kind of map feature: where its points are and what a single one shows."""
+
+    name: str
+
+    def points(self, query):
+        raise NotImplementedError
+
+    def details(self) -> Sequence:
+        raise NotImplementedError
+
+    def properties(self, row) -> dict:
+        raise NotImplementedError
+
+    def cluster_breakdown(self) -> Dict[str, object]:
+        """Extra per-cluster aggregates, by property name."""
+        return {}
+
+
+class EmergencyLayer(Layer):
+    name = "emergency"
+
+    def __init__(self, status: Optional[StatusType]):
+        self.status = status
+
+    def points(self, query):
+        query = query.join(Emergency, Emergency.location_emergency == Location.id)
+        if self.status is not None:
+            query = query.where(Emergency.status == self.status)
+        return query
+
+    def details(self):
+        return (Emergency.id, Emergency.name, Emergency.priority, Emergency.emergency_type,
+                Emergency.status, Emergency.time_created)
+
+    def properties(self, row) -> dict:
+        return {
+            "id": row.id,
+            "name": row.name,
+            "priority": row.priority.value if row.priority else None,
+            "emergency_type": row.emergency_type.value if row.emergency_type else None,
+            "status": row.status.value if row.status else None,
+            "time_created": row.time_created,
+        }
+
+    def cluster_breakdown(self):
+        # How many of each priority, so a cluster can take the colour of its worst one
+        return {
+            f"priority_{p.value}": func.count().filter(Emergency.priority == p)
+            for p in PriorityType
+        }
+
+
+class ResourceLayer(Layer):
+    name = "resource"
+
+    def points(self, query):
+        return query.join(Resource, Resource.actual_location == Location.id)
+
+    def details(self):
+        return Resource.id, Resource.resource_type, Resource.status, Resource.responsible
+
+    def properties(self, row) -> dict:
+        return {
+            "id": row.id,
+            "resource_type": row.resource_type,
+            "status": row.status.value if row.status else None,
+            "responsible": row.responsible,
+        }
+
+
+def _feature(longitude: float, latitude: float, properties: dict) -> dict:
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+        "properties": properties,
+    }
+
+
+async def layer_features(session: AsyncSession, layer: Layer, bbox: BBox, zoom: int) -> List[dict]:
+    id_column = layer.details()[0]
+
+    if zoom > settings.MAP_CLUSTER_MAX_ZOOM:
+        query = layer.points(select(*layer.details(), Location.latitude, Location.longitude)
+                             .select_from(Location).where(in_bbox(bbox)))
+        rows = (await session.execute(query.limit(settings.MAP_MAX_FEATURES))).all()
+        return [_feature(r.longitude, r.latitude, {"layer": layer.name, "cluster": False, **layer.properties(r)})
+                for r in rows]
+
+    column, row = _grid_cell(zoom)
+    breakdown = layer.cluster_breakdown()
+    query = layer.points(
+        select(
+            column, row,
+            func.count().label("count"),
+            func.avg(Location.latitude).label("latitude"),
+            func.avg(Location.longitude).label("longitude"),
+            # The id is only used for groups of one
+            func.array_agg(id_column)[1].label("sample_id"),
+            *(value.label(name) for name, value in breakdown.items()),
+        ).select_from(Location).where(in_bbox(bbox))
+    ).group_by(column, row)
+    groups = (await session.execute(query)).all()
+
+    # One more query for the fields of the points that are alone in their cell
+    single_ids = [g.sample_id for g in groups if g.count == 1]
+    singles = {}
+    if single_ids:
+        query = layer.points(select(*layer.details()).select_from(Location)).where(id_column.in_(single_ids))
+        singles = {r.id: r for r in (await session.execute(query)).all()}
+
+    features = []
+    for g in groups:
+        if g.count == 1 and g.sample_id in singles:
+            properties = {"layer": layer.name, "cluster": False, **layer.properties(singles[g.sample_id])}
+        else:
+            properties = {"layer": layer.name, "cluster": True, "count": g.count,
+                          **{name: getattr(g, name) for name in breakdown}}
+        features.append(_feature(g.longitude, g.latitude, properties))
+    return features
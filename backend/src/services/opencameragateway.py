@@ -1,7 +1,10 @@
 # Nokia API client configuration
-import httpx
+import os
 
-NOKIA_API_BASE_URL = "http://mock-nokia-api:6000/api/v1"
+from src.services import tracing
+from src.services.metrics import track_upstream
+
+NOKIA_API_BASE_URL = os.getenv("NOKIA_API_BASE_URL", "http://mock-nokia-api:6000/api/v1")
 
 
 class EmergencyServiceError(Exception):
@@ -11,18 +14,28 @@ class EmergencyServiceError(Exception):
 
 
 async def nokia_api_call(method: str, endpoint: str, json=None):
+    import httpx  # Imported on first call, keeps it off the startup path
+
+    # Only the first path segment, ids would blow up the label cardinality
+    operation = f"{method} {endpoint.split('/')[0]}"
+
     async with httpx.AsyncClient() as client:
         try:
             # Debug log
             print(
                 f"Calling Nokia API: {method} {NOKIA_API_BASE_URL}/{endpoint}")
-            response = await client.request(
-                method,
-                f"{NOKIA_API_BASE_URL}/{endpoint}",
-                json=json,
-                timeout=10.0
-            )
-            response.raise_for_status()
+            with tracing.span(f"nokia {operation}", "client") as span, track_upstream("nokia", operation):
+                response = await client.request(
+                    method,
+                    f"{NOKIA_API_BASE_URL}/{endpoint}",
+                    json=json,
+                    headers=tracing.inject(),
+                    timeout=10.0
+                )
+                if span is not None:
+                    span.set("http.url", f"{NOKIA_API_BASE_URL}/{endpoint}")
+                    span.set("http.status_code", response.status_code)
+                response.raise_for_status()
             # Si es una respuesta 204, no intentamos parsear JSON
             if response.status_code == 204:
                 return None
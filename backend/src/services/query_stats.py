@@ -0,0 +1,277 @@
+"""
+Per-request SQL instrumentation.
+
+SQLAlchemy cursor events record every statement a request runs: how many,
+how long they took in total and which one was the slowest. A statement that
+runs several times in one request with different parameters is reported as a
+likely N+1 (a query inside a loop). Statements slower than SQL_SLOW_QUERY_MS
+get their plan captured in the background: `EXPLAIN (ANALYZE, BUFFERS)` for
+reads, plain `EXPLAIN` for writes. ANALYZE really runs the statement, and
+a rollback does not undo the locks, sequence values or trigger side effects
+of a write.
+
+Finished requests go into a ring buffer (`recent_requests`), slow query plans
+into another (`slow_queries`); both are served under /api/system. With
+SQL_STATS_HEADERS on, the numbers are also returned as X-DB-* headers.
+"""
+import asyncio
+import contextvars
+import logging
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.configs.config import settings
+from src.services import tracing
+
+logger = logging.getLogger(__name__)
+
+MAX_STATEMENT_CHARS = 1000
+# The same statement is not EXPLAINed again within this many seconds
+EXPLAIN_COOLDOWN_S = 60.0
+# Statements EXPLAIN ANALYZE can run without side effects: reads only
+_ANALYZABLE = ("select", "with")
+_WRITES = re.compile(r"\b(insert|update|delete|merge)\b|\bfor\s+(no\s+key\s+update|update|share|key\s+share)\b",
+                     re.IGNORECASE)
+EXPLAINABLE = _ANALYZABLE + ("insert", "update", "delete")
+# Statements remembered for the cooldown, at most
+_EXPLAINED_MAX = 1000
+
+
+def _shorten(statement: str) -> str:
+    statement = " ".join(statement.split())
+    if len(statement) > MAX_STATEMENT_CHARS:
+        return statement[:MAX_STATEMENT_CHARS] + "..."
+    return statement
+
+
+@dataclass
+class RequestQueryStats:
+    method: str
+    path: str
+    started: float = field(default_factory=time.time)
+    count: int = 0
+    total_s: float = 0.0
+    slowest_s: float = 0.0
+    slowest_statement: Optional[str] = None
+    # statement -> number of executions / distinct parameter sets
+    executions: Dict[str, int] = field(default_factory=dict)
+    parameters: Dict[str, Set[int]] = field(default_factory=dict)
+
+    def record(self, statement: str, parameters: Any, seconds: float):
+        self.count += 1
+        self.total_s += seconds
+        if seconds > self.slowest_s:
+            self.slowest_s = seconds
+            self.slowest_statement = statement
+        self.executions[statement] = self.executions.get(statement, 0) + 1
+        try:
+            key = hash(repr(parameters))
+        except Exception:
+            key = id(parameters)
+        self.parameters.setdefault(statement, set()).add(key)
+
+    def n_plus_one(self) -> List[dict]:
+        threshold = settings.SQL_N_PLUS_ONE_THRESHOLD
+        return [
+            {"statement": _shorten(statement), "executions": self.executions[statement],
+             "distinct_parameters": len(params)}
+            for statement, params in self.parameters.items()
+            if len(params) >= threshold
+        ]
+
+    def summary(self, status: Optional[int] = None) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "started": self.started,
+            "queries": self.count,
+            "db_ms": round(self.total_s * 1000, 3),
+            "slowest_ms": round(self.slowest_s * 1000, 3),
+            "slowest_statement": _shorten(self.slowest_statement) if self.slowest_statement else None,
+            "n_plus_one": self.n_plus_one(),
+        }
+
+
+_current: contextvars.ContextVar[Optional[RequestQueryStats]] = contextvars.ContextVar("query_stats", default=None)
+
+recent_requests: deque = deque(maxlen=settings.SQL_STATS_BUFFER)
+slow_queries: deque = deque(maxlen=settings.SQL_STATS_BUFFER)
+
+# statement -> when it was last EXPLAINed, oldest first
+_explained_at: "OrderedDict[str, float]" = OrderedDict()
+_explain_lock = threading.Lock()
+_explain_tasks: Set[asyncio.Task] = set()
+_instrumented: "weakref.WeakSet" = weakref.WeakSet()
+_traced: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def analyzable(statement: str) -> bool:
+    """Whether EXPLAIN ANALYZE may run the statement: a read that neither writes nor locks rows."""
+    return statement.lstrip()[:6].lower().startswith(_ANALYZABLE) and _WRITES.search(statement) is None
+
+
+async def explain(engine: AsyncEngine, statement: str, parameters: Any, seconds: float, path: Optional[str]):
+    """EXPLAIN a slow statement on its own connection, inside a transaction that is rolled back.
+
+    Reads are run with ANALYZE and BUFFERS, writes are only planned.
+    """
+    analyze = analyzable(statement)
+    if parameters is None:
+        parameters = ()
+    elif not isinstance(parameters, (tuple, list)):
+        parameters = (parameters,)
+    try:
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            transaction = driver.transaction()
+            await transaction.start()
+            try:
+                prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+                rows = await driver.fetch(prefix + statement, *parameters)
+            finally:
+                await transaction.rollback()
+        plan = "\n".join(row[0] for row in rows)
+    except Exception as e:
+        plan = None
+        logger.warning(f"EXPLAIN of slow query failed: {e}")
+
+    slow_queries.append({
+        "captured": time.time(),
+        "path": path,
+        "duration_ms": round(seconds * 1000, 3),
+        "statement": _shorten(statement),
+        "analyzed": analyze,
+        "plan": plan,
+    })
+
+
+def _schedule_explain(engine: AsyncEngine, statement: str, parameters: Any, seconds: float):
+    if not statement.lstrip()[:6].lower().startswith(EXPLAINABLE):
+        return
+    now = time.monotonic()
+    with _explain_lock:
+        if now - _explained_at.get(statement, -EXPLAIN_COOLDOWN_S) < EXPLAIN_COOLDOWN_S:
+            return
+        _explained_at[statement] = now
+        _explained_at.move_to_end(statement)
+        # Entries past the cooldown no longer block anything
+        while _explained_at and (len(_explained_at) > _EXPLAINED_MAX
+                                 or now - next(iter(_explained_at.values())) >= EXPLAIN_COOLDOWN_S):
+            _explained_at.popitem(last=False)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    stats = _current.get()
+    task = loop.create_task(explain(engine, statement, parameters, seconds, stats.path if stats else None))
+    _explain_tasks.add(task)
+    task.add_done_callback(_explain_tasks.discard)
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Attach the cursor event hooks to `engine`. Safe to call more than once."""
+    sync_engine = engine.sync_engine
+    if sync_engine in _instrumented:
+        return
+    _instrumented.add(sync_engine)
+    slow_s = settings.SQL_SLOW_QUERY_MS / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_started"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.record(statement, parameters, seconds)
+        if settings.SQL_EXPLAIN_SLOW and seconds >= slow_s and not executemany:
+            _schedule_explain(engine, statement, parameters, seconds)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+def trace_engine(engine: AsyncEngine):
+    """Open a client span around every statement run inside a traced request."""
+    sync_engine = engine.sync_engine
+    if sync_engine in _traced:
+        return
+    _traced.add(sync_engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_query_span(conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+        span = tracing.start_span(f"db {verb}", "client", {"db.statement": _shorten(statement)}, root=False)
+        conn.info.setdefault("query_spans", []).append(span)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def finish_query_span(conn, cursor, statement, parameters, context, executemany):
+        span = conn.info["query_spans"].pop()
+        if span is not None:
+            span.finish()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def fail_query_span(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_spans"):
+            span = conn.info["query_spans"].pop()
+            if span is not None:
+                span.finish(exception_context.original_exception)
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware that scopes the stats to each HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats(method=scope["method"], path=scope["path"])
+        token = _current.set(stats)
+        status: List[Optional[int]] = [None]
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if settings.SQL_STATS_HEADERS:
+                    headers = list(message.get("headers", []))
+                    headers += [
+                        (b"x-db-query-count", str(stats.count).encode()),
+                        (b"x-db-time-ms", f"{stats.total_s * 1000:.3f}".encode()),
+                        (b"x-db-slowest-ms", f"{stats.slowest_s * 1000:.3f}".encode()),
+                        (b"x-db-n-plus-one", str(len(stats.n_plus_one())).encode()),
+                    ]
+                    message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            if stats.count:
+                summary = stats.summary(status[0])
+                recent_requests.append(summary)
+                if summary["n_plus_one"]:
+                    logger.warning(
+                        f"Possible N+1 in {stats.method} {stats.path}: "
+                        + "; ".join(f"{n['executions']}x {n['statement'][:120]}" for n in summary["n_plus_one"])
+                    )
@@ -0,0 +1,22 @@
+"""
+Re-reading a request body that a middleware already consumed.
+
+ASGI hands the body over once, through `receive`. A middleware that has to
+look at it before the app runs (to fingerprint it, or to peek at its
+fields) keeps the messages it read and passes the app `replay_receive`
+instead, which returns those messages first and then defers to the real
+`receive` (for the rest of a body it stopped reading, or the disconnect).
+"""
+from collections import deque
+
+
+def replay_receive(messages, receive):
+    """A `receive` callable that yields `messages` before reading from `receive`."""
+    pending = deque(messages)
+
+    async def replay():
+        if pending:
+            return pending.popleft()
+        return await receive()
+
+    return replay
@@ -0,0 +1,283 @@
+"""
+Offline reverse geocoding of Address rows.
+
+create_alert and create_device store addresses with only latitude and
+longitude. This fills in street, number, neighbourhood, city, postal code...
+from a local gazetteer, in the background, after the request has returned:
+the routes only `enqueue` the new address ids.
+
+The gazetteer (GEOCODER_GAZETTEER_PATH) is a CSV with a header row: one row
+per address point or street segment sample. Columns are matched by name,
+case-insensitively, either the Address field names (latitude, longitude,
+street_number, street_name, neighborhood, city, state, postal_code,
+country, country_code, address_line_1) or the OpenAddresses ones (LAT, LON,
+NUMBER, STREET, DISTRICT, CITY, REGION, POSTCODE). Without a file the
+geocoder stays off and addresses stay as they are.
+
+Lookups go to a KD-tree over the points on the unit sphere, so nearest
+means nearest on the ground. Results are memoised per cell of
+GEOCODER_CELL_DEG degrees (the cell centre is what gets looked up), so
+the many incidents reported around the same spot cost one tree query. A point
+farther than GEOCODER_MAX_DISTANCE_M from any gazetteer entry is left
+empty.
+"""
+import asyncio
+import contextlib
+import csv
+import logging
+import math
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, update
+
+from src.configs.config import settings
+from src.models.address import Address
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371000.0
+
+FIELDS = ("street_number", "street_name", "neighborhood", "city", "state", "postal_code",
+          "country", "country_code", "address_line_1")
+# Gazetteer values longer than the column are cut
+COLUMN_LENGTHS = {field: Address.__table__.c[field].type.length for field in FIELDS}
+# OpenAddresses column -> Address field
+ALIASES = {
+    "lat": "latitude", "lon": "longitude", "number": "street_number", "street": "street_name",
+    "district": "neighborhood", "region": "state", "postcode": "postal_code",
+}
+
+
+def to_unit_vectors(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_metres(chord: float) -> float:
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, chord / 2))
+
+
+class KDTree:
+    """Static k-d tree with small leaves scanned by NumPy."""
+
+    LEAF_SIZE = 16
+
+    def __init__(self, points: np.ndarray):
+        self.points = np.ascontiguousarray(points, dtype=np.float64)
+        self.index = np.arange(len(points))
+        # Per node: split dimension (-1 for a leaf), split value, children, and the leaf's slice of self.index
+        self.dim: List[int] = []
+        self.split: List[float] = []
+        self.children: List[Tuple[int, int]] = []
+        self.bounds: List[Tuple[int, int]] = []
+        if len(points):
+            self._build(0, len(points))
+
+    def _node(self, dim, split, start, end) -> int:
+        self.dim.append(dim)
+        self.split.append(split)
+        self.children.append((-1, -1))
+        self.bounds.append((start, end))
+        return len(self.dim) - 1
+
+    def _build(self, start: int, end: int) -> int:
+        if end - start <= self.LEAF_SIZE:
+            return self._node(-1, 0.0, start, end)
+        idx = self.index[start:end]
+        # Split on the widest dimension at the median
+        spread = self.points[idx].max(axis=0) - self.points[idx].min(axis=0)
+        dim = int(spread.argmax())
+        mid = (end - start) // 2
+        order = np.argpartition(self.points[idx, dim], mid)
+        self.index[start:end] = idx[order]
+        split = float(self.points[self.index[start + mid], dim])
+        node = self._node(dim, split, start, end)
+        left = self._build(start, start + mid)
+        right = self._build(start + mid, end)
+        self.children[node] = (left, right)
+        return node
+
+    def query(self, point: np.ndarray) -> Tuple[float, int]:
+        """(distance, index) of the nearest point."""
+        best_distance, best_index = math.inf, -1
+        stack = [(0, 0.0)] if self.dim else []
+        while stack:
+            node, plane_distance = stack.pop()
+            if plane_distance >= best_distance:
+                continue
+            dim = self.dim[node]
+            if dim < 0:
+                start, end = self.bounds[node]
+                idx = self.index[start:end]
+                distances = np.sqrt(((self.points[idx] - point) ** 2).sum(axis=1))
+                nearest = int(distances.argmin())
+                if distances[nearest] < best_distance:
+                    best_distance, best_index = float(distances[nearest]), int(idx[nearest])
+                continue
+            offset = point[dim] - self.split[node]
+            near, far = self.children[node] if offset < 0 else self.children[node][::-1]
+            # The far side is visited only if the splitting plane is closer than the best so far
+            stack.append((far, abs(offset)))
+            stack.append((near, plane_distance))
+        return best_distance, best_index
+
+    def __len__(self):
+        return len(self.points)
+
+
+class Gazetteer:
+    def __init__(self, points: np.ndarray, records: List[Dict[str, str]]):
+        self.tree = KDTree(points)
+        self.records = records
+
+    @classmethod
+    def load(cls, path: str) -> "Gazetteer":
+        latitudes, longitudes, records = [], [], []
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            columns = {}
+            for name in reader.fieldnames or ():
+                key = name.strip().lower()
+                key = ALIASES.get(key, key)
+                if key in FIELDS or key in ("latitude", "longitude"):
+                    columns[name] = key
+            for row in reader:
+                values = {columns[k]: v.strip() for k, v in row.items() if k in columns and v and v.strip()}
+                try:
+                    latitude, longitude = float(values.pop("latitude")), float(values.pop("longitude"))
+                except (KeyError, ValueError):
+                    continue
+                latitudes.append(latitude)
+                longitudes.append(longitude)
+                records.append(values)
+        points = to_unit_vectors(np.array(latitudes), np.array(longitudes)) if records else np.empty((0, 3))
+        return cls(points, records)
+
+    def nearest(self, latitude: float, longitude: float) -> Tuple[float, Optional[Dict[str, str]]]:
+        """(metres, record) of the closest entry."""
+        chord, index = self.tree.query(to_unit_vectors(np.array([latitude]), np.array([longitude]))[0])
+        if index < 0:
+            return math.inf, None
+        return chord_to_metres(chord), self.records[index]
+
+    def __len__(self):
+        return len(self.records)
+
+
+class ReverseGeocoder:
+    def __init__(self):
+        self.gazetteer: Optional[Gazetteer] = None
+        # (cell row, cell column) -> address fields, or None if nothing is close enough
+        self._memo: "OrderedDict[Tuple[int, int], Optional[Dict[str, str]]]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._session_factory = None
+        self.stats = {"enqueued": 0, "dropped": 0, "geocoded": 0, "not_found": 0, "memo_hits": 0, "failed": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.gazetteer is not None
+
+    async def load(self, path: str) -> int:
+        """Read the gazetteer and build the tree in a worker thread; 0 if there is no file."""
+        if not path or not os.path.exists(path):
+            return 0
+        self.gazetteer = await asyncio.to_thread(Gazetteer.load, path)
+        self._memo.clear()
+        return len(self.gazetteer)
+
+    def lookup(self, latitude: float, longitude: float) -> Optional[Dict[str, str]]:
+        """Address fields for a point, memoised per coordinate cell."""
+        cell = settings.GEOCODER_CELL_DEG
+        key = (math.floor(latitude / cell), math.floor(longitude / cell))
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            self.stats["memo_hits"] += 1
+            return self._memo[key]
+        distance, record = self.gazetteer.nearest((key[0] + 0.5) * cell, (key[1] + 0.5) * cell)
+        result = record if distance <= settings.GEOCODER_MAX_DISTANCE_M else None
+        self._memo[key] = result
+        if len(self._memo) > settings.GEOCODER_MEMO_SIZE:
+            self._memo.popitem(last=False)
+        return result
+
+    def enqueue(self, address_id, latitude: Optional[float], longitude: Optional[float]):
+        """Schedule an address to be filled in; never waits, drops it if the queue is full."""
+        if self._queue is None or latitude is None or longitude is None:
+            return
+        try:
+            self._queue.put_nowait((address_id, latitude, longitude))
+            self.stats["enqueued"] += 1
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+
+    def _geocode_batch(self, batch) -> List[dict]:
+        updates = []
+        for address_id, latitude, longitude in batch:
+            fields = self.lookup(latitude, longitude)
+            if fields is None:
+                self.stats["not_found"] += 1
+                continue
+            updates.append({"id": address_id, **{k: v[:COLUMN_LENGTHS[k]] for k, v in fields.items()}})
+        return updates
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < settings.GEOCODER_BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                # Tree lookups are CPU work: off the event loop
+                updates = await asyncio.to_thread(self._geocode_batch, batch)
+                if updates:
+                    async with self._session_factory() as session:
+                        await session.execute(update(Address), updates)
+                        await session.commit()
+                    self.stats["geocoded"] += len(updates)
+            except Exception as e:
+                self.stats["failed"] += len(batch)
+                logger.warning(f"Reverse geocoding of {len(batch)} addresses failed: {type(e).__name__}: {e}")
+
+    def start(self, session_factory):
+        self._session_factory = session_factory
+        if self.enabled and self._task is None:
+            self._queue = asyncio.Queue(maxsize=settings.GEOCODER_QUEUE_MAX)
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+            self._queue = None
+
+    async def backfill(self, session, limit: int) -> int:
+        """Enqueue addresses that have coordinates but were never filled in."""
+        if self._queue is None:
+            return 0
+        result = await session.execute(
+            select(Address.id, Address.latitude, Address.longitude)
+            .where(Address.latitude.is_not(None), Address.longitude.is_not(None),
+                   Address.street_name.is_(None), Address.city.is_(None))
+            .limit(min(limit, self._queue.maxsize - self._queue.qsize()))
+        )
+        rows = result.all()
+        for address_id, latitude, longitude in rows:
+            self.enqueue(address_id, latitude, longitude)
+        return len(rows)
+
+    def status(self) -> dict:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "gazetteer_entries": len(self.gazetteer) if self.gazetteer else 0,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "memo_cells": len(self._memo),
+        }
+
+
+reverse_geocoder = ReverseGeocoder()
@@ -0,0 +1,318 @@
+"""
+Lightweight distributed tracing shared by the backend and the NAC service.
+
+This file is kept identical in backend/src/services/tracing.py and
+SERP-nokia-nac/app/core/tracing.py, like metrics.py. Each service calls
+`configure()` once with its name.
+
+Trace context travels between services in the W3C `traceparent` header
+(`inject()` on outgoing requests, `TracingMiddleware` on incoming ones) and
+inside a service in a ContextVar, so `span()` blocks nest on their own.
+
+Tracing is off unless TRACE_ENABLED is set. Sampling:
+- a trace started here is sampled with probability TRACE_SAMPLE_RATE; a
+  trace coming from another service keeps the caller's decision
+- an unsampled trace only gets its local root span (one per request), no
+  child spans, so it costs next to nothing. That root is still written if
+  it took longer than TRACE_SLOW_MS or failed, so slow requests are never
+  lost, only their breakdown
+
+Finished spans are written as JSON lines to TRACE_FILE by a background
+thread. The file is rotated at TRACE_FILE_MAX_MB, keeping
+TRACE_FILE_BACKUPS old ones (TRACE_FILE.1 the newest).
+`python scripts/critical_path.py` (in backend/) renders them.
+"""
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "0").lower() not in ("0", "false", "no", "off")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.05"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "1000"))
+TRACE_FILE_MAX_MB = float(os.getenv("TRACE_FILE_MAX_MB", "64"))
+TRACE_FILE_BACKUPS = int(os.getenv("TRACE_FILE_BACKUPS", "3"))
+
+_service_name = "unknown"
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class _LocalTrace:
+    """The part of a trace that runs in this process."""
+
+    __slots__ = ("trace_id", "sampled", "spans", "decided", "keep")
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List["Span"] = []
+        # Set once the local root has finished and the trace was kept or dropped
+        self.decided = False
+        self.keep = sampled
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start", "end", "attributes", "error", "is_local_root")
+
+    def __init__(self, trace: _LocalTrace, name: str, kind: str, parent_id: Optional[str], is_local_root: bool,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attributes = dict(attributes) if attributes else {}
+        self.error: Optional[str] = None
+        self.is_local_root = is_local_root
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace.trace_id}-{self.span_id}-{'01' if self.trace.sampled else '00'}"
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def finish(self, error: Optional[BaseException] = None):
+        if self.end is not None:
+            return
+        self.end = time.time()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        _on_finish(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "service": _service_name,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": round((self.end - self.start) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _JsonlExporter:
+    """Appends spans to a file from a daemon thread, so the event loop never waits on disk.
+
+    The file is rotated once it reaches `max_bytes`, keeping `backups` old files.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backups: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: "queue.SimpleQueue[Optional[dict]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: List[Span]):
+        for s in spans:
+            self._queue.put(s.to_dict())
+
+    def _run(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with open(self.path, "a") as f:
+                for record in batch:
+                    if record is not None:
+                        f.write(json.dumps(record, default=str) + "\n")
+                size = f.tell()
+            if size >= self.max_bytes:
+                self._rotate()
+            if None in batch:
+                return
+
+    def _rotate(self):
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for n in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{n}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{n + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def close(self, timeout: float = 2.0):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+_exporter: Optional[_JsonlExporter] = None
+
+
+def configure(service_name: str, path: Optional[str] = None):
+    """Name this service and start the exporter. Without it spans are created but not written."""
+    global _service_name, _exporter
+    _service_name = service_name
+    if not TRACE_ENABLED or _exporter is not None:
+        return
+    _exporter = _JsonlExporter(path or os.getenv("TRACE_FILE", f"traces/{service_name}.jsonl"),
+                               int(TRACE_FILE_MAX_MB * 1024 * 1024), TRACE_FILE_BACKUPS)
+    atexit.register(_exporter.close)
+
+
+def _on_finish(span: Span):
+    trace = span.trace
+    if trace.decided:
+        # Late span (e.g. a background task) of a trace that is already settled
+        if trace.keep and _exporter is not None:
+            _exporter.export([span])
+        return
+    trace.spans.append(span)
+    if not span.is_local_root:
+        return
+    trace.decided = True
+    if not trace.keep:
+        slow = (span.end - span.start) * 1000 >= TRACE_SLOW_MS
+        trace.keep = slow or any(s.error for s in trace.spans)
+    if trace.keep and _exporter is not None:
+        _exporter.export(trace.spans)
+    trace.spans = []
+
+
+def parse_traceparent(value: Optional[str]):
+    """(trace_id, parent span_id, sampled) from a traceparent header, or None if invalid."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def start_span(name: str, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None,
+               traceparent: Optional[str] = None, root: bool = True) -> Optional[Span]:
+    """Start a span under the current one. Does not make it current, see `span()`.
+
+    Without a current span a new trace is started (continuing `traceparent`
+    if given), unless `root` is False, in which case None is returned: used
+    for spans that only make sense inside a request, like DB queries.
+    Inside an unsampled trace no child span is created and None is returned.
+    """
+    if not TRACE_ENABLED:
+        return None
+    parent = _current.get()
+    if parent is not None and parent.end is None:
+        if not parent.trace.sampled:
+            return None
+        return Span(parent.trace, name, kind, parent.span_id, False, attributes)
+    context = parse_traceparent(traceparent)
+    if context is not None:
+        trace_id, parent_id, sampled = context
+        return Span(_LocalTrace(trace_id, sampled), name, kind, parent_id, True, attributes)
+    if not root:
+        return None
+    trace = _LocalTrace(os.urandom(16).hex(), random.random() < TRACE_SAMPLE_RATE)
+    return Span(trace, name, kind, None, True, attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None, root: bool = True):
+    """Context manager around `start_span` that makes the span current. Yields None when not tracing."""
+    current = start_span(name, kind, attributes, root=root)
+    if current is None:
+        yield None
+        return
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.finish(e)
+        raise
+    finally:
+        _current.reset(token)
+        current.finish()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def use_span(current: Optional[Span]):
+    """Make `current` the active span in this context (e.g. inside an executor thread)."""
+    return _current.set(current)
+
+
+def inject(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Add the traceparent of the current span to outgoing request headers."""
+    headers = dict(headers) if headers else {}
+    current = _current.get()
+    if current is not None:
+        headers["traceparent"] = current.traceparent
+    return headers
+
+
+class TracingMiddleware:
+    """ASGI middleware: one server span per HTTP request, continuing the caller's trace."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACE_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        server = start_span(f"{scope['method']} {scope['path']}", "server", traceparent=traceparent)
+        server.set("http.method", scope["method"])
+        server.set("http.target", scope["path"])
+        token = _current.set(server)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                server.set("http.status_code", message["status"])
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", server.trace_id.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            if route is not None and getattr(route, "path", None):
+                server.name = f"{scope['method']} {route.path}"
+            if error is None and server.attributes.get("http.status_code", 500) >= 500:
+                server.error = f"HTTP {server.attributes.get('http.status_code', 500)}"
+            server.finish(error)
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import sys
+import uuid
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The tests import the app's modules as `src.…`, the way main.py does
+sys.path.insert(0, BACKEND)
+
+
+def _admin_dsn(database: str) -> str:
+    from src.configs.config import settings
+    return (f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}"
+            f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{database}")
+
+
+def _migrate(connection):
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", os.path.join(BACKEND, "alembic"))
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+
+@pytest.fixture(scope="session")
+def database_url():
+    """URL of a scratch database migrated to head, dropped after the run.
+
+    Created next to POSTGRES_DB with the same credentials; the tests that
+    use it are skipped when that server cannot be reached.
+    """
+    import asyncpg
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+    from src.configs.config import settings
+
+    name = f"serp_test_{uuid.uuid4().hex[:8]}"
+
+    async def create():
+        admin = await asyncpg.connect(_admin_dsn(settings.POSTGRES_DB), timeout=3)
+        try:
+            await admin.execute(f'CREATE DATABASE "{name}"')
+        finally:
+            await admin.close()
+
+    async def migrate(url):
+        engine = create_async_engine(url, poolclass=NullPool)
+        async with engine.connect() as connection:
+            await connection.run_sync(_migrate)
+            await connection.commit()
+        await engine.dispose()
+
+    async def drop():
+        admin = await asyncpg.connect(_admin_dsn(settings.POSTGRES_DB), timeout=3)
+        try:
+            await admin.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        finally:
+            await admin.close()
+
+    try:
+        asyncio.run(create())
+    except (OSError, asyncpg.PostgresError, asyncio.TimeoutError) as e:
+        pytest.skip(f"No Postgres to test against: {e}")
+    url = (f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}"
+           f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{name}")
+    try:
+        asyncio.run(migrate(url))
+        yield url
+    finally:
+        asyncio.run(drop())
+
+
+@pytest.fixture
+def run_db(database_url):
+    """Run `scenario(engine)` on the scratch database in a fresh event loop."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    def run(scenario):
+        async def main():
+            engine = create_async_engine(database_url, poolclass=NullPool)
+            try:
+                return await scenario(engine)
+            finally:
+                await engine.dispose()
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,101 @@
+import asyncio
+
+from src.services.admission import ANALYTICS, CRITICAL, DISPATCHER, RouteClass, classify
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_admits_up_to_the_limit_then_queues_in_order():
+    async def scenario():
+        route_class = RouteClass("test", limit=1, queue=2, shed_wait_ms=None)
+        assert await route_class.acquire(1)
+        order = []
+
+        async def waiter(name):
+            assert await route_class.acquire(1)
+            order.append(name)
+
+        tasks = [asyncio.create_task(waiter(name)) for name in ("first", "second")]
+        await asyncio.sleep(0)
+        assert route_class.status()["waiting"] == 2
+        # A full queue refuses at once
+        assert not await route_class.acquire(1)
+
+        route_class.release()
+        await asyncio.sleep(0.01)
+        assert order == ["first"]
+        route_class.release()
+        await asyncio.gather(*tasks)
+        assert order == ["first", "second"]
+        return route_class
+
+    route_class = run(scenario())
+    assert route_class.active == 1
+    assert route_class.stats["queue_full"] == 1
+
+
+def test_release_hands_the_slot_to_the_waiter():
+    async def scenario():
+        route_class = RouteClass("test", limit=1, queue=1, shed_wait_ms=None)
+        assert await route_class.acquire(1)
+        waiting = asyncio.create_task(route_class.acquire(1))
+        await asyncio.sleep(0)
+        route_class.release()
+        # Handed over in release(): nobody arriving now can take the slot
+        assert route_class.active == 1
+        assert not await route_class.acquire(0.01)
+        assert await waiting
+        return route_class
+
+    assert run(scenario()).stats["timed_out"] == 1
+
+
+def test_queue_timeout_gives_up_the_place():
+    async def scenario():
+        route_class = RouteClass("test", limit=1, queue=1, shed_wait_ms=None)
+        assert await route_class.acquire(1)
+        assert not await route_class.acquire(0.01)
+        assert route_class.status()["waiting"] == 0
+        route_class.release()
+        assert route_class.active == 0
+        return route_class
+
+    assert run(scenario()).stats["timed_out"] == 1
+
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    async def scenario():
+        route_class = RouteClass("test", limit=1, queue=1, shed_wait_ms=None)
+        assert await route_class.acquire(1)
+        waiting = asyncio.create_task(route_class.acquire(1))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        route_class.release()
+        return route_class
+
+    route_class = run(scenario())
+    assert route_class.active == 0
+    assert route_class.status()["waiting"] == 0
+
+
+def test_force_goes_over_the_limit():
+    route_class = RouteClass("test", limit=1, queue=0, shed_wait_ms=None)
+    assert run(route_class.acquire(1))
+    route_class.force()
+    assert route_class.active == 2
+    route_class.release()
+    route_class.release()
+    assert route_class.active == 0
+
+
+def test_archived_listing_is_analytics_for_every_true_spelling():
+    for query in (b"archived=true", b"archived=1", b"archived=True", b"archived=on", b"archived=yes",
+                  b"limit=10&archived=TRUE", b"archived=false&archived=1"):
+        assert classify("GET", "/api/alerts", query) == ANALYTICS, query
+    for query in (b"", b"archived=false", b"archived=0", b"archived=off", b"notarchived=true",
+                  b"archived=true&archived=no"):
+        assert classify("GET", "/api/alerts", query) == DISPATCHER, query
+    assert classify("POST", "/api/alerts", b"archived=1") == CRITICAL
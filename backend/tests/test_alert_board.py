@@ -0,0 +1,103 @@
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import orjson
+
+from src.models.emergency import PriorityType, StatusType
+from src.services.alert_board import AlertBoard, SortedKeyList
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def emergency(priority, minutes, status=StatusType.Active, emergency_id=None):
+    return {
+        "id": emergency_id or uuid.uuid4(),
+        "name": "x",
+        "priority": priority,
+        "status": status,
+        "time_created": START + timedelta(minutes=minutes),
+        "time_updated": None,
+    }
+
+
+def ids(items):
+    return [orjson.loads(item)["id"] for item in items]
+
+
+def test_sorted_key_list_matches_sorted():
+    rng = random.Random(0)
+    keys = SortedKeyList()
+    expected = []
+    for i in range(3000):
+        key = (rng.randrange(3), rng.random(), str(i))
+        keys.add(key)
+        expected.append(key)
+        if i % 3 == 0:
+            victim = expected.pop(rng.randrange(len(expected)))
+            keys.remove(victim)
+    expected.sort()
+    assert len(keys) == len(expected)
+    assert list(keys.iter_from()) == expected
+    assert list(keys.iter_at(1234)) == expected[1234:]
+    assert list(keys.iter_from(expected[500], exclusive=True)) == expected[501:]
+
+
+def test_page_orders_by_priority_then_age():
+    board = AlertBoard()
+    low = emergency(PriorityType.Baixa, 0)
+    high_new = emergency(PriorityType.Alta, 10)
+    high_old = emergency(PriorityType.Alta, 5)
+    medium = emergency(PriorityType.Mitjana, 1)
+    for entry in (low, high_new, high_old, medium):
+        board.upsert(entry)
+
+    items, cursor = board.page(10)
+    assert ids(items) == [str(e["id"]) for e in (high_old, high_new, medium, low)]
+    assert cursor is None
+
+
+def test_cursor_pages_cover_the_board_once():
+    board = AlertBoard()
+    rng = random.Random(1)
+    entries = [emergency(rng.choice(list(PriorityType)), rng.randrange(10_000)) for _ in range(250)]
+    for entry in entries:
+        board.upsert(entry)
+
+    seen, cursor = [], None
+    while True:
+        items, cursor = board.page(40, cursor=cursor)
+        seen += ids(items)
+        if cursor is None:
+            break
+    everything, _ = board.page(1000)
+    assert seen == ids(everything)
+    assert len(seen) == 250
+
+
+def test_priority_filter_with_offset_and_counts():
+    board = AlertBoard()
+    rng = random.Random(2)
+    for _ in range(300):
+        board.upsert(emergency(rng.choice(list(PriorityType)), rng.randrange(10_000)))
+    everything = ids(board.page(1000)[0])
+
+    for priority in PriorityType:
+        wanted = [i for i in everything if orjson.loads(board._entries[i][1])["priority"] == priority.value]
+        assert board.count(priority) == len(wanted)
+        assert ids(board.page(7, offset=5, priority=priority)[0]) == wanted[5:12]
+        assert board.page(7, offset=len(wanted), priority=priority) == ([], None)
+
+
+def test_upsert_moves_and_closing_removes():
+    board = AlertBoard()
+    entry = emergency(PriorityType.Baixa, 0)
+    board.upsert(entry)
+    board.upsert(dict(entry, priority=PriorityType.Alta))
+    assert board.count(PriorityType.Baixa) == 0
+    assert board.count(PriorityType.Alta) == 1
+
+    board.upsert(dict(entry, status=StatusType.Solved))
+    assert len(board) == 0
+    assert board.count(PriorityType.Alta) == 0
+    assert board.page(10) == ([], None)
@@ -0,0 +1,81 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from src.services import analytics_rollups
+
+# An hour no other test writes to
+HOUR = datetime(2002, 5, 6, 7, tzinfo=timezone.utc)
+
+
+async def _add(conn, table, emergency_type, priority, status, minutes_to_resolve=None):
+    emergency = uuid.uuid4()
+    created = HOUR + timedelta(minutes=5)
+    updated = created + timedelta(minutes=minutes_to_resolve) if minutes_to_resolve is not None else None
+    await conn.execute(text("INSERT INTO emergency_id (id, time_created) VALUES (:id, :t)"),
+                       {"id": emergency, "t": created})
+    await conn.execute(text(f"""
+        INSERT INTO {table} (id, name, description, emergency_type, priority, status, time_created, time_updated)
+        VALUES (:id, 'test', 'test', :type, :priority, :status, :created, :updated)
+    """), {"id": emergency, "type": emergency_type, "priority": priority, "status": status,
+           "created": created, "updated": updated})
+    return emergency
+
+
+async def _rollup(conn):
+    rows = await conn.execute(text("""
+        SELECT emergency_type, priority, incidents, resolved,
+               resolve_seconds_sum, resolve_seconds_min, resolve_seconds_max
+        FROM emergency_rollup_hourly WHERE bucket = :hour
+    """), {"hour": HOUR})
+    return {(r[0], r[1]): tuple(r[2:]) for r in rows}
+
+
+def test_full_then_incremental_refresh(run_db):
+    async def scenario(engine):
+        async with engine.begin() as conn:
+            pending = await _add(conn, "emergency", "Incendi", "Alta", "Active")
+            await _add(conn, "emergency", "Incendi", "Alta", "Solved", minutes_to_resolve=30)
+            await _add(conn, "emergency_archive", "Incendi", "Alta", "Archived", minutes_to_resolve=10)
+            # No type or priority: counted under the model defaults
+            await _add(conn, "emergency", None, None, "Active")
+
+        summary = await analytics_rollups.refresh(engine, full=True)
+        assert summary["mode"] == "full"
+        async with engine.connect() as conn:
+            assert await _rollup(conn) == {
+                ("Incendi", "Alta"): (3, 2, 2400.0, 600.0, 1800.0),
+                ("Altres", "Mitjana"): (1, 0, 0.0, None, None),
+            }
+
+        # Closing the pending one marks its hour as changed
+        async with engine.begin() as conn:
+            await conn.execute(text("UPDATE emergency SET status = 'Solved', time_updated = now() WHERE id = :id"),
+                               {"id": pending})
+        summary = await analytics_rollups.refresh(engine)
+        assert summary["mode"] == "incremental"
+        async with engine.connect() as conn:
+            rollup = await _rollup(conn)
+            incidents, resolved, total, shortest, longest = rollup[("Incendi", "Alta")]
+            assert (incidents, resolved, shortest) == (3, 3, 600.0)
+            assert longest > 365 * 24 * 3600
+            assert total == 2400.0 + longest
+            assert rollup[("Altres", "Mitjana")] == (1, 0, 0.0, None, None)
+
+        # The overlap recomputes the hour again: same result
+        await analytics_rollups.refresh(engine)
+        async with engine.connect() as conn:
+            assert await _rollup(conn) == rollup
+
+    run_db(scenario)
+
+
+def test_refresh_skips_while_another_process_holds_the_lock(run_db):
+    async def scenario(engine):
+        async with engine.begin() as conn:
+            await conn.execute(text(f"SELECT pg_advisory_xact_lock({analytics_rollups.REFRESH_LOCK})"))
+            assert await analytics_rollups.refresh(engine) is None
+        assert await analytics_rollups.refresh(engine) is not None
+
+    run_db(scenario)
@@ -0,0 +1,66 @@
+import uuid
+
+from src.models.emergency import EmergencyType
+from src.services.duplicate_detector import DuplicateDetector
+
+NOW = 1_800_000_000.0
+
+
+def detector():
+    return DuplicateDetector(radius_m=150, window_s=15 * 60)
+
+
+def test_finds_a_nearby_report_of_the_same_type():
+    d = detector()
+    original = uuid.uuid4()
+    d.add(original, EmergencyType.Incendi, 41.3901, 2.1701, created=NOW)
+    # About 45 m north
+    match = d.find(EmergencyType.Incendi, 41.3905, 2.1701, now=NOW + 60)
+    assert match is not None and match.id == original
+
+
+def test_other_type_too_far_or_too_old_does_not_match():
+    d = detector()
+    d.add(uuid.uuid4(), EmergencyType.Incendi, 41.3901, 2.1701, created=NOW)
+    assert d.find(EmergencyType.Altres, 41.3901, 2.1701, now=NOW) is None
+    # About 330 m north
+    assert d.find(EmergencyType.Incendi, 41.3931, 2.1701, now=NOW) is None
+    assert d.find(EmergencyType.Incendi, 41.3901, 2.1701, now=NOW + 16 * 60) is None
+
+
+def test_matches_across_cell_edges():
+    d = detector()
+    row_deg = d._row_deg
+    # A point right below a row boundary and one right above it, ~20 m apart
+    edge = (d._row(41.39) + 1) * row_deg - 90
+    below, above = edge - 0.0001, edge + 0.0001
+    assert d._row(below) != d._row(above)
+    original = uuid.uuid4()
+    d.add(original, EmergencyType.Incendi, below, 2.17, created=NOW)
+    assert d.find(EmergencyType.Incendi, above, 2.17, now=NOW).id == original
+
+
+def test_matches_across_time_buckets_within_the_window():
+    d = detector()
+    bucket_end = (d._bucket(NOW) + 1) * d.window_s
+    original = uuid.uuid4()
+    d.add(original, EmergencyType.Incendi, 41.39, 2.17, created=bucket_end - 1)
+    assert d.find(EmergencyType.Incendi, 41.39, 2.17, now=bucket_end + 1).id == original
+
+
+def test_duplicates_point_at_the_first_report():
+    d = detector()
+    first, second = uuid.uuid4(), uuid.uuid4()
+    d.add(first, EmergencyType.Incendi, 41.39, 2.17, created=NOW)
+    d.add(second, EmergencyType.Incendi, 41.3901, 2.17, created=NOW + 1, root=first)
+    d.forget(first)
+    match = d.find(EmergencyType.Incendi, 41.3901, 2.17, now=NOW + 2)
+    assert match.id == second and match.root == first
+
+
+def test_old_buckets_are_evicted():
+    d = detector()
+    d.add(uuid.uuid4(), EmergencyType.Incendi, 41.39, 2.17, created=NOW)
+    d.find(EmergencyType.Incendi, 0.0, 0.0, now=NOW + 3 * d.window_s)
+    assert len(d) == 0
+    assert d.status()["cells"] == 0
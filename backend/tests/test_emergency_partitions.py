@@ -0,0 +1,100 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from src.services import emergency_partitions as ep
+
+
+async def _rows(conn, statement, **params):
+    return [tuple(row) for row in (await conn.execute(text(statement), params)).all()]
+
+
+async def _add_emergency(conn, status, time_created, location, resource):
+    emergency = uuid.uuid4()
+    await conn.execute(text("INSERT INTO emergency_id (id, time_created) VALUES (:id, :t)"),
+                       {"id": emergency, "t": time_created})
+    await conn.execute(text("""
+        INSERT INTO emergency (id, name, description, status, location_emergency, resource_id, time_created)
+        VALUES (:id, 'test', 'test', :status, :location, :resource, :t)
+    """), {"id": emergency, "status": status, "location": location, "resource": resource, "t": time_created})
+    await conn.execute(text("INSERT INTO emergencyresourcelink (emergency_id, resource_id) VALUES (:e, :r)"),
+                       {"e": emergency, "r": resource})
+    return emergency
+
+
+async def _archive_partition_layout(conn):
+    """{partition: (tables its foreign keys reference, column lists of its indexes)} for emergency_archive."""
+    layout = {}
+    for (partition,) in await _rows(conn, """
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'emergency_archive'::regclass
+    """):
+        references = await _rows(conn, """
+            SELECT DISTINCT confrelid::regclass::text FROM pg_constraint
+            WHERE conrelid = CAST(:p AS regclass) AND contype = 'f'
+        """, p=partition)
+        indexes = await _rows(conn, """
+            SELECT array_to_string(array(
+                SELECT a.attname FROM unnest(x.indkey) WITH ORDINALITY AS k(attnum, n)
+                JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum ORDER BY k.n), ',')
+            FROM pg_index x WHERE x.indrelid = CAST(:p AS regclass)
+        """, p=partition)
+        layout[partition] = ({r for (r,) in references}, {i for (i,) in indexes})
+    return layout
+
+
+def test_archive_keeps_links_and_leaves_both_paths_alike(run_db):
+    now = datetime.now(timezone.utc)
+    closed_month = ep.month_start(now - timedelta(days=200))
+    mixed_month = ep.month_start(now - timedelta(days=140))
+
+    async def scenario(engine):
+        async with engine.connect() as conn:
+            # archive() works on the whole table: start without the other tests' incidents
+            await conn.execute(text("TRUNCATE emergency_id CASCADE"))
+            location = uuid.uuid4()
+            resource = uuid.uuid4()
+            await conn.execute(text("INSERT INTO location (id, latitude, longitude) VALUES (:id, 41.4, 2.2)"),
+                               {"id": location})
+            await conn.execute(text("""
+                INSERT INTO resource (id, resource_type, responsible, telephone, email)
+                VALUES (:id, 'Ambulancia', 'test', '000', 'test@example.com')
+            """), {"id": resource})
+            await conn.commit()
+            for month in (closed_month, mixed_month):
+                await ep._create_partition(conn, ep.HOT_TABLE, month)
+
+            # Whole partition: nothing Active
+            closed = [await _add_emergency(conn, status, closed_month + timedelta(days=1), location, resource)
+                      for status in ("Solved", "Archived")]
+            # Row by row: the Active incident keeps the partition hot
+            solved = await _add_emergency(conn, "Solved", mixed_month + timedelta(days=1), location, resource)
+            active = await _add_emergency(conn, "Active", mixed_month + timedelta(days=2), location, resource)
+            await conn.commit()
+
+            summary = await ep.archive(conn, older_than_days=30)
+            assert summary["partitions_moved"] == 1
+            assert summary["rows_moved"] == 3
+            assert summary["partitions_kept_hot"] == 1
+            assert summary["partitions_skipped"] == 0
+
+            archived = {e for (e,) in await _rows(conn, "SELECT id FROM emergency_archive")}
+            assert archived == {*closed, solved}
+            assert await _rows(conn, "SELECT id FROM emergency") == [(active,)]
+            linked = {e for (e,) in await _rows(conn, "SELECT emergency_id FROM emergencyresourcelink")}
+            assert linked == {*closed, solved, active}
+
+            layout = await _archive_partition_layout(conn)
+            whole = layout[ep.partition_name(ep.ARCHIVE_TABLE, closed_month)]
+            by_rows = layout[ep.partition_name(ep.ARCHIVE_TABLE, mixed_month)]
+            assert whole == by_rows
+            assert whole[0] == {"emergency_id"}
+            assert {"id,time_created", "time_created", "duplicate_of"} <= whole[1]
+
+            # Nothing on the archive references location any more
+            await conn.execute(text("DELETE FROM location WHERE id = :id"), {"id": location})
+            await conn.commit()
+            assert await _rows(conn, "SELECT location_emergency FROM emergency WHERE id = :id", id=active) == [(None,)]
+
+    run_db(scenario)
@@ -0,0 +1,91 @@
+import io
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.models.emergency import Emergency, PriorityType, StatusType
+from src.services import export
+
+# A day no other test writes to
+DAY = datetime(2001, 2, 3, tzinfo=timezone.utc)
+
+
+def test_emergency_schema():
+    writer = export._Writer("emergencies", export.columns_of("emergencies"), "arrow")
+    schema = writer.schema
+    assert schema.names == export.columns_of("emergencies")
+    assert schema.field("id").type == pa.string()
+    assert not schema.field("id").nullable
+    assert schema.field("time_created").type == pa.timestamp("us", tz="UTC")
+    assert not schema.field("time_created").nullable
+    assert schema.field("status").type == pa.string()
+    assert schema.field("location_emergency").type == pa.string()
+    assert schema.field("location_emergency").nullable
+
+
+def test_location_schema():
+    schema = export._Writer("locations", ["id", "latitude", "speed", "time_created"], "parquet").schema
+    assert schema.names == ["id", "latitude", "speed", "time_created"]
+    assert schema.field("latitude").type == pa.float64()
+    assert not schema.field("latitude").nullable
+    assert schema.field("speed").nullable
+
+
+def _read(format: str, body: bytes) -> pa.Table:
+    if format == "parquet":
+        return pa.parquet.read_table(io.BytesIO(body))
+    return pa.ipc.open_stream(body).read_all()
+
+
+def test_stream_projects_filters_and_adds_the_archive(run_db, monkeypatch):
+    # Several batches, so several record batches / row groups
+    monkeypatch.setattr(export.settings, "EXPORT_BATCH_ROWS", 2)
+
+    async def scenario(engine):
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            for hour, status in enumerate([StatusType.Active, StatusType.Solved, StatusType.Active]):
+                session.add(Emergency(name=f"e{hour}", description="test", priority=PriorityType.Alta, status=status,
+                                      time_created=DAY + timedelta(hours=hour)))
+            # The day after, outside the range
+            session.add(Emergency(name="late", description="test", time_created=DAY + timedelta(days=1)))
+            await session.commit()
+
+            archived = uuid.uuid4()
+            await session.execute(text("INSERT INTO emergency_id (id, time_created) VALUES (:id, :t)"),
+                                  {"id": archived, "t": DAY})
+            await session.execute(text("""
+                INSERT INTO emergency_archive (id, name, description, status, time_created)
+                VALUES (:id, 'archived', 'test', 'Archived', :t)
+            """), {"id": archived, "t": DAY})
+            await session.commit()
+
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        columns = ["id", "name", "status", "time_created"]
+        for format in ("arrow", "parquet"):
+            chunks = [chunk async for chunk in export.stream(factory, "emergencies", columns, format,
+                                                             since=DAY, until=DAY + timedelta(days=1))]
+            assert len(chunks) > 2
+            table = _read(format, b"".join(chunks))
+            assert table.schema.names == columns
+            assert table.schema.field("time_created").type == pa.timestamp("us", tz="UTC")
+            rows = sorted(table.to_pylist(), key=lambda r: r["name"])
+            assert [r["name"] for r in rows] == ["e0", "e1", "e2"]
+            # Enums with their API values, UUIDs as strings
+            assert [r["status"] for r in rows] == ["Actiu", "Resolt", "Actiu"]
+            assert all(isinstance(r["id"], str) for r in rows)
+            assert rows[0]["time_created"] == DAY
+
+            chunks = [chunk async for chunk in export.stream(factory, "emergencies", columns, format,
+                                                             since=DAY, until=DAY + timedelta(days=1),
+                                                             include_archived=True)]
+            names = {r["name"]: r for r in _read(format, b"".join(chunks)).to_pylist()}
+            assert set(names) == {"e0", "e1", "e2", "archived"}
+            assert names["archived"]["id"] == str(archived)
+            assert names["archived"]["status"] == "Arxivad"
+
+    run_db(scenario)
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from src.configs.config import settings
+from src.services import heatmap_tiles
+from src.services.heatmap_tiles import HeatmapTiles, TileCache, bin_points, tile_bounds, tile_of
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_bin_points_puts_each_point_in_its_cell():
+    z, x, y = tile_of(41.3874, 2.1686, 12)
+    west, south, east, north = tile_bounds(z, x, y)
+    # One point near the north-west corner, two near the south-east one, one outside the tile
+    lat = np.array([north - 1e-6, south + 1e-6, south + 1e-6, north + 1.0])
+    lon = np.array([west + 1e-6, east - 1e-6, east - 1e-6, west])
+    counts = bin_points(lat, lon, z, x, y, 8)
+    assert counts.shape == (8, 8)
+    assert counts[0, 0] == 1
+    assert counts[7, 7] == 2
+    assert counts.sum() == 3
+
+
+def test_memory_then_disk_then_expiry(tmp_path):
+    async def scenario():
+        cache = TileCache(max_tiles=2, directory=str(tmp_path), ttl=60, max_bytes=1 << 20)
+        assert await cache.get((1, 0, 0), "a.png") == (None, "miss")
+        await cache.put((1, 0, 0), "a.png", b"tile")
+        assert await cache.get((1, 0, 0), "a.png") == (b"tile", "memory")
+
+        # Another process (a new cache on the same directory) finds it on disk
+        other = TileCache(max_tiles=2, directory=str(tmp_path), ttl=60, max_bytes=1 << 20)
+        assert await other.get((1, 0, 0), "a.png") == (b"tile", "disk")
+        assert await other.get((1, 0, 0), "a.png") == (b"tile", "memory")
+
+        expired = TileCache(max_tiles=2, directory=str(tmp_path), ttl=0, max_bytes=1 << 20)
+        path = expired._path((1, 0, 0), "a.png")
+        os.utime(path, (0, 0))
+        assert await expired.get((1, 0, 0), "a.png") == (None, "miss")
+
+    run(scenario())
+
+
+def test_memory_is_lru():
+    async def scenario():
+        cache = TileCache(max_tiles=2, directory="", ttl=60, max_bytes=0)
+        await cache.put((1, 0, 0), "v", b"a")
+        await cache.put((1, 0, 1), "v", b"b")
+        await cache.get((1, 0, 0), "v")
+        await cache.put((1, 1, 0), "v", b"c")
+        assert len(cache) == 2
+        assert (await cache.get((1, 0, 1), "v"))[1] == "miss"
+        assert (await cache.get((1, 0, 0), "v"))[1] == "memory"
+
+    run(scenario())
+
+
+def test_invalidate_point_forgets_the_tile_at_every_zoom(tmp_path):
+    async def scenario():
+        cache = TileCache(max_tiles=100, directory=str(tmp_path), ttl=60, max_bytes=1 << 20)
+        here = [tile_of(41.3874, 2.1686, z) for z in range(settings.HEATMAP_MAX_ZOOM + 1)]
+        elsewhere = tile_of(-33.87, 151.21, settings.HEATMAP_MAX_ZOOM)
+        for tile in here + [elsewhere]:
+            await cache.put(tile, "a.png", b"tile")
+            await cache.put(tile, "b.json", b"{}")
+
+        await cache.invalidate_point(41.3874, 2.1686)
+        for tile in here:
+            for variant in ("a.png", "b.json"):
+                assert await cache.get(tile, variant) == (None, "miss")
+        assert await cache.get(elsewhere, "b.json") == (b"{}", "memory")
+        assert os.path.exists(cache._path(elsewhere, "a.png"))
+
+    run(scenario())
+
+
+def test_prune_keeps_the_newest_tiles_under_the_limit(tmp_path):
+    cache = TileCache(max_tiles=10, directory=str(tmp_path), ttl=3600, max_bytes=250)
+    now = time.time()
+    for i in range(5):
+        path = cache._path((3, i, 0), "v")
+        cache._write_disk(path, b"x" * 100)
+        os.utime(path, (now - 10 + i, now - 10 + i))
+    assert cache._prune_disk() == 200
+    kept = sorted(os.listdir(os.path.join(str(tmp_path), "3")))
+    assert kept == ["3", "4"]
+
+
+def test_concurrent_requests_render_a_tile_once(monkeypatch, tmp_path):
+    renders = []
+
+    async def fake_points(session, z, x, y, emergency_type, since, until):
+        renders.append((z, x, y))
+        await asyncio.sleep(0.01)
+        return np.array([41.3874]), np.array([2.1686])
+
+    monkeypatch.setattr(heatmap_tiles, "tile_points", fake_points)
+    monkeypatch.setattr(settings, "HEATMAP_CACHE_DIR", str(tmp_path))
+
+    async def scenario():
+        tiles = HeatmapTiles()
+        z, x, y = tile_of(41.3874, 2.1686, 10)
+        results = await asyncio.gather(*(tiles.tile(None, z, x, y, fmt="json") for _ in range(5)))
+        assert renders == [(z, x, y)]
+        assert [outcome for _, outcome in results].count("miss") == 1
+        assert {outcome for _, outcome in results} == {"miss", "shared"}
+        assert len({body for body, _ in results}) == 1
+        assert (await tiles.tile(None, z, x, y, fmt="json"))[1] == "memory"
+
+    run(scenario())
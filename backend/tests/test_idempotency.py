@@ -0,0 +1,132 @@
+import asyncio
+import uuid
+
+import httpx
+import orjson
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.services import idempotency
+from src.services.idempotency import IdempotencyMiddleware, IdempotencyStore
+
+
+class CreateEndpoint:
+    """Stands in for POST /api/alerts: counts its runs, answers with a new id."""
+
+    def __init__(self, status=201, delay=0.0):
+        self.status = status
+        self.delay = delay
+        self.runs = 0
+
+    async def __call__(self, scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        self.runs += 1
+        await asyncio.sleep(self.delay)
+        payload = orjson.dumps({"id": str(uuid.uuid4()), "echo": orjson.loads(body)})
+        await send({"type": "http.response.start", "status": self.status, "headers": [
+            (b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode()),
+            (b"x-duplicate-of", b"none"), (b"x-db-queries", b"3"),
+        ]})
+        await send({"type": "http.response.body", "body": payload})
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = IdempotencyStore()
+    monkeypatch.setattr(idempotency, "idempotency_store", store)
+    return store
+
+
+def _client(engine, endpoint):
+    app = IdempotencyMiddleware(endpoint, async_sessionmaker(engine, expire_on_commit=False))
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def _post(client, key, payload):
+    return client.post("/api/alerts", content=orjson.dumps(payload), headers={"Idempotency-Key": key})
+
+
+def test_retry_gets_the_stored_response(run_db, store):
+    async def scenario(engine):
+        endpoint = CreateEndpoint()
+        key = str(uuid.uuid4())
+        async with _client(engine, endpoint) as client:
+            first = await _post(client, key, {"name": "fire"})
+            assert first.status_code == 201
+            assert "idempotent-replayed" not in first.headers
+
+            again = await _post(client, key, {"name": "fire"})
+            # From the database this time, as another process would see it
+            store._cache.clear()
+            from_db = await _post(client, key, {"name": "fire"})
+
+            for retry in (again, from_db):
+                assert retry.status_code == 201
+                assert retry.content == first.content
+                assert retry.headers["idempotent-replayed"] == "true"
+                assert retry.headers["x-duplicate-of"] == "none"
+                assert "x-db-queries" not in retry.headers
+            assert endpoint.runs == 1
+            assert (store.stats["replayed"], store.stats["cache_hits"]) == (2, 1)
+
+            # No key, no idempotency
+            await client.post("/api/alerts", content=b'{"name": "fire"}')
+            assert endpoint.runs == 2
+
+    run_db(scenario)
+
+
+def test_concurrent_copy_gets_409(run_db, store):
+    async def scenario(engine):
+        endpoint = CreateEndpoint(delay=0.2)
+        key = str(uuid.uuid4())
+        async with _client(engine, endpoint) as client:
+            first = asyncio.create_task(_post(client, key, {"name": "fire"}))
+            await asyncio.sleep(0.1)
+            copy = await _post(client, key, {"name": "fire"})
+            assert copy.status_code == 409
+            assert copy.headers["retry-after"] == "1"
+            assert (await first).status_code == 201
+            assert endpoint.runs == 1
+
+    run_db(scenario)
+
+
+def test_key_reused_for_another_request_is_422(run_db, store):
+    async def scenario(engine):
+        endpoint = CreateEndpoint()
+        key = str(uuid.uuid4())
+        async with _client(engine, endpoint) as client:
+            assert (await _post(client, key, {"name": "fire"})).status_code == 201
+            other = await _post(client, key, {"name": "flood"})
+            assert other.status_code == 422
+            store._cache.clear()
+            assert (await _post(client, key, {"name": "flood"})).status_code == 422
+            assert endpoint.runs == 1
+            assert store.stats["mismatched"] == 2
+
+            too_long = await _post(client, "k" * (idempotency.MAX_KEY_LENGTH + 1), {"name": "fire"})
+            assert too_long.status_code == 400
+
+    run_db(scenario)
+
+
+def test_server_error_releases_the_key(run_db, store):
+    async def scenario(engine):
+        endpoint = CreateEndpoint(status=503)
+        key = str(uuid.uuid4())
+        async with _client(engine, endpoint) as client:
+            assert (await _post(client, key, {"name": "fire"})).status_code == 503
+            endpoint.status = 201
+            retry = await _post(client, key, {"name": "fire"})
+            assert retry.status_code == 201
+            assert "idempotent-replayed" not in retry.headers
+            assert endpoint.runs == 2
+            assert store.stats["released"] == 1
+
+    run_db(scenario)
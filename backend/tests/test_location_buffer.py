@@ -0,0 +1,109 @@
+import asyncio
+import contextlib
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.configs.config import settings
+from src.models.location import Location
+from src.models.resource import Resource
+from src.services.location_buffer import LocationBuffer, Sample
+
+# About 3 m and 50 m north of 41.38
+NEAR, FAR = 0.000027, 0.00045
+
+
+async def _add_resource(session) -> uuid.UUID:
+    location = Location(latitude=41.38, longitude=2.17, heading=90.0)
+    session.add(location)
+    await session.flush()
+    resource = Resource(resource_type="ambulance", responsible="test", telephone="000",
+                        email="test@example.com", actual_location=location.id)
+    session.add(resource)
+    await session.commit()
+    return resource.id
+
+
+def test_deadband_drops_gps_noise(run_db, monkeypatch):
+    monkeypatch.setattr(settings, "GPS_DEADBAND_M", 10.0)
+    monkeypatch.setattr(settings, "GPS_DEADBAND_HEADING_DEG", 15.0)
+    monkeypatch.setattr(settings, "GPS_DEADBAND_MAX_AGE_S", 0.2)
+
+    async def scenario(engine):
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            resource = await _add_resource(session)
+            buffer = LocationBuffer()
+            assert await buffer.report(session, uuid.uuid4(), Sample(41.38, 2.17)) is None
+
+            assert await buffer.report(session, resource, Sample(41.38, 2.17, heading=90.0)) is True
+            assert await buffer.report(session, resource, Sample(41.38 + NEAR, 2.17, heading=95.0)) is False
+            # Turning on the spot is a real change
+            assert await buffer.report(session, resource, Sample(41.38, 2.17, heading=180.0)) is True
+            assert await buffer.report(session, resource, Sample(41.38 + FAR, 2.17, heading=180.0)) is True
+            # Past the maximum age even noise is taken, to show the resource is alive
+            await asyncio.sleep(0.25)
+            assert await buffer.report(session, resource, Sample(41.38 + FAR + NEAR, 2.17, heading=180.0)) is True
+            assert (buffer.stats["reported"], buffer.stats["dropped"]) == (6, 1)
+
+    run_db(scenario)
+
+
+def test_flush_writes_only_the_latest_position(run_db, monkeypatch):
+    monkeypatch.setattr(settings, "GPS_DEADBAND_MAX_AGE_S", 0.1)
+    # Flushed by hand here
+    monkeypatch.setattr(settings, "GPS_FLUSH_INTERVAL_MS", 60_000)
+
+    async def scenario(engine):
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            resource = await _add_resource(session)
+            buffer = LocationBuffer()
+            buffer.start(async_sessionmaker(engine, expire_on_commit=False))
+            await buffer.report(session, resource, Sample(41.38 + FAR, 2.17, speed=10.0, heading=0.0))
+            await buffer.report(session, resource, Sample(41.38 + 2 * FAR, 2.17, speed=12.0, heading=0.0))
+            assert len(buffer) == 1
+            assert buffer.get(resource)["latitude"] == 41.38 + 2 * FAR
+
+            assert await buffer.flush() == 1
+            # Written: readers go to the database from now on
+            assert buffer.get(resource) is None
+            row = (await session.execute(text("""
+                SELECT l.latitude, l.speed, l.time_updated FROM location l
+                JOIN resource r ON r.actual_location = l.id WHERE r.id = :id
+            """), {"id": resource})).one()
+            assert (row.latitude, row.speed) == (41.38 + 2 * FAR, 12.0)
+            assert row.time_updated is not None
+
+            # Idle resources are let go after a flush
+            await asyncio.sleep(0.15)
+            assert await buffer.flush() == 0
+            assert buffer.status()["tracked_resources"] == 0
+            await buffer.close()
+
+    run_db(scenario)
+
+
+def test_failed_flush_keeps_the_positions_for_the_next_one(monkeypatch):
+    # No background flush task
+    monkeypatch.setattr(settings, "GPS_BUFFER_ENABLED", False)
+
+    class Unreachable:
+        async def execute(self, *args):
+            raise ConnectionError("database down")
+
+    @contextlib.asynccontextmanager
+    async def factory():
+        yield Unreachable()
+
+    async def scenario():
+        buffer = LocationBuffer()
+        buffer.start(factory)
+        location_id = uuid.uuid4()
+        buffer._pending[location_id] = {"id": location_id, "latitude": 1.0}
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        assert list(buffer._pending) == [location_id]
+        assert buffer._flushing == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import settings
+from src.models.emergency import Emergency, PriorityType, StatusType
+from src.models.location import Location
+from src.services.map_clusters import EmergencyLayer, layer_features
+
+# Away from the other tests' rows
+VIEWPORT = (24.0, 59.5, 26.0, 60.5)
+
+
+async def _add(session, latitude, longitude, priority, status=StatusType.Active):
+    location = Location(latitude=latitude, longitude=longitude)
+    session.add(location)
+    await session.flush()
+    emergency = Emergency(name="test", description="test", priority=priority, status=status,
+                          location_emergency=location.id)
+    session.add(emergency)
+    return emergency
+
+
+def _by_kind(features):
+    clusters = [f for f in features if f["properties"]["cluster"]]
+    singles = [f for f in features if not f["properties"]["cluster"]]
+    return clusters, singles
+
+
+def test_viewport_clusters_nearby_points_and_keeps_lone_ones(run_db):
+    async def scenario(engine):
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            await _add(session, 60.0, 25.0, PriorityType.Alta)
+            await _add(session, 60.0, 25.0, PriorityType.Baixa)
+            await _add(session, 60.0, 25.0, PriorityType.Alta)
+            lone = await _add(session, 59.7, 25.6, PriorityType.Mitjana)
+            # Outside the viewport, and closed
+            await _add(session, 61.0, 25.0, PriorityType.Alta)
+            await _add(session, 60.0, 25.0, PriorityType.Alta, StatusType.Solved)
+            await session.commit()
+
+            clusters, singles = _by_kind(await layer_features(session, EmergencyLayer(StatusType.Active), VIEWPORT, 10))
+            assert len(clusters) == 1
+            cluster = clusters[0]["properties"]
+            assert cluster["count"] == 3
+            assert (cluster["priority_Alta"], cluster["priority_Mitjana"], cluster["priority_Baixa"]) == (2, 0, 1)
+            assert clusters[0]["geometry"]["coordinates"] == [25.0, 60.0]
+
+            assert len(singles) == 1
+            assert singles[0]["properties"]["id"] == lone.id
+            assert singles[0]["properties"]["priority"] == "Mitjana"
+            assert singles[0]["geometry"]["coordinates"] == [25.6, 59.7]
+
+            # Without a status filter the closed one joins the cluster
+            clusters, _ = _by_kind(await layer_features(session, EmergencyLayer(None), VIEWPORT, 10))
+            assert clusters[0]["properties"]["count"] == 4
+
+    run_db(scenario)
+
+
+def test_viewport_returns_every_point_past_the_clustering_zoom(run_db):
+    async def scenario(engine):
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            viewport = (30.0, 10.0, 30.01, 10.01)
+            added = {(await _add(session, 10.005, 30.005, PriorityType.Alta)).id for _ in range(3)}
+            await session.commit()
+
+            features = await layer_features(session, EmergencyLayer(StatusType.Active), viewport,
+                                            settings.MAP_CLUSTER_MAX_ZOOM + 1)
+            clusters, singles = _by_kind(features)
+            assert clusters == []
+            assert {f["properties"]["id"] for f in singles} == added
+
+    run_db(scenario)
@@ -0,0 +1,43 @@
+import pytest
+from starlette.requests import Request
+
+from src.services import compression
+from src.services.compression import negotiate
+from src.services.serializer import wants_msgpack
+
+
+def test_negotiate_prefers_the_best_available_encoding():
+    best = next(iter(compression.ENCODINGS))
+    assert negotiate("gzip, deflate, br, zstd") == best
+    assert negotiate("gzip") == "gzip"
+    assert negotiate("") is None
+    assert negotiate("identity") is None
+
+
+def test_negotiate_honours_q_values():
+    assert negotiate("gzip;q=1, zstd;q=0.5, br;q=0.5") == "gzip"
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("*;q=0.5, gzip;q=0") in set(compression.ENCODINGS) - {"gzip"} | {None}
+    assert negotiate("gzip;q=abc, gzip") == "gzip"
+
+
+def request(accept=None):
+    headers = [(b"accept", accept.encode())] if accept is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, False),
+    ("application/json", False),
+    ("application/msgpack", True),
+    ("application/x-msgpack, application/json;q=0.5", True),
+    ("application/json, application/msgpack;q=0.5", False),
+    ("*/*, application/msgpack", True),
+    ("application/msgpack;q=0", False),
+])
+def test_wants_msgpack(accept, expected):
+    assert wants_msgpack(request(accept)) is expected
+
+
+def test_wants_msgpack_without_request():
+    assert wants_msgpack(None) is False
@@ -0,0 +1,45 @@
+import math
+
+import numpy as np
+
+from src.services.reverse_geocoder import Gazetteer, KDTree, chord_to_metres, to_unit_vectors
+
+
+def test_kdtree_matches_brute_force():
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(2000, 3))
+    tree = KDTree(points)
+    for query in rng.normal(size=(200, 3)):
+        distances = np.sqrt(((points - query) ** 2).sum(axis=1))
+        distance, index = tree.query(query)
+        assert index == int(distances.argmin())
+        assert math.isclose(distance, float(distances.min()))
+
+
+def test_kdtree_small_and_empty():
+    assert KDTree(np.empty((0, 3))).query(np.zeros(3)) == (math.inf, -1)
+    distance, index = KDTree(np.array([[1.0, 0.0, 0.0]])).query(np.array([0.0, 0.0, 0.0]))
+    assert (distance, index) == (1.0, 0)
+
+
+def test_gazetteer_nearest_in_metres(tmp_path):
+    path = tmp_path / "gazetteer.csv"
+    path.write_text(
+        "Latitude,Longitude,City,Postcode\n"
+        "41.3851,2.1734,Barcelona,08002\n"
+        "41.9794,2.8214,Girona,17001\n"
+        "bad,row,Nowhere,00000\n",
+        encoding="utf-8",
+    )
+    gazetteer = Gazetteer.load(str(path))
+    assert len(gazetteer) == 2
+    metres, record = gazetteer.nearest(41.9790, 2.8210)
+    assert record["city"] == "Girona"
+    assert record["postal_code"] == "17001"
+    assert metres < 100
+
+
+def test_chord_to_metres_round_trip():
+    a, b = to_unit_vectors(np.array([0.0, 0.0]), np.array([0.0, 1.0]))
+    # One degree of longitude at the equator
+    assert math.isclose(chord_to_metres(float(np.linalg.norm(a - b))), 111_195, rel_tol=1e-3)
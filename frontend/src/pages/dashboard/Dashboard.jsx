@@ -34,7 +34,7 @@ import {
   DirectionsCar as VehicleIcon,
   Build as EquipmentIcon
 } from '@mui/icons-material';
-import { MapContainer, TileLayer, Marker, Popup } from 'react-leaflet';
+import { MapContainer, TileLayer, Marker, Popup, LayersControl } from 'react-leaflet';
 import L from 'leaflet';
 import 'leaflet/dist/leaflet.css';
 
@@ -399,6 +399,16 @@ const Dashboard = () => {
                     url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
                     attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
                   />
+                  {/* Capa de densidad de emergencias (incluye el histórico), teselas generadas por el backend */}
+                  <LayersControl position="topright">
+                    <LayersControl.Overlay name="Densitat d'emergències">
+                      <TileLayer
+                        url={`${process.env.REACT_APP_API_URL}/api/tiles/heatmap/{z}/{x}/{y}`}
+                        maxNativeZoom={18}
+                        opacity={0.7}
+                      />
+                    </LayersControl.Overlay>
+                  </LayersControl>
                   {filteredEmergencies.map(emergency => (
                     <Marker 
                       key={emergency.id} 
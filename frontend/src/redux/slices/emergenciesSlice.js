@@ -68,7 +68,7 @@ export const assignResourcesToEmergency = createAsyncThunk(
   'emergencies/assignResourcesToEmergency',
   async ({ emergencyId, resourceIds }, { rejectWithValue }) => {
     try {
-      const response = await axios.post(`${API_URL}/emergencies/${emergencyId}/assign-resources`, { resourceIds });
+      const response = await axios.post(`${API_URL}/api/alerts/${emergencyId}/resources`, { assign: resourceIds });
       return response.data;
     } catch (error) {
       return rejectWithValue(error.response.data);
@@ -143,12 +143,14 @@ const emergenciesSlice = createSlice({
       })
       // Asignar recursos a emergencia
       .addCase(assignResourcesToEmergency.fulfilled, (state, action) => {
-        const index = state.emergencies.findIndex(e => e.id === action.payload.id);
+        // La respuesta trae los ids de recursos asignados, no la emergencia entera
+        const { id, resources } = action.payload;
+        const index = state.emergencies.findIndex(e => e.id === id);
         if (index !== -1) {
-          state.emergencies[index] = action.payload;
+          state.emergencies[index] = { ...state.emergencies[index], resources };
         }
-        if (state.activeEmergency?.id === action.payload.id) {
-          state.activeEmergency = action.payload;
+        if (state.activeEmergency?.id === id) {
+          state.activeEmergency = { ...state.activeEmergency, resources };
         }
       });
   }
@@ -0,0 +1,27 @@
+"""
+API router for device lookups and connectivity status.
+"""
+from fastapi import APIRouter, Depends
+from app.core.faults import inject_faults
+from app.services.store import network_store
+
+router = APIRouter(prefix="/device", tags=["Device"], dependencies=[Depends(inject_faults("devices"))])
+
+
+@router.get("/info/{device_id}")
+async def get_device_info(device_id: str):
+    """Get device information"""
+    device = network_store.get_device(device_id)
+    return {"phone_number": device_id, "ipv4_address": device.ipv4_address}
+
+
+@router.get("/status/{device_id}")
+async def get_device_status(device_id: str):
+    """Get device status (online/offline)"""
+    device = network_store.get_device(device_id)
+    return {
+        "phone_number": device_id,
+        "status": "online",
+        "ipv4_address": device.ipv4_address,
+        "last_update": device.updated_at.isoformat()
+    }
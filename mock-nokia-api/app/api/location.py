@@ -0,0 +1,32 @@
+"""
+API router for location retrieval.
+"""
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from app.core.faults import inject_faults
+from app.models.schemas import LocationRequest
+from app.services.store import network_store
+
+router = APIRouter(prefix="/location", tags=["Location"], dependencies=[Depends(inject_faults("location"))])
+
+
+@router.post("")
+async def retrieve_location(request: LocationRequest):
+    """Get current device location (backend shape)"""
+    return network_store.read_position(request.device_id, request.accuracy_level)
+
+
+@router.get("/{device_id}")
+async def get_device_location(
+    device_id: str,
+    max_age: Optional[int] = Query(None, description="Accepted for compatibility with the NAC router, ignored")
+):
+    """Get device location (NAC shape)"""
+    reading = network_store.read_position(device_id)
+    return {
+        "latitude": reading["latitude"],
+        "longitude": reading["longitude"],
+        "elevation": None,
+        "accuracy": reading["accuracy"],
+        "timestamp": reading["timestamp"]
+    }
@@ -0,0 +1,55 @@
+"""
+Control endpoints for the mock itself: fault configuration, stats and device positions.
+These are never subject to fault injection.
+"""
+from fastapi import APIRouter, Query
+from typing import Optional
+from app.core import config
+from app.core.config import MockConfig
+from app.core.faults import stats, reset_buckets
+from app.services.store import network_store
+
+router = APIRouter(prefix="/mock", tags=["Mock"])
+
+
+@router.get("/config", response_model=MockConfig)
+async def get_config():
+    """Current fault-injection configuration"""
+    return config.mock_config
+
+
+@router.put("/config", response_model=MockConfig)
+async def set_config(new_config: MockConfig):
+    """Replace the fault-injection configuration"""
+    # Mutate in place so modules holding a reference see the change
+    config.mock_config.default = new_config.default
+    config.mock_config.routes = new_config.routes
+    reset_buckets()
+    return config.mock_config
+
+
+@router.get("/stats")
+async def get_stats():
+    """Injected faults and request counters per route group"""
+    return stats.as_dict()
+
+
+@router.post("/reset")
+async def reset():
+    """Clear stats, throttling state, devices and sessions"""
+    stats.reset()
+    reset_buckets()
+    network_store.reset()
+    return {"message": "Mock state reset"}
+
+
+@router.post("/location")
+async def set_device_location(
+    device_id: str,
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    speed: Optional[float] = Query(None, ge=0, description="m/s"),
+    heading: Optional[float] = Query(None, ge=0, lt=360)
+):
+    """Place a device (used by create_emergency_scenario.sh)"""
+    return network_store.set_position(device_id, latitude, longitude, speed, heading).as_dict()
@@ -0,0 +1,37 @@
+"""
+API router for the QoS endpoints called by the backend (`nokia_api_call("POST", "qos", ...)`).
+"""
+from fastapi import APIRouter, Depends, HTTPException, Response
+from app.core.faults import inject_faults
+from app.models.schemas import QoSRequest
+from app.services.store import network_store
+
+router = APIRouter(prefix="/qos", tags=["QoS"], dependencies=[Depends(inject_faults("qos"))])
+
+
+@router.post("")
+async def activate_qos(request: QoSRequest):
+    """Activate QoS for a device"""
+    return network_store.create_qos(
+        request.device_id,
+        request.priority_level,
+        request.duration_minutes,
+        request.service_type
+    )
+
+
+@router.get("/{request_id}")
+async def get_qos(request_id: str):
+    """Get a QoS request"""
+    qos = network_store.qos_requests.get(request_id)
+    if qos is None:
+        raise HTTPException(status_code=404, detail="QoS request not found")
+    return qos
+
+
+@router.delete("/{request_id}", status_code=204)
+async def deactivate_qos(request_id: str):
+    """Deactivate QoS for a device"""
+    if not network_store.delete_qos(request_id):
+        raise HTTPException(status_code=404, detail="QoS request not found")
+    return Response(status_code=204)
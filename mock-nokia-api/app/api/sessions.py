@@ -0,0 +1,44 @@
+"""
+API router for CAMARA-style QoD sessions, as created by SERP-nokia-nac.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import Optional
+from app.core.faults import inject_faults
+from app.models.schemas import SessionCreate
+from app.services.store import network_store
+
+router = APIRouter(prefix="/sessions", tags=["Sessions"], dependencies=[Depends(inject_faults("sessions"))])
+
+
+@router.post("", status_code=201)
+async def create_session(session: SessionCreate):
+    """Create a QoD session"""
+    return network_store.create_session(
+        session.device.phoneNumber,
+        session.qosProfile,
+        session.applicationServer.ipv4Address,
+        session.duration
+    )
+
+
+@router.get("")
+async def list_sessions(device: Optional[str] = Query(None, description="Filter by phone number")):
+    """List QoD sessions"""
+    return network_store.list_sessions(device)
+
+
+@router.get("/{session_id}")
+async def get_session(session_id: str):
+    """Get a QoD session"""
+    session = network_store.sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+@router.delete("/{session_id}", status_code=204)
+async def delete_session(session_id: str):
+    """Delete a QoD session"""
+    if network_store.sessions.pop(session_id, None) is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return Response(status_code=204)
@@ -0,0 +1,145 @@
+"""
+Configuration settings for the mock Nokia API.
+
+Every fault-injection knob can be set through environment variables at
+startup and changed at runtime through `PUT /api/v1/mock/config`.
+"""
+import os
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+
+LATENCY_DISTRIBUTIONS = ("none", "fixed", "uniform", "normal", "lognormal", "exponential")
+
+
+class FaultProfile(BaseModel):
+    """Latency, error and throttling behaviour for a group of endpoints."""
+    # Latency
+    latency_distribution: str = Field("none", description="none, fixed, uniform, normal, lognormal or exponential")
+    latency_ms: float = Field(0.0, ge=0, description="Mean (or fixed) latency in milliseconds")
+    latency_jitter_ms: float = Field(0.0, ge=0, description="Spread: stddev for normal/lognormal, half-width for uniform")
+    latency_max_ms: Optional[float] = Field(None, ge=0, description="Hard cap applied after sampling")
+
+    # Errors
+    error_rate: float = Field(0.0, ge=0, le=1, description="Probability of answering with an error status")
+    error_status_codes: List[int] = Field(default_factory=lambda: [500, 502, 503])
+    timeout_rate: float = Field(0.0, ge=0, le=1, description="Probability of hanging for timeout_ms")
+    timeout_ms: float = Field(15000.0, ge=0, description="Hang time, longer than the backend's 10s client timeout")
+
+    # Throttling (token bucket, 0 disables it)
+    throttle_rps: float = Field(0.0, ge=0, description="Sustained requests per second")
+    throttle_burst: int = Field(10, ge=1, description="Bucket size")
+
+    @field_validator("latency_distribution")
+    @classmethod
+    def _known_distribution(cls, value: str) -> str:
+        if value not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"must be one of {', '.join(LATENCY_DISTRIBUTIONS)}")
+        return value
+
+    @field_validator("error_status_codes")
+    @classmethod
+    def _http_status_codes(cls, value: List[int]) -> List[int]:
+        if not value or any(not 100 <= code <= 599 for code in value):
+            raise ValueError("must be one or more HTTP status codes (100-599)")
+        return value
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, got {value!r}") from None
+
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}") from None
+
+
+def _env_codes(name: str, default: List[int]) -> List[int]:
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return [int(code) for code in value.split(",") if code.strip()]
+    except ValueError:
+        raise ValueError(f"{name} must be a comma-separated list of status codes, got {value!r}") from None
+
+
+# Environment variable behind each FaultProfile field, for the error messages
+_PROFILE_ENV = {
+    "latency_distribution": "MOCK_LATENCY_DISTRIBUTION",
+    "latency_ms": "MOCK_LATENCY_MS",
+    "latency_jitter_ms": "MOCK_LATENCY_JITTER_MS",
+    "latency_max_ms": "MOCK_LATENCY_MAX_MS",
+    "error_rate": "MOCK_ERROR_RATE",
+    "error_status_codes": "MOCK_ERROR_STATUS_CODES",
+    "timeout_rate": "MOCK_TIMEOUT_RATE",
+    "timeout_ms": "MOCK_TIMEOUT_MS",
+    "throttle_rps": "MOCK_THROTTLE_RPS",
+    "throttle_burst": "MOCK_THROTTLE_BURST",
+}
+
+
+def default_profile_from_env() -> FaultProfile:
+    """The default profile from the MOCK_* variables; raises ValueError naming the bad ones.
+
+    Built when the module is imported, so a typo stops the mock at startup
+    instead of silently running without the intended faults.
+    """
+    try:
+        return FaultProfile(
+            latency_distribution=os.getenv("MOCK_LATENCY_DISTRIBUTION", "none"),
+            latency_ms=_env_float("MOCK_LATENCY_MS", 0.0),
+            latency_jitter_ms=_env_float("MOCK_LATENCY_JITTER_MS", 0.0),
+            latency_max_ms=_env_float("MOCK_LATENCY_MAX_MS", 0.0) or None,
+            error_rate=_env_float("MOCK_ERROR_RATE", 0.0),
+            error_status_codes=_env_codes("MOCK_ERROR_STATUS_CODES", [500, 502, 503]),
+            timeout_rate=_env_float("MOCK_TIMEOUT_RATE", 0.0),
+            timeout_ms=_env_float("MOCK_TIMEOUT_MS", 15000.0),
+            throttle_rps=_env_float("MOCK_THROTTLE_RPS", 0.0),
+            throttle_burst=_env_int("MOCK_THROTTLE_BURST", 10),
+        )
+    except ValidationError as e:
+        problems = "; ".join(f"{_PROFILE_ENV.get(error['loc'][0], error['loc'][0])}: {error['msg']}"
+                             for error in e.errors())
+        raise ValueError(f"Invalid fault configuration in the environment: {problems}") from None
+
+
+class MockConfig(BaseModel):
+    """Runtime configuration: a default profile plus optional per-route-group overrides."""
+    default: FaultProfile = Field(default_factory=default_profile_from_env)
+    # Keys are route groups: "qos", "location", "sessions", "devices"
+    routes: Dict[str, FaultProfile] = Field(default_factory=dict)
+
+    def profile_for(self, group: str) -> FaultProfile:
+        return self.routes.get(group, self.default)
+
+
+class Settings(BaseModel):
+    """Application settings."""
+    API_TITLE: str = "SERP Mock Nokia API"
+    API_PREFIX: str = "/api/v1"
+
+    HOST: str = os.getenv("MOCK_HOST", "0.0.0.0")
+    PORT: int = _env_int("MOCK_PORT", 6000)
+
+    # Seed for the fault/latency RNG so runs can be reproduced (empty = random)
+    SEED: Optional[int] = _env_int("MOCK_SEED", None)
+
+    # Devices without an explicit position are placed around this point
+    DEFAULT_LATITUDE: float = _env_float("MOCK_DEFAULT_LATITUDE", 41.3874)
+    DEFAULT_LONGITUDE: float = _env_float("MOCK_DEFAULT_LONGITUDE", 2.1686)
+
+
+settings = Settings()
+mock_config = MockConfig()
@@ -0,0 +1,154 @@
+"""
+Latency, error and throttling injection for the mock endpoints.
+
+Each router declares `dependencies=[Depends(inject_faults("<group>"))]`, so
+the profile for that route group is applied before the handler runs.
+"""
+import asyncio
+import logging
+import math
+import random
+import time
+from typing import Dict
+
+from fastapi import HTTPException
+
+from .config import settings, mock_config, FaultProfile
+
+logger = logging.getLogger(__name__)
+
+rng = random.Random(settings.SEED)
+
+
+def sample_latency_ms(profile: FaultProfile) -> float:
+    """Draw one latency sample (ms) from the profile's distribution."""
+    dist = profile.latency_distribution
+    mean = profile.latency_ms
+    jitter = profile.latency_jitter_ms
+
+    if dist == "none" or mean <= 0:
+        value = 0.0
+    elif dist == "fixed":
+        value = mean
+    elif dist == "uniform":
+        value = rng.uniform(mean - jitter, mean + jitter)
+    elif dist == "normal":
+        value = rng.gauss(mean, jitter)
+    elif dist == "lognormal":
+        # Parametrised by the desired mean/stddev of the latency itself,
+        # which gives the long right tail typical of network calls
+        sigma2 = math.log(1 + (jitter / mean) ** 2) if jitter > 0 else 0.0
+        mu = math.log(mean) - sigma2 / 2
+        value = rng.lognormvariate(mu, math.sqrt(sigma2))
+    elif dist == "exponential":
+        value = rng.expovariate(1.0 / mean)
+    else:
+        raise ValueError(f"Unknown latency distribution: {dist}")
+
+    value = max(value, 0.0)
+    if profile.latency_max_ms is not None:
+        value = min(value, profile.latency_max_ms)
+    return value
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token. Returns 0 on success or the seconds to wait for the next one."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FaultStats:
+    """Counters exposed through `GET /api/v1/mock/stats`."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.requests: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.timeouts: Dict[str, int] = {}
+        self.throttled: Dict[str, int] = {}
+        self.latency_ms_total: Dict[str, float] = {}
+
+    @staticmethod
+    def _inc(counter: Dict, group: str, value=1):
+        counter[group] = counter.get(group, 0) + value
+
+    def as_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "throttled": self.throttled,
+            "avg_injected_latency_ms": {
+                group: self.latency_ms_total[group] / self.requests[group]
+                for group in self.latency_ms_total if self.requests.get(group)
+            },
+        }
+
+
+stats = FaultStats()
+_buckets: Dict[str, TokenBucket] = {}
+
+
+def reset_buckets():
+    """Drop throttling state, e.g. after the configuration changes."""
+    _buckets.clear()
+
+
+def _bucket_for(group: str, profile: FaultProfile) -> TokenBucket:
+    bucket = _buckets.get(group)
+    if bucket is None or bucket.rate != profile.throttle_rps or bucket.burst != profile.throttle_burst:
+        bucket = TokenBucket(profile.throttle_rps, profile.throttle_burst)
+        _buckets[group] = bucket
+    return bucket
+
+
+def inject_faults(group: str):
+    """Build a FastAPI dependency applying the fault profile of `group`."""
+
+    async def dependency():
+        profile = mock_config.profile_for(group)
+        stats._inc(stats.requests, group)
+
+        if profile.throttle_rps > 0:
+            retry_after = _bucket_for(group, profile).take()
+            if retry_after > 0:
+                stats._inc(stats.throttled, group)
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too Many Requests",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+
+        latency = sample_latency_ms(profile)
+        stats._inc(stats.latency_ms_total, group, latency)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+        if profile.timeout_rate > 0 and rng.random() < profile.timeout_rate:
+            stats._inc(stats.timeouts, group)
+            await asyncio.sleep(profile.timeout_ms / 1000)
+            raise HTTPException(status_code=504, detail="Injected upstream timeout")
+
+        if profile.error_rate > 0 and rng.random() < profile.error_rate:
+            stats._inc(stats.errors, group)
+            status_code = rng.choice(profile.error_status_codes)
+            logger.debug(f"Injecting {status_code} on {group}")
+            raise HTTPException(status_code=status_code, detail="Injected fault")
+
+    return dependency
@@ -0,0 +1,38 @@
+"""
+Pydantic models/schemas for the mock Nokia API.
+"""
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+# QoS Models (backend opencameragateway)
+class QoSRequest(BaseModel):
+    """Activate QoS for a device."""
+    device_id: str
+    priority_level: int = 5
+    duration_minutes: int = 30
+    service_type: str = "emergency"
+
+
+# Location Models
+class LocationRequest(BaseModel):
+    """Request for device location."""
+    device_id: str
+    accuracy_level: str = "high"
+
+
+# Session Models (CAMARA QoD)
+class SessionDevice(BaseModel):
+    phoneNumber: str
+
+
+class SessionApplicationServer(BaseModel):
+    ipv4Address: Optional[str] = None
+
+
+class SessionCreate(BaseModel):
+    """Create a QoD session, same payload as the NAC direct HTTP fallback."""
+    qosProfile: str
+    device: SessionDevice
+    applicationServer: SessionApplicationServer = Field(default_factory=SessionApplicationServer)
+    duration: int = 3600
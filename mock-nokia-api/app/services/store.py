@@ -0,0 +1,143 @@
+"""
+In-memory state of the simulated network: device positions and QoS sessions.
+"""
+import hashlib
+import math
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from ..core.config import settings
+from ..core.faults import rng
+
+
+class DeviceState:
+    def __init__(self, device_id: str, latitude: float, longitude: float):
+        self.device_id = device_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.speed = 0.0
+        self.heading = 0.0
+        self.accuracy = 10.0
+        self.ipv4_address = None
+        self.updated_at = datetime.now()
+
+    def as_dict(self) -> Dict:
+        return {
+            "device_id": self.device_id,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "accuracy": self.accuracy,
+            "speed": self.speed,
+            "heading": self.heading,
+            "timestamp": self.updated_at.isoformat(),
+        }
+
+
+class NetworkStore:
+    def __init__(self):
+        self.devices: Dict[str, DeviceState] = {}
+        self.qos_requests: Dict[str, Dict] = {}
+        self.sessions: Dict[str, Dict] = {}
+
+    def reset(self):
+        self.devices.clear()
+        self.qos_requests.clear()
+        self.sessions.clear()
+
+    # DEVICES
+    def get_device(self, device_id: str) -> DeviceState:
+        """Return the device, creating it at a stable position near the city centre if unknown."""
+        device = self.devices.get(device_id)
+        if device is None:
+            digest = hashlib.sha1(device_id.encode()).digest()
+            # ~5 km around the default point, stable for a given device id
+            d_lat = (digest[0] / 255 - 0.5) * 0.09
+            d_lon = (digest[1] / 255 - 0.5) * 0.12
+            device = DeviceState(device_id, settings.DEFAULT_LATITUDE + d_lat, settings.DEFAULT_LONGITUDE + d_lon)
+            device.ipv4_address = f"10.{digest[2]}.{digest[3]}.{digest[4] or 1}"
+            self.devices[device_id] = device
+        return device
+
+    def set_position(self, device_id: str, latitude: float, longitude: float,
+                     speed: Optional[float] = None, heading: Optional[float] = None) -> DeviceState:
+        device = self.get_device(device_id)
+        device.latitude = latitude
+        device.longitude = longitude
+        if speed is not None:
+            device.speed = speed
+        if heading is not None:
+            device.heading = heading
+        device.updated_at = datetime.now()
+        return device
+
+    def read_position(self, device_id: str, accuracy_level: str = "high") -> Dict:
+        """Return the position with GPS-like noise; moving devices advance along their heading.
+
+        The noise is only added to the reading, the stored position stays put.
+        """
+        device = self.get_device(device_id)
+        now = datetime.now()
+        elapsed = (now - device.updated_at).total_seconds()
+        if device.speed > 0 and elapsed > 0:
+            distance = device.speed * elapsed  # metres, speed in m/s
+            device.latitude += distance * math.cos(math.radians(device.heading)) / 111_320
+            device.longitude += distance * math.sin(math.radians(device.heading)) / (
+                111_320 * math.cos(math.radians(device.latitude)))
+        device.updated_at = now
+        accuracy = {"high": 10.0, "medium": 50.0, "low": 200.0}.get(accuracy_level, 50.0)
+        # Drawn from the seeded rng so MOCK_SEED makes readings reproducible
+        noise = accuracy / 111_320 / 3
+        return {
+            **device.as_dict(),
+            "latitude": device.latitude + rng.gauss(0, noise),
+            "longitude": device.longitude + rng.gauss(0, noise),
+            "accuracy": accuracy,
+        }
+
+    # QOS (legacy API used by the backend's opencameragateway)
+    def create_qos(self, device_id: str, priority_level: int, duration_minutes: int, service_type: str) -> Dict:
+        request_id = str(uuid.uuid4())
+        now = datetime.now()
+        qos = {
+            "request_id": request_id,
+            "device_id": device_id,
+            "priority_level": priority_level,
+            "duration_minutes": duration_minutes,
+            "service_type": service_type,
+            "status": "active",
+            "created_at": now.isoformat(),
+            "expires_at": (now + timedelta(minutes=duration_minutes)).isoformat(),
+        }
+        self.qos_requests[request_id] = qos
+        return qos
+
+    def delete_qos(self, request_id: str) -> bool:
+        return self.qos_requests.pop(request_id, None) is not None
+
+    # SESSIONS (CAMARA QoD shape used by the Nokia NAC SDK and its direct HTTP fallback)
+    def create_session(self, phone_number: str, profile: str, ipv4_address: Optional[str], duration: int) -> Dict:
+        session_id = str(uuid.uuid4())
+        now = datetime.now()
+        session = {
+            "id": session_id,
+            "sessionId": session_id,
+            "qosProfile": profile,
+            "device": {"phoneNumber": phone_number},
+            "applicationServer": {"ipv4Address": ipv4_address},
+            "duration": duration,
+            "qosStatus": "AVAILABLE",
+            "startedAt": now.isoformat(),
+            "expiresAt": (now + timedelta(seconds=duration)).isoformat(),
+        }
+        self.sessions[session_id] = session
+        return session
+
+    def list_sessions(self, phone_number: Optional[str] = None) -> List[Dict]:
+        if phone_number:
+            return [s for s in self.sessions.values() if s["device"]["phoneNumber"] == phone_number]
+        return list(self.sessions.values())
+
+
+# Singleton instance
+network_store = NetworkStore()
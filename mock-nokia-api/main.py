@@ -0,0 +1,43 @@
+from fastapi import FastAPI, APIRouter
+import uvicorn
+import logging
+from app.api import qos, location, sessions, devices, mock
+from app.core.config import settings
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(
+    title=settings.API_TITLE,
+    description="Local stand-in for the Nokia NAC APIs with configurable latency and fault injection",
+    version="1.0.0"
+)
+
+# Include routers
+api = APIRouter(prefix=settings.API_PREFIX)
+api.include_router(qos.router)
+api.include_router(location.router)
+api.include_router(sessions.router)
+api.include_router(devices.router)
+api.include_router(mock.router)
+app.include_router(api)
+
+@app.on_event("startup")
+async def startup_event():
+    logger.info("Starting mock Nokia API")
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "main:app",
+        host=settings.HOST,
+        port=settings.PORT
+    )